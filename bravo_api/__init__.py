@@ -3,6 +3,7 @@ from os import getenv
 import importlib.resources as pkg_resources
 from bravo_api.models.sequences import init_sequences
 from bravo_api.models.database import mongo
+from bravo_api.models.gene_models import gene_models
 from bravo_api.blueprints.legacy_ui import autocomplete, variant_routes, gene_routes, region_routes
 from bravo_api.blueprints.health import health
 from bravo_api.blueprints.bailiff import auth_routes
@@ -31,8 +32,16 @@ def create_app(test_config=None):
 
     # Initialize persistence layer depenencies
     mongo.init_app(app)
+    gene_models.start_refresh()
 
-    app.coverage_provider = CoverageProviderFactory.build(app.config['COVERAGE_DIR'])
+    app.coverage_provider = CoverageProviderFactory.build(
+        app.config['COVERAGE_DIR'],
+        app.config.get('COVERAGE_POOL_SIZE', 32),
+        app.config.get('COVERAGE_CACHE_DIR'),
+        app.config.get('COVERAGE_BLOCK_CACHE_BYTES', 1 << 30),
+        app.config.get('COVERAGE_TILE_CACHE_ROWS', 0),
+        app.config.get('COVERAGE_TILE_CACHE_DIR'))
+    app.coverage_provider.warm_up()
 
     # TODO: Issue #20. Log warnings from coverage provider.
     # coverage_warnings = app.coverage_provicer.evaluate_coverage()
@@ -41,7 +50,13 @@ def create_app(test_config=None):
     # HX: we don't have these data now
     # init_sequences(app.config['SEQUENCES_DIR'],
     #               app.config['REFERENCE_SEQUENCE'],
-    #               app.config['SEQUENCES_CACHE_DIR'])
+    #               app.config['SEQUENCES_CACHE_DIR'],
+    #               app.config['SEQUENCES_EXTRACT_THREADS'],
+    #               app.config['SEQUENCES_EXTRACT_TIMEOUT'],
+    #               app.config['SEQUENCES_CACHE_BYTES'],
+    #               app.config['SEQUENCES_CRAM_SOURCE'],
+    #               app.config['SEQUENCES_CRAM_CACHE_BYTES'],
+    #               app.config['SEQUENCES_S3_ENDPOINT_URL'])
 
     # Initialize CORS and Sessions
     CORS(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
@@ -6,7 +6,6 @@ from webargs import fields, ValidationError
 from marshmallow import RAISE
 from bravo_api.models import variants, coverage, sequences, qc_metrics
 import string
-import re
 import requests
 
 import urllib
@@ -263,6 +262,7 @@ region_snv_argmap = {
     'annotation.region.consequence': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'cadd_phred': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, float))),
     'rsids': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
+    'variant_class': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'sort': fields.Function(deserialize = lambda x: deserialize_query_sort(x, allowed_snv_sort_keys)),
     'limit': fields.Int(required = False, validate = lambda x: x > 0, error_messages = {'validator_failed': 'Value must be greater than 0.'}),
     'last': fields.Function(deserialize = lambda x: deserialize_query_last(x, allowed_snv_sort_keys))
@@ -273,14 +273,14 @@ region_snv_argmap = {
 @parser.use_args(region_snv_argmap, location='query', validate=validate_paging_args)
 def get_region_snv(args):
     args['limit'] = args.get('limit', current_app.config['BRAVO_API_PAGE_LIMIT'])  # Bad hack
-    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids' ] if key in args }
+    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids', 'variant_class' ] if key in args }
     result = variants.get_region_snv(args['chrom'], args['start'], args['stop'], filter, args.get('sort', []), args.get('last', {}), args['limit'])
     url = None
     if result['last'] is not None:
         url = request.base_url + '?' + '&'.join(f'{arg}={value}' for arg, value in request.args.items(True) if arg != 'last' and arg != 'sort')
         url += '&sort=' + ','.join(f'{key}:{direction}' for key, direction in result['sort'])
         url += f'&last=' + urllib.parse.quote(json.dumps(result['last']))
-    response = make_response(jsonify({ 'data': result['data'], 'total': result['total'], 'limit': result['limit'], 'next': url, 'error': None }), 200)
+    response = make_response(jsonify({ 'data': result['data'], 'total': result['total'], 'total_exact': result['total_exact'], 'limit': result['limit'], 'next': url, 'error': None }), 200)
     response.mimetype = 'application/json'
     return response
 
@@ -293,6 +293,7 @@ gene_argmap = {
     'annotation.gene.consequence': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'cadd_phred': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, float))),
     'rsids': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
+    'variant_class': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'sort': fields.Function(deserialize = lambda x: deserialize_query_sort(x, allowed_snv_sort_keys)),
     'introns': fields.Bool(required = False, missing = True),
     'limit': fields.Int(required = False, validate = lambda x: x > 0, error_messages = {'validator_failed': 'Value must be greater than 0.'}),
@@ -309,14 +310,14 @@ def get_gene_snv(args):
 # Implementation decoupled from arg parsing decorators
 def get_gene_snv_impl(args):
     args['limit'] = args.get('limit', current_app.config['BRAVO_API_PAGE_LIMIT'])  # Bad hack
-    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids' ] if key in args }
+    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids', 'variant_class' ] if key in args }
     result = variants.get_gene_snv(args['name'], filter, args.get('sort', []), args.get('last', {}), args['limit'], args['introns'])
     url = None
     if result['last'] is not None:
         url = request.base_url + '?' + '&'.join(f'{arg}={value}' for arg, value in request.args.items(True) if arg != 'last' and arg != 'sort')
         url += '&sort=' + ','.join(f'{key}:{direction}' for key, direction in result['sort'])
         url += f'&last=' + urllib.parse.quote(json.dumps(result['last']))
-    response = make_response(jsonify({ 'data': result['data'], 'total': result['total'], 'limit': result['limit'], 'next': url, 'error': None }), 200)
+    response = make_response(jsonify({ 'data': result['data'], 'total': result['total'], 'total_exact': result['total_exact'], 'limit': result['limit'], 'next': url, 'error': None }), 200)
     response.mimetype = 'application/json'
     return response
 
@@ -340,13 +341,14 @@ region_hist_argmap = {
     'annotation.region.consequence': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'cadd_phred': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, float))),
     'rsids': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
+    'variant_class': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
 }
 
 
 @bp.route('/region/snv/histogram', methods=['GET'])
 @parser.use_args(region_hist_argmap, location='query', validate=validate_paging_args)
 def get_region_snv_histogram(args):
-    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids' ] if key in args }
+    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids', 'variant_class' ] if key in args }
     data = variants.get_region_snv_histogram(args['chrom'], args['start'], args['stop'], filter, args['windows'])
     response = make_response(jsonify({ 'data': data, 'total': len(data), 'limit': None, 'next': None, 'error': None }), 200)
     response.mimetype = 'application/json'
@@ -363,13 +365,14 @@ region_summary_argmap = {
     'annotation.region.consequence': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'cadd_phred': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, float))),
     'rsids': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
+    'variant_class': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
 }
 
 
 @bp.route('/region/snv/summary', methods=['GET'])
 @parser.use_args(region_summary_argmap, location='query', validate=validate_paging_args)
 def get_region_snv_summary(args):
-    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids' ] if key in args }
+    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids', 'variant_class' ] if key in args }
     data = variants.get_region_snv_summary(args['chrom'], args['start'], args['stop'], filter)
     response = make_response(jsonify({ 'data': data, 'total': len(data), 'limit': None, 'next': None, 'error': None }), 200)
     response.mimetype = 'application/json'
@@ -385,6 +388,7 @@ gene_snv_histogram_argmap = {
     'annotation.gene.consequence': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'cadd_phred': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, float))),
     'rsids': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
+    'variant_class': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'introns': fields.Bool(required = False, missing = True)
 }
 
@@ -392,7 +396,7 @@ gene_snv_histogram_argmap = {
 @bp.route('/gene/snv/histogram', methods=['GET'])
 @parser.use_args(gene_snv_histogram_argmap, location='query', validate=validate_paging_args)
 def get_gene_snv_histogram(args):
-    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids' ] if key in args }
+    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids', 'variant_class' ] if key in args }
     data = variants.get_gene_snv_histogram(args['name'], filter, args['windows'], args['introns'])
     response = make_response(jsonify({ 'data': data, 'total': len(data), 'limit': None, 'next': None, 'error': None }), 200)
     response.mimetype = 'application/json'
@@ -407,6 +411,7 @@ gene_snv_summary_argmap = {
     'annotation.gene.consequence': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'cadd_phred': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, float))),
     'rsids': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
+    'variant_class': fields.List(fields.Function(deserialize = lambda x: deserialize_query_filter(x, str))),
     'introns': fields.Bool(required = False, missing = True)
 }
 
@@ -414,7 +419,7 @@ gene_snv_summary_argmap = {
 @bp.route('/gene/snv/summary', methods=['GET'])
 @parser.use_args(gene_snv_summary_argmap, location='query', validate=validate_paging_args)
 def get_gene_snv_summary(args):
-    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids' ] if key in args }
+    filter = { key: args[key] for  key in [ 'filter', 'allele_freq', 'annotation', 'cadd_phred', 'rsids', 'variant_class' ] if key in args }
     data = variants.get_gene_snv_summary(args['name'], filter, args['introns'])
     response = make_response(jsonify({ 'data': data, 'total': len(data), 'limit': None, 'next': None, 'error': None }), 200)
     response.mimetype = 'application/json'
@@ -487,21 +492,10 @@ sequence_argmap = {
 @parser.use_args(sequence_argmap, location='query', validate=validate_paging_args)
 def get_sequence(args):
     if not args['index']:
-        range_header = request.headers.get('Range', None)
-        start = None
-        stop = None
-        if range_header:
-            m = re.search(r'(\d+)-(\d*)', range_header)
-            if m:
-                start = int(m.group(1))
-                stop = int(m.group(2))
-        result = sequences.get_cram(args['variant_id'], args['sample_no'], args['heterozygous'], start, stop)
+        result = sequences.get_cram(args['variant_id'], args['sample_no'], args['heterozygous'])
         if result is None:
             abort(500)
-        response = make_response(result['file_bytes'], 206)
-        response.headers['Content-Range'] = f'bytes {result["start_byte"]}-{result["stop_byte"]}/{result["file_size"]}'
-        response.mimetype = 'application/octet-stream'
-        response.direct_passthrough = True
+        response = send_file(result, mimetype = 'application/octet-stream', conditional = True)
     else:
         result = sequences.get_crai(args['variant_id'], args['sample_no'], args['heterozygous'])
         if result is None:
@@ -14,3 +14,11 @@ def version():
         return make_response(jsonify({'version': current_app.version}))
     else:
         return make_response(jsonify({'version': 'unknown'}))
+
+
+@bp.route('/stats/coverage', methods=['GET'])
+def coverage_stats():
+    if(hasattr(current_app, 'coverage_provider')):
+        return make_response(jsonify(current_app.coverage_provider.stats()))
+    else:
+        return make_response(jsonify({}))
@@ -7,6 +7,8 @@ ERR_GT_ZERO_MSG = {'invalid_value': 'Value must be greater than 0.'}
 ERR_START_STOP_MSG = {'invalid_start_stop': 'Start value must be less than stop value.'}
 ERR_CONTINUE_STOP_MSG = {'invalid_continue_stop':
                          'Continue from value must be less than stop value.'}
+ERR_BATCH_SPAN_MSG = {'invalid_batch_span':
+                      'Intervals must not span more bases in total than COVERAGE_MAX_BATCH_SPAN.'}
 
 
 # Parser to exclude extra parameters passed in json bodies.
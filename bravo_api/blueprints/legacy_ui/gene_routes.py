@@ -21,11 +21,33 @@ genes_name_argmap = {
 }
 
 
+genes_query_argmap = {
+    'coverage': fields.Bool(required=False, missing=False)
+}
+
+
 @bp.route('/genes/api/<string:name>')
 @parser.use_kwargs(genes_name_argmap, location='view_args')
-def genes_by_name(name):
-    result = pretty_api.get_genes_by_name(name)
+@parser.use_kwargs(genes_query_argmap, location='query')
+def genes_by_name(name, coverage):
+    result = pretty_api.get_genes_by_name(name, coverage=coverage)
+
+    response = make_response(jsonify(result), 200)
+    response.mimetype = 'application/json'
+    return response
+
+
+gene_coverage_view_argmap = {
+    'ensembl_id': fields.Str(required=True,
+                             validate=lambda x: len(x) > 0,
+                             error_messages=common.ERR_EMPTY_MSG)
+}
+
 
+@bp.route('/coverage/gene/<string:ensembl_id>/exons', methods=['POST', 'GET'])
+@parser.use_kwargs(gene_coverage_view_argmap, location='view_args')
+def gene_exon_coverage(ensembl_id):
+    result = pretty_api.get_gene_exon_coverage(ensembl_id)
     response = make_response(jsonify(result), 200)
     response.mimetype = 'application/json'
     return response
@@ -4,7 +4,12 @@ Two main responsibilities are:
     - Aggregate results to data structure expected by web serving layer.
 """
 from bravo_api.models import variants, qc_metrics, sequences, clinVar
+from bravo_api.core import coverage_reduction
+from bravo_api.core.coverage_pyramid import zoom_bin_name
 from flask import current_app
+from itertools import islice
+import numpy as np
+import rapidjson
 
 FILTER_TYPE_MAPPING = {
     '=':  '$eq',
@@ -110,17 +115,17 @@ def munge_ui_filters(filters):
     return(user_filters)
 
 
-def get_genes_by_name(name='', full=1):
+def get_genes_by_name(name='', full=1, coverage=False):
     data = []
-    for gene in variants.get_genes(name, full):
+    for gene in variants.get_genes(name, full, coverage):
         data.append(gene)
     result = {'data': data, 'total': len(data), 'limit': None, 'next': None, 'error': None}
     return(result)
 
 
-def get_genes_in_region(chrom, start, stop, full=1):
+def get_genes_in_region(chrom, start, stop, full=1, coverage=False):
     data = []
-    for gene in variants.get_genes_in_region(chrom, start, stop, full):
+    for gene in variants.get_genes_in_region(chrom, start, stop, full, coverage):
         data.append(gene)
     result = {'data': data, 'total': len(data), 'limit': None, 'next': None, 'error': None}
     return(result)
@@ -175,6 +180,81 @@ def chunked_coverage(chrom, start, stop, continue_from=0):
     return result
 
 
+def batch_coverage(intervals):
+    """
+    Coverage of many regions at once. Regions are grouped by the bin their length calls for so
+    that each group is read with merged lookups.
+    @param intervals list of dicts with chrom, start, and stop keys.
+    @return list of dicts with chrom, start, stop, and coverage in the order of intervals.
+    """
+    by_bin = {}
+    for idx, interval in enumerate(intervals):
+        act_bin = determine_coverage_bin(interval['stop'] - interval['start'])
+        by_bin.setdefault(act_bin, []).append(idx)
+
+    data = [None] * len(intervals)
+    for act_bin, indexes in by_bin.items():
+        bin_intervals = [(intervals[idx]['chrom'], intervals[idx]['start'], intervals[idx]['stop'])
+                         for idx in indexes]
+        cov_data = current_app.coverage_provider.coverage_batch(act_bin, bin_intervals)
+        for idx, (chrom, start, stop), coverage in zip(indexes, bin_intervals, cov_data):
+            data[idx] = {'chrom': chrom, 'start': start, 'stop': stop, 'coverage': coverage}
+
+    return({'data': data, 'total': len(data), 'limit': None, 'next': None, 'error': None})
+
+
+def get_gene_exon_coverage(ensembl_id):
+    """
+    Coverage of each of the merged exons of a gene.
+    """
+    gene = variants.get_gene(ensembl_id, False)
+    if gene is None:
+        return({'data': [], 'total': 0, 'limit': None, 'next': None, 'error': None})
+
+    intervals = [{'chrom': gene['chrom'], 'start': exon.begin, 'stop': exon.end - 1}
+                 for exon in variants.get_gene_exons(gene['gene_id'])]
+    return(batch_coverage(intervals))
+
+
+def streamed_coverage(chrom, start, stop, rows_per_chunk=1000):
+    """
+    Coverage over the whole range as newline delimited JSON, yielded a chunk of rows at a time.
+    """
+    act_bin = determine_coverage_bin(stop - start)
+    rows = current_app.coverage_provider.iter_coverage(act_bin, chrom, start, stop)
+    for chunk in iter(lambda: list(islice(rows, rows_per_chunk)), []):
+        yield(''.join(rapidjson.dumps(row) + '\n' for row in chunk))
+
+
+def downsampled_coverage(chrom, start, stop, points, rows_per_chunk=10000):
+    """
+    Coverage over [start, stop] reduced to at most points equal width windows.
+    Reads the coarsest zoom level no wider than the output windows. If none is, reads the bin
+    chunked coverage would use for the range, so a wide range never reads the full bin.
+    Columns are reduced a chunk of rows at a time as they are read.
+    """
+    provider = current_app.coverage_provider
+    window_width = (stop - start + 1) / points
+    zoom_widths = [width for width in provider.zoom_widths if width <= window_width]
+    if zoom_widths:
+        cov_bin, fields = zoom_bin_name(zoom_widths[-1]), ('mean', 'min', 'max', 'covered')
+    else:
+        cov_bin, fields = determine_coverage_bin(stop - start), ('mean',)
+
+    downsampler = coverage_reduction.Downsampler(start, stop, points)
+    for chunk in provider.iter_coverage_arrays(cov_bin, chrom, start, stop, fields=fields,
+                                               rows_per_chunk=rows_per_chunk):
+        downsampler.add(chunk['start'], chunk['end'], chunk['mean'], mins=chunk.get('min'),
+                        maxs=chunk.get('max'), covered=chunk.get('covered'))
+    windows = downsampler.result()
+
+    # Columns rather than row dicts keep the response small. Empty windows serialize as null.
+    result = {key: [None if np.isnan(val) else round(float(val), 2) for val in windows[key]]
+              for key in ['min', 'mean', 'max']}
+    result.update({key: windows[key].tolist() for key in ['start', 'end', 'covered']})
+    return(result)
+
+
 def get_gene_snv_summary(ensembl_id, filters, introns):
     munged_filters = munge_ui_filters(filters)
     data = variants.get_gene_snv_summary(ensembl_id, munged_filters, introns)
@@ -194,8 +274,8 @@ def get_gene_snv(ensembl_id, filters, sorts, continue_from, limit, introns):
     snv = variants.get_gene_snv(ensembl_id, munged_filters, munged_sorters,
                                 continue_from, limit, introns)
 
-    return({'data': snv['data'], 'total': snv['total'], 'limit': snv['limit'],
-            'next': snv['last'], 'error': None})
+    return({'data': snv['data'], 'total': snv['total'], 'total_exact': snv['total_exact'],
+            'limit': snv['limit'], 'next': snv['last'], 'error': None})
     
 #HX
 def get_gene_clinVar(ensembl_id,introns):
@@ -236,8 +316,8 @@ def get_region_snv(chrom, start, stop, filters, sorts, continue_from, limit):
     snv = variants.get_region_snv(chrom, start, stop, munged_filters, munged_sorters,
                                   continue_from, limit)
 
-    return({'data': snv['data'], 'total': snv['total'], 'limit': snv['limit'],
-            'next': snv['last'], 'error': None})
+    return({'data': snv['data'], 'total': snv['total'], 'total_exact': snv['total_exact'],
+            'limit': snv['limit'], 'next': snv['last'], 'error': None})
 
 
 def get_region_snv_summary(chrom, start, stop, filters):
@@ -273,6 +353,21 @@ def get_variant_crai(variant_id, sample_no, heterozygous):
     return(result)
 
 
-def get_variant_cram(variant_id, heterozygous, sample_no, start, stop):
-    result = sequences.get_cram(variant_id, sample_no, heterozygous, start, stop)
+def get_variant_cram(variant_id, heterozygous, sample_no):
+    result = sequences.get_cram(variant_id, sample_no, heterozygous)
     return(result)
+
+
+def get_variant_combined_crai(variant_id):
+    result = sequences.get_combined_crai(variant_id)
+    return(result)
+
+
+def get_variant_combined_cram(variant_id):
+    result = sequences.get_combined_cram(variant_id)
+    return(result)
+
+
+def get_cram_extractions():
+    data = sequences.get_extractions()
+    return({'data': data, 'total': len(data), 'limit': None, 'next': None, 'error': None})
@@ -5,7 +5,7 @@ Primary responsibilities are:
     - Providing routes that use view arguments
     - Wrapping data in web responses.
 """
-from flask import current_app, Blueprint, make_response, jsonify
+from flask import current_app, Blueprint, Response, make_response, jsonify, stream_with_context
 from webargs import fields, ValidationError
 from marshmallow import validate
 from bravo_api.blueprints.legacy_ui import pretty_api, common
@@ -39,10 +39,16 @@ def validate_coverage_args(parsed_args):
     return True
 
 
+genes_query_argmap = {
+    'coverage': fields.Bool(required=False, missing=False)
+}
+
+
 @bp.route('/genes/<string:chrom>-<int:start>-<int:stop>')
 @parser.use_kwargs(region_argmap, location='view_args', validate=validate_region_args)
-def genes(chrom, start, stop):
-    result = pretty_api.get_genes_in_region(chrom, start, stop)
+@parser.use_kwargs(genes_query_argmap, location='query')
+def genes(chrom, start, stop, coverage):
+    result = pretty_api.get_genes_in_region(chrom, start, stop, coverage=coverage)
     response = make_response(jsonify(result), 200)
     response.mimetype = 'application/json'
     return response
@@ -92,6 +98,78 @@ def chunked_coverage(chrom, start, stop, continue_from):
     return response
 
 
+def validate_intervals(parsed_args):
+    for interval in parsed_args['intervals']:
+        if interval['start'] > interval['stop']:
+            raise ValidationError(common.ERR_START_STOP_MSG)
+    span = sum(interval['stop'] - interval['start'] + 1 for interval in parsed_args['intervals'])
+    if span > current_app.config.get('COVERAGE_MAX_BATCH_SPAN', 5_000_000):
+        raise ValidationError(common.ERR_BATCH_SPAN_MSG)
+    return True
+
+
+batch_coverage_json_argmap = {
+    'intervals': fields.List(fields.Nested({
+        'chrom': fields.Str(required=True, validate=validate.Length(min=1),
+                            error_messages=common.ERR_EMPTY_MSG),
+        'start': fields.Int(required=True, validate=validate.Range(min=1),
+                            error_messages=common.ERR_GT_ZERO_MSG),
+        'stop': fields.Int(required=True, validate=validate.Range(min=1),
+                           error_messages=common.ERR_GT_ZERO_MSG)}),
+        required=True, validate=validate.Length(min=1, max=1000))
+}
+
+
+@bp.route('/batch-coverage', methods=['POST'])
+@parser.use_kwargs(batch_coverage_json_argmap, location='json', validate=validate_intervals)
+def batch_coverage(intervals):
+    result = pretty_api.batch_coverage(intervals)
+    response = make_response(jsonify(result), 200)
+    response.mimetype = 'application/json'
+    return response
+
+
+streamed_coverage_json_argmap = {
+    'chrom': fields.Str(required=True, validate=validate.Length(min=1),
+                        error_messages=common.ERR_EMPTY_MSG),
+    'start': fields.Int(required=True, validate=validate.Range(min=1),
+                        error_messages=common.ERR_GT_ZERO_MSG),
+    'stop': fields.Int(required=True, validate=validate.Range(min=1),
+                       error_messages=common.ERR_GT_ZERO_MSG),
+}
+
+
+@bp.route('/streamed-coverage', methods=['POST'])
+@parser.use_kwargs(streamed_coverage_json_argmap, location='json', validate=validate_region_args)
+def streamed_coverage(chrom, start, stop):
+    rows = pretty_api.streamed_coverage(chrom, start, stop)
+    return Response(stream_with_context(rows), 200, mimetype='application/x-ndjson')
+
+
+downsampled_coverage_json_argmap = {
+    'chrom': fields.Str(required=True, validate=validate.Length(min=1),
+                        error_messages=common.ERR_EMPTY_MSG),
+    'start': fields.Int(required=True, validate=validate.Range(min=1),
+                        error_messages=common.ERR_GT_ZERO_MSG),
+    'stop': fields.Int(required=True, validate=validate.Range(min=1),
+                       error_messages=common.ERR_GT_ZERO_MSG),
+    'points': fields.Int(required=True, validate=validate.Range(min=1),
+                         error_messages=common.ERR_GT_ZERO_MSG),
+}
+
+
+@bp.route('/downsampled-coverage', methods=['POST'])
+@parser.use_kwargs(downsampled_coverage_json_argmap, location='json',
+                   validate=validate_region_args)
+def downsampled_coverage(chrom, start, stop, points):
+    points = min(points, current_app.config.get('COVERAGE_MAX_POINTS', 10000))
+
+    result = pretty_api.downsampled_coverage(chrom, start, stop, points)
+    response = make_response(jsonify(result), 200)
+    response.mimetype = 'application/json'
+    return response
+
+
 region_snv_histogram_json_argmap = {
     'filters': fields.List(fields.Dict(), required=False, missing=[]),
     'windows': fields.Int(required=True, validate=lambda x: x > 0,
@@ -5,7 +5,7 @@ Primary responsibilities are:
     - Providing routes that use view arguments
     - Wrapping data in web responses.
 """
-from flask import Blueprint, make_response, jsonify, send_file, abort, request
+from flask import Blueprint, make_response, jsonify, send_file, abort
 from webargs import fields
 from marshmallow import validate
 from bravo_api.blueprints.legacy_ui import pretty_api, common
@@ -175,6 +175,37 @@ def variant_cram_info(variant_id):
     return(response)
 
 
+@bp.route('/variant/api/snv/cram/extractions')
+def variant_cram_extractions():
+    result = pretty_api.get_cram_extractions()
+
+    response = make_response(jsonify(result), 200)
+    response.mimetype = 'application/json'
+    return(response)
+
+
+@bp.route('/variant/api/snv/cram/combined/<string:variant_id>')
+@parser.use_kwargs(variant_argmap, location='view_args')
+def variant_combined_cram(variant_id):
+    result = pretty_api.get_variant_combined_cram(variant_id)
+    if result is None:
+        abort(404)
+
+    # Reads of every example sample in one slice. Samples are told apart by read group.
+    response = send_file(result, mimetype='application/octet-stream', conditional=True)
+    return(response)
+
+
+@bp.route('/variant/api/snv/crai/combined/<string:variant_id>')
+@parser.use_kwargs(variant_argmap, location='view_args')
+def variant_combined_crai(variant_id):
+    result = pretty_api.get_variant_combined_crai(variant_id)
+    if result is None:
+        abort(404)
+    response = make_response(send_file(result, as_attachment=False))
+    return response
+
+
 variant_cram_argmap = {
     'variant_id': fields.Str(required=True, validate=validate.Length(min=1),
                              error_messages=common.ERR_EMPTY_MSG),
@@ -187,25 +218,12 @@ variant_cram_argmap = {
 @bp.route('/variant/api/snv/cram/<string:variant_id>-<int:sample_het>-<int:sample_no>')
 @parser.use_kwargs(variant_cram_argmap, location='view_args')
 def variant_cram(variant_id, sample_het, sample_no):
-    range_header = request.headers.get('Range', None)
-    start = None
-    stop = None
-    if range_header:
-        m = re.search(r'(\d+)-(\d*)', range_header)
-        if m:
-            start = int(m.group(1))
-            stop = int(m.group(2))
-
-    result = pretty_api.get_variant_cram(variant_id, sample_het, sample_no, start, stop)
+    result = pretty_api.get_variant_cram(variant_id, sample_het, sample_no)
     if result is None:
-        print(f'start: {start} stop: {stop}')
         abort(404)
 
-    response = make_response(result['file_bytes'], 206)
-    response.headers['Content-Range'] = f'bytes {result["start_byte"]}-{result["stop_byte"]}/{result["file_size"]}'
-    response.mimetype = 'application/octet-stream'
-    response.direct_passthrough = True
-
+    # Conditional send_file answers Range requests (206) from the file without buffering the slice.
+    response = send_file(result, mimetype='application/octet-stream', conditional=True)
     return(response)
 
 
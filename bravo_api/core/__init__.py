@@ -1,4 +1,10 @@
 from bravo_api.core.coverage_provider import CoverageProvider
 from bravo_api.core.s3_coverage_provider import S3CoverageProvider
 from bravo_api.core.fs_coverage_provider import FSCoverageProvider
+from bravo_api.core.columnar_coverage_provider import ColumnarCoverageProvider
 from bravo_api.core.coverage_provider_factory import CoverageProviderFactory
+from bravo_api.core.tiled_coverage import TiledCoverageProvider
+from bravo_api.core.cram_source import CramSource
+from bravo_api.core.fs_cram_source import FSCramSource
+from bravo_api.core.s3_cram_source import S3CramSource
+from bravo_api.core.cram_source_factory import CramSourceFactory
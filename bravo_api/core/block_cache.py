@@ -0,0 +1,151 @@
+"""
+On-disk LRU cache of decompressed BGZF blocks fetched from remote coverage files.
+    Blocks are keyed by object key and compressed offset and stored as one file each:
+
+    <cache_dir>/<sha1 of key>_<offset>   4 byte compressed block size, then decompressed bytes
+    <cache_dir>/.usage                   total bytes of the block files
+    <cache_dir>/.lock                    flock held while updating .usage or evicting
+
+    The size field is opaque to the cache, so other keyed byte strings (e.g. coverage tiles) are
+    stored the same way.
+
+    All processes using the directory account for its size in .usage, so max_bytes bounds the
+    directory rather than each worker's share of it. A block's modification time is its last use:
+    hits touch the file, so blocks read by any worker count as recently used. Once a put takes the
+    total above max_bytes, the directory is scanned and least recently used blocks are evicted
+    down to low_water of the budget. Blocks found in cache_dir by a restarted worker are kept.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+import threading
+import hashlib
+import struct
+import fcntl
+import time
+import os
+
+_SIZE_HEADER = struct.Struct('<I')
+USAGE_NAME = '.usage'
+LOCK_NAME = '.lock'
+LOW_WATER = 0.9
+
+
+class BlockCache():
+
+    def __init__(self, cache_dir, max_bytes, low_water=LOW_WATER):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with self._locked():
+            if self._read_usage() is None:
+                self._write_usage(self._evict(self.max_bytes))
+
+    @staticmethod
+    def _name(key, offset):
+        return(f'{hashlib.sha1(key.encode()).hexdigest()}_{offset}')
+
+    @contextmanager
+    def _locked(self):
+        with open(self.cache_dir / LOCK_NAME, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_usage(self):
+        try:
+            return(int((self.cache_dir / USAGE_NAME).read_text()))
+        except (FileNotFoundError, ValueError):
+            return(None)
+
+    def _write_usage(self, total):
+        tmp_path = self.cache_dir / f'{USAGE_NAME}.{os.getpid()}.{threading.get_ident()}'
+        tmp_path.write_text(str(total))
+        os.replace(tmp_path, self.cache_dir / USAGE_NAME)
+
+    def _evict(self, max_bytes):
+        """
+        Scan the directory and remove least recently used blocks until it is within max_bytes.
+        Call with the flock held.
+        @return total bytes of the remaining blocks.
+        """
+        blocks = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                blocks.append((stat.st_mtime_ns, stat.st_size, entry.name))
+        total = sum(size for _, size, _ in blocks)
+        evicted = 0
+        for _, size, name in sorted(blocks):
+            if total <= max_bytes:
+                break
+            try:
+                (self.cache_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.evictions += evicted
+        return(total)
+
+    def get(self, key, offset):
+        """
+        @return tuple of (compressed block size, decompressed bytes) or None if not cached.
+        """
+        path = self.cache_dir / self._name(key, offset)
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return(None)
+        try:
+            now = time.time_ns()
+            os.utime(path, ns=(now, now))
+        except FileNotFoundError:
+            pass # evicted by another worker since the read
+        with self._lock:
+            self.hits += 1
+        return(_SIZE_HEADER.unpack_from(raw)[0], raw[_SIZE_HEADER.size:])
+
+    def put(self, key, offset, block_size, data):
+        name = self._name(key, offset)
+        raw = _SIZE_HEADER.pack(block_size) + data
+        if len(raw) > self.max_bytes:
+            return
+
+        # Write then rename so other workers never read a partial block.
+        tmp_path = self.cache_dir / f'.{name}.{os.getpid()}.{threading.get_ident()}'
+        tmp_path.write_bytes(raw)
+        now = time.time_ns()
+        os.utime(tmp_path, ns=(now, now))
+
+        with self._locked():
+            try:
+                replaced = (self.cache_dir / name).stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, self.cache_dir / name)
+            total = self._read_usage()
+            total = self._evict(self.max_bytes) if total is None else total + len(raw) - replaced
+            if total > self.max_bytes:
+                total = self._evict(int(self.max_bytes * self.low_water))
+            self._write_usage(total)
+
+    def stats(self):
+        total = self._read_usage()
+        with self._lock:
+            return({'bytes': total,
+                    'max_bytes': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions})
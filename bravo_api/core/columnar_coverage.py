@@ -0,0 +1,188 @@
+"""
+Binary columnar layout of a single coverage bin & chromosome.
+    Each chrN.<bin>.tsv.gz coverage file is converted to a chrN.<bin>.cov directory:
+
+    chr11.full.cov/
+    ├── meta.json    chrom, row count, value fields, and block size
+    ├── start.bin    int32 start of each row
+    ├── end.bin      int32 end of each row
+    ├── values.bin   float64 (rows x fields) value of each field of the JSON data column in meta order
+    ├── int.bin      uint8 (rows x fields) 1 where a value was an integer
+    └── index.npy    int32 (blocks x 2) start and end of every BLOCK_SIZE-th row
+
+    Value fields are whatever the rows hold besides chrom, start, and end: mean, median, and depth
+    thresholds for the coverage bins, or min, mean, max, and covered for zoom levels.
+
+    Values are stored exactly as parsed from the JSON data column, so decoded rows serialize the same
+    as the source rows, e.g. 30 stays 30 rather than 30.0.
+
+    Rows are sorted and non-overlapping, so both start and end columns are monotonic and can be
+    binary searched. The small block index is held in memory so that a lookup touches only one
+    block of each memory-mapped column.
+"""
+from itertools import islice
+from pathlib import Path
+import numpy as np
+import rapidjson
+import gzip
+
+BLOCK_SIZE = 1024
+CHUNK_ROWS = 100_000
+FORMAT_VERSION = 3
+
+POSITION_FIELDS = ['chrom', 'start', 'end']
+# Files of a converted coverage directory
+COLUMN_FILES = ['meta.json', 'index.npy', 'start.bin', 'end.bin', 'values.bin', 'int.bin']
+
+
+def convert_coverage_file(src_path, dest_dir):
+    """
+    Stream a tabix coverage file with JSON data column into the columnar layout in dest_dir.
+    @return number of rows written
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+
+    chrom = None
+    fields = None
+    n_rows = 0
+    outputs = {name: open(dest_dir / f'{name}.bin', 'wb') for name in ['start', 'end', 'values', 'int']}
+    try:
+        with gzip.open(src_path, 'rt') as ifile:
+            lines = (line for line in ifile if not line.startswith('#'))
+            for chunk in iter(lambda: list(islice(lines, CHUNK_ROWS)), []):
+                rows = [rapidjson.loads(line.rstrip('\n').split('\t')[3]) for line in chunk]
+                if fields is None:
+                    chrom = rows[0]['chrom']
+                    fields = [key for key in rows[0] if key not in POSITION_FIELDS]
+                outputs['start'].write(np.array([row['start'] for row in rows], np.int32).tobytes())
+                outputs['end'].write(np.array([row['end'] for row in rows], np.int32).tobytes())
+                outputs['values'].write(
+                    np.array([[row[key] for key in fields] for row in rows],
+                             np.float64).reshape(-1, len(fields)).tobytes())
+                outputs['int'].write(
+                    np.array([[isinstance(row[key], int) for key in fields] for row in rows],
+                             np.uint8).tobytes())
+                n_rows += len(rows)
+    finally:
+        for ofile in outputs.values():
+            ofile.close()
+
+    if n_rows > 0:
+        starts = np.fromfile(dest_dir / 'start.bin', np.int32)[::BLOCK_SIZE]
+        ends = np.fromfile(dest_dir / 'end.bin', np.int32)[::BLOCK_SIZE]
+        index = np.stack([starts, ends], axis=1)
+    else:
+        index = np.empty((0, 2), np.int32)
+    np.save(dest_dir / 'index.npy', index)
+
+    meta = {'version': FORMAT_VERSION,
+            'chrom': chrom,
+            'rows': n_rows,
+            'fields': fields or [],
+            'block_size': BLOCK_SIZE}
+    with open(dest_dir / 'meta.json', 'w') as ofile:
+        rapidjson.dump(meta, ofile)
+
+    return(n_rows)
+
+
+class ColumnarCoverageFile():
+    """
+    Read only, memory-mapped view of one converted coverage file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'meta.json') as ifile:
+            self.meta = rapidjson.load(ifile)
+        if self.meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f'{self.path} has columnar coverage format version {self.meta.get("version")}, '
+                             f'expected {FORMAT_VERSION}. Convert it again with convert-coverage.')
+        self.rows = self.meta['rows']
+        self.chrom = self.meta['chrom']
+        self.fields = self.meta['fields']
+        self.block_size = self.meta['block_size']
+        self.index = np.load(self.path / 'index.npy')
+
+        if self.rows > 0:
+            self.start = self._memmap('start', np.int32)
+            self.end = self._memmap('end', np.int32)
+            self.values = self._memmap('values', np.float64, (self.rows, len(self.fields)))
+            self.is_int = self._memmap('int', np.uint8, (self.rows, len(self.fields)))
+
+    def _memmap(self, name, dtype, shape=None):
+        return(np.memmap(self.path / f'{name}.bin', dtype=dtype, mode='r',
+                         shape=shape or (self.rows,)))
+
+    def _bisect(self, column, index_column, value, side):
+        """
+        Position of value in sorted column, searching only the block bracketed by the index.
+        """
+        block = int(np.searchsorted(index_column, value, side=side))
+        if block == 0:
+            return(0)
+        lo = (block - 1) * self.block_size
+        hi = min(block * self.block_size, self.rows)
+        return(lo + int(np.searchsorted(column[lo:hi], value, side=side)))
+
+    def row_range(self, start, stop):
+        """
+        Slice bounds of rows overlapping the 0-based half-open [start, stop) interval.
+        Matches the semantics of TabixFile.fetch(chrom, start, stop).
+        """
+        if self.rows == 0:
+            return(0, 0)
+        lo = self._bisect(self.end, self.index[:, 1], start, 'right')
+        hi = self._bisect(self.start, self.index[:, 0], stop, 'right')
+        return(lo, max(lo, hi))
+
+    def iter_arrays(self, start, stop, fields, rows_per_chunk):
+        """
+        Dicts of start, end, and value field columns of rows overlapping the interval, a chunk of
+        at most rows_per_chunk rows at a time, without copying.
+        """
+        lo, hi = self.row_range(start, stop)
+        columns = [self.fields.index(field) for field in fields]
+        for chunk_lo in range(lo, hi, rows_per_chunk):
+            chunk_hi = min(hi, chunk_lo + rows_per_chunk)
+            values = self.values[chunk_lo:chunk_hi]
+            arrays = {'start': self.start[chunk_lo:chunk_hi], 'end': self.end[chunk_lo:chunk_hi]}
+            arrays.update({field: values[:, column] for field, column in zip(fields, columns)})
+            yield(arrays)
+
+    def decode_rows(self, lo, hi):
+        """
+        List of coverage dicts of rows lo to hi in the same form as the JSON data column of the
+        source file.
+        """
+        if lo == hi:
+            return([])
+
+        starts = self.start[lo:hi].tolist()
+        ends = self.end[lo:hi].tolist()
+        values = self.values[lo:hi].tolist()
+        for i, j in np.argwhere(self.is_int[lo:hi]).tolist():
+            values[i][j] = int(values[i][j])
+
+        result = []
+        for row_start, row_end, row_values in zip(starts, ends, values):
+            row = {'chrom': self.chrom, 'start': row_start, 'end': row_end}
+            row.update(zip(self.fields, row_values))
+            result.append(row)
+        return(result)
+
+    def fetch(self, start, stop):
+        """
+        List of coverage dicts overlapping the interval.
+        """
+        lo, hi = self.row_range(start, stop)
+        return(self.decode_rows(lo, hi))
+
+    def iter_fetch(self, start, stop):
+        """
+        Coverage dicts overlapping the interval, decoded one block of rows at a time.
+        """
+        lo, hi = self.row_range(start, stop)
+        for block_lo in range(lo, hi, self.block_size):
+            yield from self.decode_rows(block_lo, min(hi, block_lo + self.block_size))
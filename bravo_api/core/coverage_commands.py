@@ -0,0 +1,82 @@
+"""
+Flask commands preparing coverage data for serving.
+"""
+from bravo_api.core.fs_coverage_provider import FSCoverageProvider
+from bravo_api.core.columnar_coverage import convert_coverage_file
+from bravo_api.core.coverage_pyramid import build_pyramid_file, level_widths
+from multiprocessing import Pool
+from pathlib import Path
+import click
+import sys
+
+
+def _convert_coverage(args):
+    src_path, dest_dir = args
+    n_rows = convert_coverage_file(src_path, dest_dir)
+    return(dest_dir, n_rows)
+
+
+@click.command('convert-coverage')
+@click.argument('threads', required = True, type = int)
+@click.argument('coverage_dir', type = click.Path(exists = True, file_okay = False))
+@click.argument('output_dir', type = click.Path(file_okay = False))
+def convert_coverage(threads, coverage_dir, output_dir):
+    """
+    Converts tabix coverage files to the binary columnar layout served by ColumnarCoverageProvider.
+    Zoom levels built by build-coverage-pyramid into coverage_dir are converted too.
+
+    ARGUMENTS:
+
+    threads -- number of parallel processes to use.\n
+
+    coverage_dir -- directory with bin_0.25, ..., full, and zoom_<width> subdirectories of chrN.<bin>.tsv.gz files.\n
+
+    output_dir -- directory to write bin subdirectories of chrN.<bin>.cov directories to.\n
+    """
+    provider = FSCoverageProvider(coverage_dir)
+    output = Path(output_dir)
+    jobs = []
+    for bin_name, cov_bin in provider.catalog.items():
+        for chrom, cov_path in cov_bin.items():
+            jobs.append((cov_path, output / bin_name / f'chr{chrom}.{bin_name}.cov'))
+
+    with Pool(threads) as p:
+        for dest_dir, n_rows in p.imap_unordered(_convert_coverage, jobs):
+            sys.stdout.write(f"Converted {n_rows} coverage row(s) to {dest_dir}.\n")
+
+
+def _build_pyramid(args):
+    src_path, chrom, output_dir, widths = args
+    return(chrom, build_pyramid_file(src_path, chrom, output_dir, widths))
+
+
+@click.command('build-coverage-pyramid')
+@click.option('--base-width', default = 128, show_default = True, type = click.IntRange(min = 1),
+              help = 'Window width of the finest zoom level.')
+@click.option('--levels', default = 10, show_default = True, type = click.IntRange(min = 1),
+              help = 'Number of zoom levels. Each doubles the window width of the previous one.')
+@click.argument('threads', required = True, type = int)
+@click.argument('coverage_dir', type = click.Path(exists = True, file_okay = False))
+@click.argument('output_dir', type = click.Path(file_okay = False))
+def build_coverage_pyramid(base_width, levels, threads, coverage_dir, output_dir):
+    """
+    Builds zoom_<width> coverage levels with min, mean, and max depth from the full bin.
+    Use the coverage directory as output_dir to serve the levels alongside the other bins.
+
+    ARGUMENTS:
+
+    threads -- number of parallel processes to use. Each processes one chromosome at a time.\n
+
+    coverage_dir -- directory with a full subdirectory of chrN.full.tsv.gz files.\n
+
+    output_dir -- directory to write zoom_<width> subdirectories to.\n
+    """
+    provider = FSCoverageProvider(coverage_dir)
+    widths = level_widths(base_width, levels)
+    jobs = [(cov_path, chrom, output_dir, widths)
+            for chrom, cov_path in provider.catalog['full'].items()]
+
+    with Pool(threads) as p:
+        for chrom, rows in p.imap_unordered(_build_pyramid, jobs):
+            counts = ', '.join(f'{width}: {n_rows}' for width, n_rows in sorted(rows.items()))
+            sys.stdout.write(f"Built chr{chrom} zoom levels ({counts} rows).\n")
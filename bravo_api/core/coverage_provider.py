@@ -4,6 +4,14 @@ Coverage bins are:
     are consolidate together.
 """
 from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from itertools import islice
+import numpy as np
+
+# Directory prefix of power-of-two zoom levels built by `flask build-coverage-pyramid`
+ZOOM_PREFIX = 'zoom_'
+# Rows per chunk of arrays yielded by iter_coverage_arrays
+ARRAY_CHUNK_ROWS = 10000
 
 
 class CoverageSourceInaccessibleError(Exception):
@@ -32,6 +40,14 @@ class CoverageProvider(ABC):
     def bins(self):
         return(self._bins)
 
+    @property
+    def zoom_widths(self):
+        """
+        Window widths of the zoom levels in the catalog, finest first.
+        """
+        return(sorted(int(name[len(ZOOM_PREFIX):]) for name in self.catalog
+                      if name.startswith(ZOOM_PREFIX)))
+
     @abstractmethod
     def validate_source(self):
         """
@@ -59,3 +75,67 @@ class CoverageProvider(ABC):
         Lookup coverage for range at given resolution
         """
         pass
+
+    def iter_coverage(self, cov_bin, chrom, start, stop):
+        """
+        Lookup coverage for range one row at a time.
+        Providers able to read incrementally should override this to bound memory use.
+        """
+        yield from self.coverage(cov_bin, chrom, start, stop)
+
+    def coverage_batch(self, cov_bin, intervals):
+        """
+        Lookup coverage for many (chrom, start, stop) intervals of one bin.
+        Overlapping or adjacent intervals are merged and each chromosome is read once in order.
+        @return list of coverage lists in the same order as intervals.
+        """
+        result = [[] for _ in intervals]
+        by_chrom = {}
+        for idx, (chrom, start, stop) in enumerate(intervals):
+            by_chrom.setdefault(chrom, []).append((start, stop, idx))
+
+        for chrom, chrom_intervals in by_chrom.items():
+            chrom_intervals.sort()
+            spans = []
+            for start, stop, idx in chrom_intervals:
+                if spans and start <= spans[-1][1] + 1:
+                    spans[-1][1] = max(spans[-1][1], stop)
+                    spans[-1][2].append((start, stop, idx))
+                else:
+                    spans.append([start, stop, [(start, stop, idx)]])
+
+            for span_start, span_stop, members in spans:
+                rows = self.coverage(cov_bin, chrom, span_start, span_stop)
+                # Rows are sorted and do not overlap, so both starts and ends are ordered.
+                starts = [row['start'] for row in rows]
+                ends = [row['end'] for row in rows]
+                for start, stop, idx in members:
+                    result[idx] = rows[bisect_left(ends, start):bisect_right(starts, stop)]
+        return(result)
+
+    def iter_coverage_arrays(self, cov_bin, chrom, start, stop, fields=('mean',),
+                             rows_per_chunk=ARRAY_CHUNK_ROWS):
+        """
+        Lookup coverage for range as dicts of numpy arrays of start, end, and the value fields,
+        one chunk of at most rows_per_chunk rows at a time.
+        Providers able to read columns directly should override this.
+        """
+        rows = self.iter_coverage(cov_bin, chrom, start, stop)
+        for chunk in iter(lambda: list(islice(rows, rows_per_chunk)), []):
+            arrays = {key: np.array([row[key] for row in chunk], dtype=np.int64)
+                      for key in ['start', 'end']}
+            arrays.update({key: np.array([row[key] for row in chunk], dtype=np.float64)
+                           for key in fields})
+            yield(arrays)
+
+    def warm_up(self):
+        """
+        Load what lookups would otherwise read on first use. Called once at app startup.
+        """
+        pass
+
+    def stats(self):
+        """
+        Counters describing internal caches or pools. Empty if provider keeps none.
+        """
+        return({})
@@ -4,12 +4,23 @@ Generate coverage provider appropriate for the coverage source.
 from bravo_api.core.coverage_provider import CoverageProvider
 from bravo_api.core.fs_coverage_provider import FSCoverageProvider
 from bravo_api.core.s3_coverage_provider import S3CoverageProvider
+from bravo_api.core.columnar_coverage_provider import ColumnarCoverageProvider
+from bravo_api.core.tiled_coverage import TiledCoverageProvider
 
 
 class CoverageProviderFactory():
     @staticmethod
-    def build(src: str) -> CoverageProvider:
+    def build(src: str, pool_size: int = 32, cache_dir: str = None,
+              block_cache_bytes: int = 1 << 30, tile_cache_rows: int = 0,
+              tile_cache_dir: str = None) -> CoverageProvider:
         if src.startswith('s3://'):
-            return(S3CoverageProvider(src))
+            provider = S3CoverageProvider(src, cache_dir, block_cache_bytes)
+        elif ColumnarCoverageProvider.detect(src):
+            provider = ColumnarCoverageProvider(src)
         else:
-            return(FSCoverageProvider(src))
+            provider = FSCoverageProvider(src, pool_size)
+
+        if tile_cache_rows > 0:
+            provider = TiledCoverageProvider(provider, tile_cache_rows, tile_cache_dir,
+                                             block_cache_bytes)
+        return(provider)
@@ -0,0 +1,152 @@
+"""
+Power-of-two zoom pyramid of the full coverage bin.
+    Level k aggregates depth over aligned windows of base_width * 2**k positions. Windows of
+    level k + 1 are merged from pairs of level k windows, so every level is built in one
+    streaming pass over the full bin. Each level is written like the other coverage bins:
+
+    coverage/
+    ├── zoom_128
+    │   ├── chr11.zoom_128.tsv.gz
+    │   └── chr11.zoom_128.tsv.gz.tbi
+    ├── zoom_256
+    │   └── ...
+    └── ...
+
+    The JSON data column of a zoom row holds chrom, start, end, min, mean, max, and covered
+    (number of positions with data). Windows without any data are not written.
+"""
+from bravo_api.core.coverage_provider import ZOOM_PREFIX
+from itertools import islice
+from pathlib import Path
+import numpy as np
+import rapidjson
+import pysam
+import gzip
+
+CHUNK_ROWS = 100_000
+
+
+def zoom_bin_name(width):
+    return(f'{ZOOM_PREFIX}{width}')
+
+
+def level_widths(base_width, levels):
+    return([base_width * 2**level for level in range(levels)])
+
+
+def _reduce_by_window(ids, mins, maxs, sums, covered):
+    """
+    Combine consecutive entries sharing a window id. Ids must be sorted.
+    """
+    if len(ids) == 0:
+        return(ids, mins, maxs, sums, covered)
+    uniq, first = np.unique(ids, return_index=True)
+    return(uniq, np.minimum.reduceat(mins, first), np.maximum.reduceat(maxs, first),
+           np.add.reduceat(sums, first), np.add.reduceat(covered, first))
+
+
+def _split_rows(starts, ends, values, width):
+    """
+    Window ids and aggregates of the pieces of inclusive [starts, ends] rows split at multiples
+    of width. Pieces are not combined per window, see _LevelWriter.add.
+    """
+    first_win = (starts - 1) // width
+    last_win = (ends - 1) // width
+    n_pieces = last_win - first_win + 1
+    row_idx = np.repeat(np.arange(len(starts)), n_pieces)
+    offsets = np.arange(n_pieces.sum()) - np.repeat(np.cumsum(n_pieces) - n_pieces, n_pieces)
+    win = first_win[row_idx] + offsets
+
+    piece_len = (np.minimum(ends[row_idx], (win + 1) * width) -
+                 np.maximum(starts[row_idx], win * width + 1) + 1)
+    piece_val = values[row_idx]
+    return(win, piece_val, piece_val, piece_val * piece_len, piece_len)
+
+
+class _LevelWriter():
+    """
+    Accumulate windows of one zoom level in order, writing completed ones and passing them on
+    to the next coarser level. The entries of the last window seen are held back, not yet
+    combined, until a later window arrives. A window's sum is then reduced over the same entries
+    however the input was chunked, so floating point results don't depend on chunk boundaries.
+    """
+
+    def __init__(self, chrom, width, path, coarser=None):
+        self.chrom = chrom
+        self.width = width
+        self.path = path
+        self.coarser = coarser
+        self.rows = 0
+        self.pending = None
+        self.ofile = open(path, 'w')
+
+    def add(self, ids, mins, maxs, sums, covered):
+        if len(ids) == 0:
+            return
+        columns = (ids, mins, maxs, sums, covered)
+        if self.pending is not None:
+            columns = [np.concatenate([held, new]) for held, new in zip(self.pending, columns)]
+        last = int(np.searchsorted(columns[0], columns[0][-1], side='left'))
+        self.pending = tuple(column[last:] for column in columns)
+        self._emit(*_reduce_by_window(*[column[:last] for column in columns]))
+
+    def finish(self):
+        if self.pending is not None:
+            self._emit(*_reduce_by_window(*self.pending))
+            self.pending = None
+        self.ofile.close()
+        if self.coarser is not None:
+            self.coarser.finish()
+
+    def _emit(self, ids, mins, maxs, sums, covered):
+        if len(ids) == 0:
+            return
+        starts = (ids * self.width + 1).tolist()
+        ends = ((ids + 1) * self.width).tolist()
+        means = np.round(sums / covered, 2).tolist()
+        for start, end, w_min, mean, w_max, n_covered in zip(
+                starts, ends, mins.tolist(), means, maxs.tolist(), covered.tolist()):
+            data = {'chrom': self.chrom, 'start': start, 'end': end,
+                    'min': w_min, 'mean': mean, 'max': w_max, 'covered': n_covered}
+            self.ofile.write(f'{self.chrom}\t{start}\t{end}\t{rapidjson.dumps(data)}\n')
+        self.rows += len(ids)
+
+        if self.coarser is not None:
+            self.coarser.add(ids // 2, mins, maxs, sums, covered)
+
+
+def build_pyramid_file(src_path, chrom, output_dir, widths):
+    """
+    Stream a full bin coverage file once and write a bgzipped, tabix indexed file per zoom width.
+    Widths must start at the finest level and double at each following level.
+    @return dict of rows written keyed by width
+    """
+    output_dir = Path(output_dir)
+    writers = []
+    coarser = None
+    for width in reversed(widths):
+        bin_dir = output_dir / zoom_bin_name(width)
+        bin_dir.mkdir(parents=True, exist_ok=True)
+        coarser = _LevelWriter(chrom, width, bin_dir / f'chr{chrom}.{zoom_bin_name(width)}.tsv',
+                               coarser)
+        writers.append(coarser)
+    finest = coarser
+
+    with gzip.open(src_path, 'rt') as ifile:
+        lines = (line for line in ifile if not line.startswith('#'))
+        for chunk in iter(lambda: list(islice(lines, CHUNK_ROWS)), []):
+            rows = [rapidjson.loads(line.rstrip('\n').split('\t')[3]) for line in chunk]
+            starts = np.array([row['start'] for row in rows], np.int64)
+            ends = np.array([row['end'] for row in rows], np.int64)
+            means = np.array([row['mean'] for row in rows], np.float64)
+            finest.add(*_split_rows(starts, ends, means, widths[0]))
+    finest.finish()
+
+    for writer in writers:
+        if writer.rows > 0:
+            pysam.tabix_index(str(writer.path), seq_col=0, start_col=1, end_col=2,
+                              zerobased=False, force=True)
+        else:
+            writer.path.unlink()
+
+    return({writer.width: writer.rows for writer in writers})
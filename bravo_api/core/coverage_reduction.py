@@ -0,0 +1,133 @@
+"""
+Vectorized reduction of coverage rows into a fixed number of equal width windows.
+"""
+import numpy as np
+
+
+def window_edges(start, stop, points):
+    """
+    Integer boundaries of points windows evenly covering the inclusive [start, stop] range.
+    Window i covers [edges[i], edges[i + 1] - 1]. Windows are at least one base wide.
+    """
+    length = stop - start + 1
+    points = max(1, min(points, length))
+    return(start + (np.arange(points + 1, dtype=np.int64) * length) // points)
+
+
+class Downsampler():
+    """
+    Aggregate inclusive [starts, ends] rows into points equal width windows over [start, stop],
+    one chunk of rows at a time, so that rows of a long range need not be held in memory at once.
+    """
+
+    def __init__(self, start, stop, points):
+        self.start = start
+        self.stop = stop
+        self.edges = window_edges(start, stop, points)
+        n_windows = len(self.edges) - 1
+        self.w_min = np.full(n_windows, np.inf)
+        self.w_max = np.full(n_windows, -np.inf)
+        self.w_sum = np.zeros(n_windows)
+        self.w_len = np.zeros(n_windows)
+
+    def add(self, starts, ends, values, mins=None, maxs=None, covered=None):
+        """
+        Add a chunk of rows. See downsample for the meaning of the arguments.
+        """
+        edges = self.edges
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        mins = values if mins is None else np.asarray(mins, dtype=np.float64)
+        maxs = values if maxs is None else np.asarray(maxs, dtype=np.float64)
+        density = (np.ones(len(values)) if covered is None else
+                   np.asarray(covered, dtype=np.float64) / (ends - starts + 1))
+
+        # Clip rows to the requested range and drop those outside it.
+        lo = np.maximum(starts, self.start)
+        hi = np.minimum(ends, self.stop)
+        keep = lo <= hi
+        lo, hi, values = lo[keep], hi[keep], values[keep]
+        mins, maxs, density = mins[keep], maxs[keep], density[keep]
+
+        # Split rows at window boundaries into one piece per (row, window) overlap.
+        first_win = np.searchsorted(edges, lo, side='right') - 1
+        last_win = np.searchsorted(edges, hi, side='right') - 1
+        n_pieces = last_win - first_win + 1
+        row_idx = np.repeat(np.arange(len(lo)), n_pieces)
+        offsets = np.arange(n_pieces.sum()) - np.repeat(np.cumsum(n_pieces) - n_pieces, n_pieces)
+        win = first_win[row_idx] + offsets
+
+        piece_lo = np.maximum(lo[row_idx], edges[win])
+        piece_hi = np.minimum(hi[row_idx] + 1, edges[win + 1])
+        piece_len = (piece_hi - piece_lo) * density[row_idx]
+
+        np.minimum.at(self.w_min, win, mins[row_idx])
+        np.maximum.at(self.w_max, win, maxs[row_idx])
+        np.add.at(self.w_sum, win, values[row_idx] * piece_len)
+        np.add.at(self.w_len, win, piece_len)
+
+    def result(self):
+        """
+        @return dict of numpy arrays: start, end, min, mean, max, covered (bases with data).
+            Windows without data have nan min, mean, and max.
+        """
+        empty = self.w_len == 0
+        w_min = np.where(empty, np.nan, self.w_min)
+        w_max = np.where(empty, np.nan, self.w_max)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w_mean = self.w_sum / self.w_len
+
+        return({'start': self.edges[:-1], 'end': self.edges[1:] - 1,
+                'min': w_min, 'mean': w_mean, 'max': w_max,
+                'covered': np.rint(self.w_len).astype(np.int64)})
+
+
+def downsample(starts, ends, values, start, stop, points, mins=None, maxs=None, covered=None):
+    """
+    Aggregate inclusive [starts, ends] rows with values into windows over [start, stop].
+    Rows spanning several windows contribute to each of them. The mean is weighted by the
+    number of covered bases in each window.
+
+    Rows that are already aggregates, such as zoom levels, pass their own mins, maxs, and
+    covered base counts. A partially overlapped row contributes covered bases in proportion
+    to the overlap.
+
+    @return dict of numpy arrays: start, end, min, mean, max, covered (bases with data).
+        Windows without data have nan min, mean, and max.
+    """
+    downsampler = Downsampler(start, stop, points)
+    downsampler.add(starts, ends, values, mins, maxs, covered)
+    return(downsampler.result())
+
+
+def summarize(starts, ends, values, start, stop, thresholds):
+    """
+    Depth summary of the inclusive [start, stop] interval. Positions without rows count as 0.
+
+    @return dict with bases (interval length), mean depth, and above: the fraction of bases with
+        depth at or above each threshold keyed by the threshold as a string.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    lengths = np.maximum(0, np.minimum(ends, stop) - np.maximum(starts, start) + 1)
+    bases = int(stop - start + 1)
+    return({'bases': bases,
+            'mean': float((values * lengths).sum() / bases),
+            'above': {str(t): float(lengths[values >= t].sum() / bases) for t in thresholds}})
+
+
+def combine_summaries(summaries):
+    """
+    Summary of several disjoint intervals from their individual summaries.
+    """
+    bases = sum(summary['bases'] for summary in summaries)
+    if bases == 0:
+        return({'bases': 0, 'mean': 0.0, 'above': {}})
+    keys = summaries[0]['above'].keys()
+    return({'bases': bases,
+            'mean': sum(summary['mean'] * summary['bases'] for summary in summaries) / bases,
+            'above': {key: sum(summary['above'][key] * summary['bases'] for summary in summaries)
+                      / bases for key in keys}})
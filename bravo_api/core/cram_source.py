@@ -1,22 +1,34 @@
 from abc import ABC, abstractmethod
 
 
+class CramSourceInaccessibleError(Exception):
+    pass
+
+
 class CramSource(ABC):
     """
-    Validate and provide read from crams files.
+    Validate and provide reads from per sample CRAM files.
     """
 
     def __init__(self, src, ref):
-        pass
+        self.src = src
+        self.ref = ref
 
     @abstractmethod
     def validate(self):
         pass
 
     @abstractmethod
-    def read_seqs(pos, ref, alt, sample_no, sample_het):
+    def read_seqs(self, sample_id, chrom, start, stop):
+        """
+        Reads of the sample overlapping the 0-based half-open [start, stop) interval.
+        @return tuple of (pysam.AlignmentHeader, list of pysam.AlignedSegment)
+        """
         pass
 
     @abstractmethod
-    def sample_id_to_location(sample_id):
+    def sample_id_to_location(self, sample_id):
         pass
+
+    def stats(self):
+        return({})
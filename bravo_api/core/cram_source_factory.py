@@ -0,0 +1,15 @@
+"""
+Generate CRAM source appropriate for the location of the sample CRAMs.
+"""
+from bravo_api.core.cram_source import CramSource
+from bravo_api.core.fs_cram_source import FSCramSource
+from bravo_api.core.s3_cram_source import S3CramSource
+
+
+class CramSourceFactory():
+    @staticmethod
+    def build(src: str, ref: str, cache_dir: str = None, cache_bytes: int = 1 << 30,
+              endpoint_url: str = None) -> CramSource:
+        if src.startswith('s3://'):
+            return(S3CramSource(src, ref, cache_dir, cache_bytes, endpoint_url))
+        return(FSCramSource(src, ref))
@@ -3,7 +3,9 @@ Coverage bins are:
     Continugous positions with difference in mean and median read depth less than the bin value
     are consolidate together.
 """
-from bravo_api.core.coverage_provider import CoverageProvider, CoverageSourceInaccessibleError
+from bravo_api.core.coverage_provider import (CoverageProvider, CoverageSourceInaccessibleError,
+                                              ZOOM_PREFIX)
+from bravo_api.core.tabix_pool import TabixHandlePool
 from pathlib import Path
 import rapidjson
 import pysam
@@ -12,10 +14,11 @@ import os
 
 class FSCoverageProvider(CoverageProvider):
 
-    def __init__(self, src: str):
+    def __init__(self, src: str, pool_size: int = 32):
         self.source = Path(src)
         self.validate_source()
         self.catalog = self.discover_files()
+        self.handle_pool = TabixHandlePool(pool_size)
 
     def validate_source(self):
         extant = self.source.exists()
@@ -62,10 +65,12 @@ class FSCoverageProvider(CoverageProvider):
     def discover_files(self):
         """
         Find and organize the chrN.bin_X.YZ.tar.gz coverage files into a dictionary organized by
-        bin then chromosome.
+        bin then chromosome. Zoom levels present in the source are included as extra bins.
         """
         result = {}
-        for bin_name in self._bins:
+        zoom_bins = sorted(path.name for path in self.source.glob(f'{ZOOM_PREFIX}*')
+                           if path.is_dir())
+        for bin_name in self._bins + zoom_bins:
             bin_dir = self.source.joinpath(bin_name)
             bin_files = bin_dir.glob('*.tsv.gz')
 
@@ -96,9 +101,34 @@ class FSCoverageProvider(CoverageProvider):
         if(not cov_path):
             return(result)
 
-        tabixfile = pysam.TabixFile(cov_path.as_posix())
-
-        for row in tabixfile.fetch(chrom, max(1, start - 1), stop, parser=pysam.asTuple()):
-            result.append(rapidjson.loads(row[3])) #HX 3->2
+        with self.handle_pool.handle((cov_bin, chrom), cov_path.as_posix()) as tabixfile:
+            for row in tabixfile.fetch(chrom, max(1, start - 1), stop, parser=pysam.asTuple()):
+                result.append(rapidjson.loads(row[3])) #HX 3->2
 
         return(result)
+
+    def iter_coverage(self, cov_bin, chrom, start, stop):
+        """
+        Yield dicts from the json data of appropriate coverage file while reading it
+        """
+        cov_path = self.lookup_coverage_path(cov_bin, chrom)
+        if(not cov_path):
+            return
+
+        # Handle stays checked out until the generator is exhausted or closed. Discarded if reading fails.
+        key = (cov_bin, chrom)
+        tabixfile = self.handle_pool.acquire(key, cov_path.as_posix())
+        try:
+            for row in tabixfile.fetch(chrom, max(1, start - 1), stop, parser=pysam.asTuple()):
+                yield(rapidjson.loads(row[3]))
+        except GeneratorExit:
+            self.handle_pool.release(key, tabixfile)
+            raise
+        except Exception:
+            tabixfile.close()
+            raise
+        else:
+            self.handle_pool.release(key, tabixfile)
+
+    def stats(self):
+        return({'tabix_pool': self.handle_pool.stats()})
@@ -0,0 +1,28 @@
+"""
+Sample CRAMs in a local directory laid out as <src>/<md5 of sample id[:2]>/<sample id>.cram
+"""
+from bravo_api.core.cram_source import CramSource, CramSourceInaccessibleError
+import hashlib
+import pysam
+import os
+
+
+class FSCramSource(CramSource):
+
+    def __init__(self, src, ref):
+        super().__init__(src, ref)
+        self.validate()
+
+    def validate(self):
+        if not os.path.isdir(self.src):
+            raise CramSourceInaccessibleError(f'CRAM source {self.src} must be a directory.')
+        return(True)
+
+    def sample_id_to_location(self, sample_id):
+        return(os.path.join(self.src, hashlib.md5(sample_id.encode()).hexdigest()[:2],
+                            sample_id + '.cram'))
+
+    def read_seqs(self, sample_id, chrom, start, stop):
+        with pysam.AlignmentFile(self.sample_id_to_location(sample_id), 'rc',
+                                 reference_filename=self.ref) as icram:
+            return(icram.header, list(icram.fetch(chrom, start, stop)))
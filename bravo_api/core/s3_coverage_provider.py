@@ -1,26 +1,59 @@
 """
 Provide coverage bin data backed by an S3 object.
+    Tabix indexes of all bins & chromosomes are downloaded by warm_up at app startup and kept in
+    memory. Records are read with byte range requests for the BGZF blocks the index points to, and
+    the decompressed blocks are kept in an on-disk LRU cache so that repeated views of the same region
+    stay local. The cache directory is meant to be shared by all workers on the host, which keep it
+    within one cache_bytes budget together. Without one, a directory per source under the system
+    temporary directory is used.
+
+    The listing of coverage objects is saved to a manifest in the cache directory and reused by
+    workers started within MANIFEST_MAX_AGE seconds instead of listing the bucket again.
 """
-from bravo_api.core.coverage_provider import CoverageProvider, CoverageSourceInaccessibleError
+from bravo_api.core.coverage_provider import (CoverageProvider, CoverageSourceInaccessibleError,
+                                              ZOOM_PREFIX)
+from bravo_api.core.tabix_index import (TabixIndex, TabixIndexError, read_bgzf_block,
+                                        MAX_BLOCK_SIZE)
+from bravo_api.core.block_cache import BlockCache
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
+from pathlib import Path
+import threading
 import rapidjson
-import pysam
+import tempfile
+import hashlib
+import logging
+import time
 import re
+import os
 import boto3
 from botocore.exceptions import ClientError
 from functools import reduce
 
+LIST_PAGE_SIZE = 1000
+HEAD_THREADS = 16
+MANIFEST_MAX_AGE = 24 * 60 * 60
+
 
 class S3CoverageProvider(CoverageProvider):
 
-    def __init__(self, src):
+    def __init__(self, src, cache_dir=None, cache_bytes=1 << 30):
         self.client = boto3.client('s3')
         self.src = src
+        if not cache_dir:
+            digest = hashlib.sha1(src.encode()).hexdigest()[:12]
+            cache_dir = Path(tempfile.gettempdir()) / f'bravo_coverage_{digest}'
         split_url = urlparse(self.src)
         self.bucket = split_url.netloc
         self.prefix = split_url.path.lstrip('/')
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.cache_dir / 'catalog.json'
         self.validate_source()
         self.catalog = self.discover_files()
+        self.block_cache = BlockCache(self.cache_dir / 'blocks', cache_bytes)
+        self._indexes = {}
+        self._indexes_lock = threading.Lock()
 
     def validate_source(self):
         """
@@ -78,16 +111,19 @@ class S3CoverageProvider(CoverageProvider):
         All coverage files expected to be readable.
         Return list of messages to the contrary.
         """
-        messages = []
         all_paths = reduce(S3CoverageProvider.simple_dict_flat, self.catalog.values(), [])
 
-        for path in all_paths:
+        def check(path):
             try:
                 self.client.head_object(Bucket=self.bucket, Key=path)
             except ClientError as err:
                 err_msg = err.response['Error']['Message']
-                messages.append(f'{self.bucket}/{path}: {err_msg}')
-        return(messages)
+                return(f'{self.bucket}/{path}: {err_msg}')
+            return(None)
+
+        with ThreadPoolExecutor(max_workers=HEAD_THREADS) as executor:
+            results = list(executor.map(check, all_paths))
+        return([msg for msg in results if msg is not None])
 
     def evaluate_catalog(self):
         warn_msgs = []
@@ -95,10 +131,41 @@ class S3CoverageProvider(CoverageProvider):
         warn_msgs.extend(self.evaluate_chrom_readability())
         return(warn_msgs)
 
+    def list_keys(self):
+        """
+        Keys of all objects under the prefix, following continuation tokens.
+        """
+        paginator = self.client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=self.prefix,
+                                   PaginationConfig={'PageSize': LIST_PAGE_SIZE})
+        return([item['Key'] for page in pages for item in page.get('Contents', [])])
+
+    def read_manifest(self):
+        """
+        Coverage keys saved by a previous listing of this source, or None if absent or stale.
+        """
+        try:
+            with open(self.manifest_path) as ifile:
+                manifest = rapidjson.load(ifile)
+        except (FileNotFoundError, ValueError):
+            return(None)
+
+        if manifest.get('src') != self.src or time.time() - manifest['created'] > MANIFEST_MAX_AGE:
+            return(None)
+        return(manifest['keys'])
+
+    def write_manifest(self, keys):
+        # Write then rename so concurrently starting workers never read a partial manifest.
+        tmp_path = self.manifest_path.with_name(f'.{self.manifest_path.name}.{os.getpid()}')
+        with open(tmp_path, 'w') as ofile:
+            rapidjson.dump({'src': self.src, 'created': time.time(), 'keys': keys}, ofile)
+        os.replace(tmp_path, self.manifest_path)
+
     def discover_files(self):
         """
         Find and organize the chrN.bin_X.YZ.tar.gz coverage files into a dictionary organized by
-        bin then chromosome. Form of bin-chr-file index will be:
+        bin then chromosome. Zoom levels present under the prefix are included as extra bins.
+        Form of bin-chr-file index will be:
         {
           'bin_0.25': {'chr1': 's3://bucket/prefix/chr1.bin_0.25.tsv.gz',
                       ...,
@@ -107,19 +174,21 @@ class S3CoverageProvider(CoverageProvider):
           'bin_full': {...}
         }
         """
-        split_url = urlparse(self.src)
-        bucket = split_url.netloc
-        prefix = split_url.path.lstrip('/')
+        tsv_gz_keys = self.read_manifest()
+        if tsv_gz_keys is None:
+            tsv_gz_keys = [obj_key for obj_key in self.list_keys() if obj_key.endswith('.tsv.gz')]
+            self.write_manifest(tsv_gz_keys)
 
-        obj_resp = self.client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-        all_keys = [item['Key'] for item in obj_resp['Contents']]
-        tsv_gz_keys = [obj_key for obj_key in all_keys if obj_key.endswith('.tsv.gz')]
+        zoom_bins = sorted({key[len(self.prefix):].lstrip('/').split('/')[0]
+                            for key in tsv_gz_keys
+                            if key[len(self.prefix):].lstrip('/').startswith(ZOOM_PREFIX)})
 
         chr_patt = re.compile(r'.*chr([0-9X]{1,2})')
         result = {}
-        for bin_name in self._bins:
+        for bin_name in self._bins + zoom_bins:
             result[bin_name] = {}
-            bin_keys = [item for item in tsv_gz_keys if item.startswith(f'{prefix}/{bin_name}')]
+            bin_keys = [item for item in tsv_gz_keys
+                        if item.startswith(f'{self.prefix}/{bin_name}/')]
 
             for key in bin_keys:
                 chr = chr_patt.match(key).group(1)
@@ -132,6 +201,102 @@ class S3CoverageProvider(CoverageProvider):
         """
         return(self.catalog.get(cov_bin, {}).get(chrom))
 
+    def lookup_index(self, cov_bin, chrom):
+        """
+        Return (TabixIndex, object size) for the coverage file. Downloaded once and kept.
+        """
+        with self._indexes_lock:
+            cached = self._indexes.get((cov_bin, chrom))
+        if cached is not None:
+            return(cached)
+
+        cov_path = self.lookup_coverage_path(cov_bin, chrom)
+        raw = self.client.get_object(Bucket=self.bucket, Key=f'{cov_path}.tbi')['Body'].read()
+        size = self.client.head_object(Bucket=self.bucket, Key=cov_path)['ContentLength']
+        cached = (TabixIndex(raw), size)
+
+        with self._indexes_lock:
+            self._indexes[(cov_bin, chrom)] = cached
+        return(cached)
+
+    def warm_up(self):
+        """
+        Download the tabix indexes of all coverage files in the catalog, a few at a time.
+        Files whose index can't be read are logged and left to fail when requested.
+        """
+        def load(key):
+            try:
+                self.lookup_index(*key)
+            except (ClientError, TabixIndexError) as err:
+                logging.warning(f'Coverage index of {self.lookup_coverage_path(*key)} not loaded: {err}')
+
+        keys = [(cov_bin, chrom) for cov_bin, cov_files in self.catalog.items() for chrom in cov_files]
+        with ThreadPoolExecutor(max_workers=HEAD_THREADS) as executor:
+            list(executor.map(load, keys))
+
+    def read_blocks(self, cov_path, size, offset, last_offset):
+        """
+        Yield (offset, decompressed bytes) of consecutive blocks from offset through the block
+        starting at last_offset. Cached blocks are used as is; a run of missing blocks is fetched
+        with a single range request and added to the cache.
+        """
+        while offset <= last_offset and offset < size:
+            cached = self.block_cache.get(cov_path, offset)
+            if cached is not None:
+                block_size, data = cached
+                yield(offset, data)
+                offset += block_size
+                continue
+
+            range_end = min(size, last_offset + MAX_BLOCK_SIZE) - 1
+            resp = self.client.get_object(Bucket=self.bucket, Key=cov_path,
+                                          Range=f'bytes={offset}-{range_end}')
+            buffer = resp['Body'].read()
+            pos = 0
+            while offset + pos <= last_offset:
+                block = read_bgzf_block(buffer, pos)
+                if block is None:
+                    break
+                block_size, data = block
+                self.block_cache.put(cov_path, offset + pos, block_size, data)
+                yield(offset + pos, data)
+                pos += block_size
+            if pos == 0:
+                raise TabixIndexError(f'Incomplete BGZF block at {offset} of {cov_path}.')
+            offset += pos
+
+    def fetch_lines(self, cov_bin, chrom, begin, end):
+        """
+        Yield the tab split records overlapping the 0-based half-open [begin, end) interval.
+        """
+        cov_path = self.lookup_coverage_path(cov_bin, chrom)
+        index, size = self.lookup_index(cov_bin, chrom)
+
+        for chunk in index.chunks(chrom, begin, end):
+            last_offset = chunk.end >> 16
+            if chunk.end & 0xffff == 0:
+                last_offset -= 1
+
+            tail = b''
+            for offset, block in self.read_blocks(cov_path, size, chunk.begin >> 16, last_offset):
+                if offset == chunk.end >> 16:
+                    block = block[:chunk.end & 0xffff]
+                if offset == chunk.begin >> 16:
+                    block = block[chunk.begin & 0xffff:]
+
+                # Records may span blocks. Hold back the trailing partial line.
+                lines = (tail + block).split(b'\n')
+                tail = lines.pop()
+                for line in lines:
+                    fields = line.decode().split('\t')
+                    if fields[0].startswith(index.meta):
+                        continue
+                    position = index.overlaps(fields, chrom, begin, end)
+                    if position > 0:
+                        return
+                    if position == 0:
+                        yield(fields)
+
     def coverage(self, cov_bin, chrom, start, stop):
         """
         Provide list of dicts of from the json data of appropriate coverage file
@@ -145,10 +310,19 @@ class S3CoverageProvider(CoverageProvider):
         if(not cov_path):
             return(result)
 
-        s3_cov_path = f's3://{self.bucket}/{cov_path}'
-        tabixfile = pysam.TabixFile(s3_cov_path)
-
-        for row in tabixfile.fetch(chrom, max(1, start - 1), stop, parser=pysam.asTuple()):
-            result.append(rapidjson.loads(row[3]))
+        for fields in self.fetch_lines(cov_bin, chrom, max(1, start - 1), stop):
+            result.append(rapidjson.loads(fields[3]))
 
         return(result)
+
+    def iter_coverage(self, cov_bin, chrom, start, stop):
+        if(not self.lookup_coverage_path(cov_bin, chrom)):
+            return
+
+        for fields in self.fetch_lines(cov_bin, chrom, max(1, start - 1), stop):
+            yield(rapidjson.loads(fields[3]))
+
+    def stats(self):
+        with self._indexes_lock:
+            n_indexes = len(self._indexes)
+        return({'indexes': n_indexes, 'block_cache': self.block_cache.stats()})
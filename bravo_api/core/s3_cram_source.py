@@ -0,0 +1,195 @@
+"""
+Sample CRAMs in an S3 compatible object store laid out as <prefix>/<md5 of sample id[:2]>/<sample id>.cram
+    The .crai index and the CRAM header of the max_samples most recently read samples are kept in
+    memory. A slice is read by fetching only the data containers the index lists as overlapping it, with one range
+    request per container over a shared connection pool. Fetched containers are kept in an on-disk
+    LRU cache of cache_bytes, so the neighbouring slices of a variant are read from disk. Without a
+    cache_dir, containers go to a temporary directory removed with the source.
+
+    The containers are decoded by pysam from a temporary file in <cache_dir>/tmp holding the header,
+    the containers, and the end of file container. Containers are self contained, so their offsets
+    in the source don't matter.
+"""
+from bravo_api.core.cram_source import CramSource, CramSourceInaccessibleError
+from bravo_api.core.block_cache import BlockCache
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from urllib.parse import urlparse
+from collections import OrderedDict
+from bisect import bisect_right
+from pathlib import Path
+import threading
+import tempfile
+import hashlib
+import boto3
+import pysam
+import gzip
+import os
+
+# End of file container of CRAM 3.x files.
+CRAM3_EOF = bytes.fromhex('0f000000ffffffff0fe0454f4600000000010005bdd94f0001000606010001000100ee63014b')
+HTTP_POOL_SIZE = 32
+MAX_SAMPLES = 1000
+
+
+class CramIndex():
+    """
+    Containers of a CRAM from its .crai index.
+    """
+
+    def __init__(self, raw):
+        self.slices = []
+        for line in gzip.decompress(raw).decode().splitlines():
+            if not line:
+                continue
+            seq_id, start, span, container_offset, _, _ = (int(field) for field in line.split('\t'))
+            self.slices.append((seq_id, start, span, container_offset))
+        self.offsets = sorted({slice_[3] for slice_ in self.slices})
+
+    @property
+    def header_end(self):
+        """
+        Offset of the first data container, where file definition and header container end.
+        """
+        return(self.offsets[0] if self.offsets else None)
+
+    def containers(self, seq_id, start, stop):
+        """
+        Byte ranges of containers with slices overlapping the 1-based inclusive [start, stop] interval.
+        @return list of (offset, end offset or None for the last container)
+        """
+        offsets = sorted({container_offset for slice_seq, slice_start, span, container_offset
+                          in self.slices
+                          if slice_seq == seq_id and slice_start <= stop
+                          and slice_start + span - 1 >= start})
+        result = []
+        for offset in offsets:
+            following = bisect_right(self.offsets, offset)
+            result.append((offset, self.offsets[following] if following < len(self.offsets) else None))
+        return(result)
+
+
+class S3CramSource(CramSource):
+
+    def __init__(self, src, ref, cache_dir=None, cache_bytes=1 << 30, endpoint_url=None,
+                 max_samples=MAX_SAMPLES):
+        """
+        @param endpoint_url Url of an S3 compatible service other than AWS.
+        @param max_samples Number of samples with index and header kept in memory.
+        """
+        super().__init__(src, ref)
+        split_url = urlparse(self.src)
+        self.bucket = split_url.netloc
+        self.prefix = split_url.path.strip('/')
+        self.endpoint_url = endpoint_url
+        self._tmp_dir = None if cache_dir else tempfile.TemporaryDirectory(prefix='bravo_crams_')
+        self.cache_dir = Path(cache_dir or self._tmp_dir.name)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.container_cache = BlockCache(self.cache_dir / 'containers', cache_bytes)
+        # Kept apart from the read slices the cache directory may also hold.
+        self.tmp_dir = self.cache_dir / 'tmp'
+        self.tmp_dir.mkdir(exist_ok=True)
+        self._lock = threading.Lock()
+        self._client = None
+        self._client_pid = None
+        self.max_samples = max_samples
+        self._samples = OrderedDict()
+        self.validate()
+
+    @property
+    def client(self):
+        """
+        Client shared by all threads of the process. Its connection pool is reused between requests,
+        but not across a fork.
+        """
+        with self._lock:
+            if self._client_pid != os.getpid():
+                self._client = boto3.client('s3', endpoint_url=self.endpoint_url,
+                                            config=Config(max_pool_connections=HTTP_POOL_SIZE))
+                self._client_pid = os.getpid()
+            return(self._client)
+
+    def validate(self):
+        if urlparse(self.src).scheme != 's3':
+            raise CramSourceInaccessibleError('Url scheme is not s3')
+        try:
+            self.client.list_objects_v2(Bucket=self.bucket, Prefix=self.prefix, MaxKeys=1)
+        except ClientError as err:
+            msg = err.response['Error']['Message']
+            raise CramSourceInaccessibleError(f'{self.bucket}: {msg}')
+        return(True)
+
+    def sample_id_to_location(self, sample_id):
+        key = f'{hashlib.md5(sample_id.encode()).hexdigest()[:2]}/{sample_id}.cram'
+        return(f'{self.prefix}/{key}' if self.prefix else key)
+
+    def _get(self, key, start=None, end=None):
+        """
+        Bytes [start, end) of the object. Open ended if end is None.
+        """
+        if start is None:
+            return(self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read())
+        byte_range = f'bytes={start}-{"" if end is None else end - 1}'
+        return(self.client.get_object(Bucket=self.bucket, Key=key, Range=byte_range)['Body'].read())
+
+    def lookup_sample(self, sample_id):
+        """
+        @return tuple of (CramIndex, header bytes, reference ids by name) of the sample. Kept in memory.
+        """
+        with self._lock:
+            cached = self._samples.get(sample_id)
+            if cached is not None:
+                self._samples.move_to_end(sample_id)
+                return(cached)
+
+        key = self.sample_id_to_location(sample_id)
+        index = CramIndex(self._get(f'{key}.crai'))
+        header = self._get(key, 0, index.header_end) if index.header_end else self._get(key)
+        with tempfile.NamedTemporaryFile(dir=self.tmp_dir, suffix='.cram') as tmp:
+            tmp.write(header + CRAM3_EOF)
+            tmp.flush()
+            with pysam.AlignmentFile(tmp.name, 'rc', reference_filename=self.ref) as icram:
+                tids = {name: tid for tid, name in enumerate(icram.references)}
+        cached = (index, header, tids)
+
+        with self._lock:
+            self._samples[sample_id] = cached
+            self._samples.move_to_end(sample_id)
+            while len(self._samples) > self.max_samples:
+                self._samples.popitem(last=False)
+        return(cached)
+
+    def read_container(self, key, offset, end):
+        cached = self.container_cache.get(key, offset)
+        if cached is not None:
+            return(cached[1])
+        data = self._get(key, offset, end)
+        if end is None:
+            # Last container runs to the end of file container, which is appended separately.
+            if data.endswith(CRAM3_EOF):
+                data = data[:-len(CRAM3_EOF)]
+        self.container_cache.put(key, offset, len(data), data)
+        return(data)
+
+    def read_seqs(self, sample_id, chrom, start, stop):
+        index, header, tids = self.lookup_sample(sample_id)
+        key = self.sample_id_to_location(sample_id)
+        tid = tids.get(chrom)
+        containers = [] if tid is None else index.containers(tid, start + 1, stop)
+
+        with tempfile.NamedTemporaryFile(dir=self.tmp_dir, suffix='.cram') as tmp:
+            tmp.write(header)
+            for offset, end in containers:
+                tmp.write(self.read_container(key, offset, end))
+            tmp.write(CRAM3_EOF)
+            tmp.flush()
+            with pysam.AlignmentFile(tmp.name, 'rc', reference_filename=self.ref) as icram:
+                reads = [read for read in icram.fetch(until_eof=True)
+                         if read.reference_id == tid and read.reference_start < stop
+                         and read.reference_end is not None and read.reference_end > start]
+                return(icram.header, reads)
+
+    def stats(self):
+        with self._lock:
+            samples = len(self._samples)
+        return({'samples': samples, 'containers': self.container_cache.stats()})
@@ -0,0 +1,110 @@
+"""
+Flask commands maintaining the read slices served to the read viewer.
+"""
+from bravo_api.core.slice_cache import SliceCache
+from bravo_api.core.variant_map import convert_variant_map as convert_variant_map_file
+from bravo_api.core.cram_source_factory import CramSourceFactory
+from bravo_api.models.sequences import SequencesClient
+from flask import current_app
+from flask.cli import with_appcontext
+from multiprocessing import Pool
+from pathlib import Path
+import click
+import sys
+
+_client = None
+
+
+@click.command('sequences-cache')
+@click.option('--prune', is_flag = True, help = 'Evict least recently used slices beyond the budget.')
+@click.option('--max-bytes', type = click.IntRange(min = 0),
+              help = 'Budget to prune to. Defaults to SEQUENCES_CACHE_BYTES.')
+@with_appcontext
+def sequences_cache(prune, max_bytes):
+    """
+    Reports usage of SEQUENCES_CACHE_DIR and optionally prunes it.
+    """
+    if max_bytes is None:
+        max_bytes = current_app.config.get('SEQUENCES_CACHE_BYTES')
+    cache = SliceCache(current_app.config['SEQUENCES_CACHE_DIR'], max_bytes)
+    if prune:
+        if max_bytes is None:
+            raise click.UsageError('No budget to prune to. Set SEQUENCES_CACHE_BYTES or --max-bytes.')
+        evicted = cache.prune()
+        sys.stdout.write(f"Evicted {len(evicted)} slice(s).\n")
+    usage = cache.usage()
+    sys.stdout.write(f"{usage['slices']} slice(s), {usage['bytes']} byte(s) of {max_bytes} in "
+                     f"{cache.cache_dir}.\n")
+
+
+def _init_prewarm(client_args, client_kwargs, source_args=None):
+    global _client
+    if source_args is not None:
+        client_kwargs = dict(client_kwargs, cram_source = CramSourceFactory.build(*source_args))
+    _client = SequencesClient(*client_args, **client_kwargs)
+
+
+def _prewarm_variant(args):
+    variant_id, max_samples = args
+    chrom, pos, ref, alt = variant_id.split('-')
+    samples = _client.get_variant_samples(chrom, int(pos), ref, alt)
+    if samples is None:
+        return(variant_id, None)
+    n_slices = 0
+    for sample_het, sample_ids in ((False, samples[0]), (True, samples[1])):
+        limit = min(len(sample_ids), _client.max_het if sample_het else _client.max_hom, max_samples)
+        for sample_no in range(1, limit + 1):
+            if _client.get_sequences(chrom, int(pos), ref, alt, sample_no, sample_het):
+                n_slices += 1
+    return(variant_id, n_slices)
+
+
+@click.command('prewarm-sequences')
+@click.option('--samples', default = 5, show_default = True, type = click.IntRange(min = 1),
+              help = 'Samples per genotype to extract for each variant.')
+@click.argument('threads', required = True, type = int)
+@click.argument('variants_file', type = click.File('r'))
+@with_appcontext
+def prewarm_sequences(samples, threads, variants_file):
+    """
+    Extracts read slices of listed variants into SEQUENCES_CACHE_DIR ahead of the first view.
+
+    ARGUMENTS:
+
+    threads -- number of parallel processes to use.\n
+
+    variants_file -- file with one CHROM-POS-REF-ALT variant id per line, e.g. the most viewed
+    variants from access logs or ClinVar pathogenic sites. Use - to read standard input.\n
+    """
+    config = current_app.config
+    client_args = (config['SEQUENCES_DIR'], config['REFERENCE_SEQUENCE'], config['SEQUENCES_CACHE_DIR'], 100)
+    # Workers wait for each extraction to finish rather than timing out.
+    client_kwargs = {'extract_threads': 1, 'extract_timeout': None,
+                     'cache_bytes': config.get('SEQUENCES_CACHE_BYTES')}
+    source_args = None
+    if config.get('SEQUENCES_CRAM_SOURCE'):
+        source_args = (config['SEQUENCES_CRAM_SOURCE'], config['REFERENCE_SEQUENCE'], config['SEQUENCES_CACHE_DIR'],
+                       config.get('SEQUENCES_CRAM_CACHE_BYTES', 1 << 30), config.get('SEQUENCES_S3_ENDPOINT_URL'))
+    jobs = [(line.strip(), samples) for line in variants_file if line.strip() and not line.startswith('#')]
+
+    with Pool(threads, initializer = _init_prewarm, initargs = (client_args, client_kwargs, source_args)) as p:
+        for variant_id, n_slices in p.imap_unordered(_prewarm_variant, jobs):
+            if n_slices is None:
+                sys.stdout.write(f"{variant_id} not found in variant map.\n")
+            else:
+                sys.stdout.write(f"Cached {n_slices} slice(s) of {variant_id}.\n")
+
+
+@click.command('convert-variant-map')
+@click.argument('crams_dir', type = click.Path(exists = True, file_okay = False))
+def convert_variant_map(crams_dir):
+    """
+    Converts variant_map.tsv.gz to the memory-mapped variant_map.bin layout used in its place.
+
+    ARGUMENTS:
+
+    crams_dir -- SEQUENCES_DIR with variant_map.tsv.gz. variant_map.bin is written next to it.\n
+    """
+    src_path = Path(crams_dir) / 'variant_map.tsv.gz'
+    n_variants = convert_variant_map_file(src_path, Path(crams_dir) / 'variant_map.bin')
+    sys.stdout.write(f"Converted {n_variants} variant(s) from {src_path}.\n")
@@ -0,0 +1,138 @@
+"""
+Byte budget for the directory of read slices extracted from CRAMs.
+    Each slice is a <name>.bam file and its <name>.bam.bai index, evicted together. The modification
+    time of the .bam is its last access time: serving a slice touches the file, so accesses by any
+    worker using the directory are visible to the others without shared state.
+
+    Each worker tracks an estimate of the directory size from its last scan plus the slices it added
+    since. Only when the estimate is above the budget (the high-water mark) does it scan the directory
+    and evict least recently used slices down to low_water of the budget, under an flock on
+    <cache_dir>/.slice_index.lock so that workers don't prune concurrently.
+
+    Slices accessed within grace_seconds are never evicted, so a path handed to a request is not
+    removed before the response opens it. Once open, unlinking the file doesn't affect the response.
+"""
+from pathlib import Path
+import threading
+import fcntl
+import time
+import os
+
+LOCK_NAME = '.slice_index.lock'
+LOW_WATER = 0.9
+
+
+class SliceCache():
+
+    def __init__(self, cache_dir, max_bytes, grace_seconds=60, low_water=LOW_WATER):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._estimate = None
+        self.evictions = 0
+
+    def touch(self, name):
+        """
+        Record an access to the slice.
+        @return False if the slice no longer exists.
+        """
+        try:
+            os.utime(self.cache_dir / name)
+        except FileNotFoundError:
+            return(False)
+        return(True)
+
+    def added(self, name):
+        """
+        Account for a new slice, and prune if the directory is estimated to be above the budget.
+        @return list of evicted slice names.
+        """
+        size = 0
+        for path in (self.cache_dir / name, self.cache_dir / f'{name}.bai'):
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            if self._estimate is not None:
+                self._estimate += size
+                estimate = self._estimate
+            else:
+                estimate = None
+        if estimate is None:
+            estimate = sum(size for size, _ in self._slices().values())
+            with self._lock:
+                self._estimate = estimate
+        if estimate <= self.max_bytes:
+            return([])
+        return(self.prune(int(self.max_bytes * self.low_water)))
+
+    def _slices(self):
+        """
+        @return dict of slice name to (bytes of slice and index, last access time).
+        """
+        sizes = {}
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                if entry.name.endswith('.bam') and not entry.name.endswith('.tmp.bam'):
+                    stat = entry.stat()
+                    size, _ = sizes.get(entry.name, (0, 0))
+                    sizes[entry.name] = (size + stat.st_size, stat.st_mtime)
+                elif entry.name.endswith('.bam.bai') and not entry.name.endswith('.tmp.bam.bai'):
+                    name = entry.name[:-len('.bai')]
+                    size, mtime = sizes.get(name, (0, 0))
+                    sizes[name] = (size + entry.stat().st_size, mtime)
+        return(sizes)
+
+    def usage(self):
+        slices = self._slices()
+        return({'slices': len(slices),
+                'bytes': sum(size for size, _ in slices.values()),
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions})
+
+    def prune(self, max_bytes=None):
+        """
+        Evict least recently used slices until the directory is within max_bytes (the cache budget by
+        default).
+
+        @return list of evicted slice names.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with open(self.cache_dir / LOCK_NAME, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                slices = self._slices()
+                total = sum(size for size, _ in slices.values())
+                protected_after = time.time() - self.grace_seconds
+                evicted = []
+                for name in sorted(slices, key=lambda name: slices[name][1]):
+                    if total <= max_bytes:
+                        break
+                    if slices[name][1] > protected_after:
+                        break
+                    try:
+                        # Served since the scan.
+                        if (self.cache_dir / name).stat().st_mtime > protected_after:
+                            continue
+                    except FileNotFoundError:
+                        pass
+                    # Remove the slice before its index so a present slice always has one.
+                    for path in (self.cache_dir / name, self.cache_dir / f'{name}.bai'):
+                        try:
+                            path.unlink()
+                        except FileNotFoundError:
+                            pass
+                    total -= slices[name][0]
+                    evicted.append(name)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        with self._lock:
+            self._estimate = total
+            self.evictions += len(evicted)
+        return(evicted)
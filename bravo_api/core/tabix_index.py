@@ -0,0 +1,151 @@
+"""
+Minimal reader of tabix (.tbi) indexes and BGZF blocks.
+    Lets coverage be fetched from remote objects with plain byte range reads, so the index can be
+    parsed once and kept in memory and blocks can be cached, instead of pysam re-downloading the
+    index for every TabixFile opened on an s3:// url.
+
+    See the SAM/BAM and tabix specifications for the layouts.
+"""
+from collections import namedtuple
+import struct
+import gzip
+import zlib
+
+# Largest possible BGZF block, compressed or not.
+MAX_BLOCK_SIZE = 65536
+BGZF_HEADER_SIZE = 18
+
+# Tabix binning scheme: (shift, first bin) of each level from coarsest to finest.
+_BIN_LEVELS = [(26, 1), (23, 9), (20, 73), (17, 585), (14, 4681)]
+_LINEAR_SHIFT = 14
+
+Chunk = namedtuple('Chunk', ['begin', 'end'])
+
+
+class TabixIndexError(Exception):
+    """
+    Exception class indicating a malformed tabix index or BGZF block
+    """
+    pass
+
+
+def reg2bins(begin, end):
+    """
+    Bins that may hold records overlapping the 0-based half-open [begin, end) interval.
+    """
+    end -= 1
+    bins = [0]
+    for shift, first in _BIN_LEVELS:
+        bins.extend(range(first + (begin >> shift), first + (end >> shift) + 1))
+    return(bins)
+
+
+class TabixIndex():
+    """
+    Parsed tabix index. Holds per reference bins of chunks and the linear index.
+    """
+
+    def __init__(self, raw):
+        """
+        @param raw bytes of a .tbi file (BGZF compressed).
+        """
+        try:
+            data = gzip.decompress(raw)
+        except (OSError, EOFError, zlib.error) as err:
+            raise TabixIndexError(f'Not a BGZF compressed index: {err}')
+        if data[:4] != b'TBI\x01':
+            raise TabixIndexError('Not a tabix index.')
+
+        (n_ref, self.format, self.col_seq, self.col_beg, self.col_end, meta, skip,
+         l_nm) = struct.unpack_from('<8i', data, 4)
+        self.meta = chr(meta)
+        self.skip = skip
+        self.zero_based = bool(self.format & 0x10000)
+        pos = 36
+        self.names = data[pos:pos + l_nm].decode().rstrip('\0').split('\0')
+        pos += l_nm
+
+        self.bins = []
+        self.linear = []
+        for _ in range(n_ref):
+            ref_bins = {}
+            n_bin, = struct.unpack_from('<i', data, pos)
+            pos += 4
+            for _ in range(n_bin):
+                bin_id, n_chunk = struct.unpack_from('<Ii', data, pos)
+                pos += 8
+                offsets = struct.unpack_from(f'<{2 * n_chunk}Q', data, pos)
+                pos += 16 * n_chunk
+                ref_bins[bin_id] = [Chunk(*offsets[i:i + 2]) for i in range(0, len(offsets), 2)]
+            n_intv, = struct.unpack_from('<i', data, pos)
+            pos += 4
+            self.linear.append(struct.unpack_from(f'<{n_intv}Q', data, pos))
+            pos += 8 * n_intv
+            self.bins.append(ref_bins)
+
+    def chunks(self, chrom, begin, end):
+        """
+        Sorted, merged virtual offset chunks that hold every record overlapping the 0-based
+        half-open [begin, end) interval on chrom. Empty if chrom is not indexed.
+        """
+        if chrom not in self.names:
+            return([])
+        ref = self.names.index(chrom)
+        ref_bins = self.bins[ref]
+        linear = self.linear[ref]
+
+        min_offset = linear[min(begin >> _LINEAR_SHIFT, len(linear) - 1)] if linear else 0
+        candidates = sorted(chunk for bin_id in reg2bins(begin, end)
+                            for chunk in ref_bins.get(bin_id, [])
+                            if chunk.end > min_offset)
+
+        merged = []
+        for chunk in candidates:
+            if merged and chunk.begin <= merged[-1].end:
+                merged[-1] = Chunk(merged[-1].begin, max(merged[-1].end, chunk.end))
+            else:
+                merged.append(chunk)
+        return(merged)
+
+    def overlaps(self, fields, chrom, begin, end):
+        """
+        Position of a split record relative to the 0-based half-open [begin, end) interval.
+        @return -1 if before, 0 if overlapping, 1 if past the interval.
+        """
+        if fields[self.col_seq - 1] != chrom:
+            return(-1)
+        rec_begin = int(fields[self.col_beg - 1]) - (0 if self.zero_based else 1)
+        rec_end = int(fields[self.col_end - 1]) if self.col_end else rec_begin + 1
+        if rec_begin >= end:
+            return(1)
+        if rec_end <= begin:
+            return(-1)
+        return(0)
+
+
+def read_bgzf_block(buffer, pos=0):
+    """
+    Decompress the BGZF block starting at pos of buffer.
+    @return tuple of (compressed block size, decompressed bytes) or None if the buffer ends
+        before the block does.
+    """
+    if len(buffer) - pos < BGZF_HEADER_SIZE:
+        return(None)
+    if buffer[pos:pos + 4] != b'\x1f\x8b\x08\x04':
+        raise TabixIndexError(f'No BGZF block at offset {pos}.')
+
+    xlen, = struct.unpack_from('<H', buffer, pos + 10)
+    extra_pos = pos + 12
+    block_size = None
+    while extra_pos < pos + 12 + xlen:
+        si1, si2, slen = struct.unpack_from('<BBH', buffer, extra_pos)
+        if si1 == 66 and si2 == 67:
+            block_size = struct.unpack_from('<H', buffer, extra_pos + 4)[0] + 1
+        extra_pos += 4 + slen
+    if block_size is None:
+        raise TabixIndexError(f'BGZF block at offset {pos} lacks a block size.')
+    if len(buffer) - pos < block_size:
+        return(None)
+
+    data = zlib.decompress(bytes(buffer[pos + 12 + xlen:pos + block_size - 8]), -15)
+    return(block_size, data)
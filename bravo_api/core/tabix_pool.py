@@ -0,0 +1,113 @@
+"""
+Pool of open pysam.TabixFile handles.
+    Opening a TabixFile reads the whole .tbi index, which costs more than the fetch itself for the
+    small windows requested while panning. Handles are checked out for the duration of a fetch so
+    that a single handle is never iterated by two threads at once.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import pysam
+import os
+
+
+class TabixHandlePool():
+    """
+    Per-process LRU pool of idle TabixFile handles keyed by an arbitrary hashable key
+    (e.g. (bin, chrom)). Handles inherited across a fork are discarded, not shared.
+    """
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()
+        self._pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _check_pid(self):
+        """
+        After a fork (e.g. gunicorn pre-loading the app) the child must not reuse the parent's
+        handles since the underlying file offsets are shared. Forget them without closing.
+        """
+        pid = os.getpid()
+        if pid != self._pid:
+            self._idle = OrderedDict()
+            self._pid = pid
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    @staticmethod
+    def _close(handle):
+        close = getattr(handle, 'close', None)
+        if close is not None:
+            close()
+
+    def acquire(self, key, path):
+        """
+        Take an idle handle for key out of the pool, or open a new one for path.
+        """
+        with self._lock:
+            self._check_pid()
+            handles = self._idle.get(key)
+            if handles:
+                handle = handles.pop()
+                if not handles:
+                    del self._idle[key]
+                self.hits += 1
+                return(handle)
+            self.misses += 1
+        return(pysam.TabixFile(path))
+
+    def release(self, key, handle):
+        """
+        Return handle to the pool as most recently used. Evict least recently used beyond max_size.
+        """
+        evicted = []
+        with self._lock:
+            self._check_pid()
+            self._idle.setdefault(key, []).append(handle)
+            self._idle.move_to_end(key)
+            while self._idle_count() > self.max_size:
+                lru_key, lru_handles = next(iter(self._idle.items()))
+                evicted.append(lru_handles.pop(0))
+                if not lru_handles:
+                    del self._idle[lru_key]
+                self.evictions += 1
+        for handle in evicted:
+            self._close(handle)
+
+    @contextmanager
+    def handle(self, key, path):
+        """
+        Context manager checking out a handle. Handle is discarded if the body raises.
+        """
+        handle = self.acquire(key, path)
+        try:
+            yield handle
+        except Exception:
+            self._close(handle)
+            raise
+        else:
+            self.release(key, handle)
+
+    def _idle_count(self):
+        return(sum(len(handles) for handles in self._idle.values()))
+
+    def clear(self):
+        with self._lock:
+            idle = [handle for handles in self._idle.values() for handle in handles]
+            self._idle = OrderedDict()
+        for handle in idle:
+            self._close(handle)
+
+    def stats(self):
+        with self._lock:
+            self._check_pid()
+            return({'size': self._idle_count(),
+                    'max_size': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions})
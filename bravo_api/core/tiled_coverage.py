@@ -0,0 +1,153 @@
+"""
+Tile cache in front of a CoverageProvider.
+    Requests are widened to fixed tile boundaries per bin, so the overlapping windows requested
+    while scrolling resolve to the same few tiles. Decoded tiles are kept in an in-process LRU
+    bounded by the number of rows held. Optionally tiles are also written to a BlockCache
+    directory so that workers on the same host share them.
+
+    Tile t of a bin covers positions [t * width + 1, (t + 1) * width] and holds every row that
+    overlaps it, so rows crossing a tile boundary are present in both neighbouring tiles. Cached rows
+    are shared between requests, so coverage() returns copies that callers may modify.
+"""
+from bravo_api.core.coverage_provider import CoverageProvider
+from bravo_api.core.block_cache import BlockCache
+from collections import OrderedDict
+import threading
+import rapidjson
+
+# Positions per tile. Finer bins have more rows per base and get narrower tiles.
+TILE_WIDTHS = {
+    'full': 10_000,
+    'bin_0.25': 25_000,
+    'bin_0.50': 50_000,
+    'bin_0.75': 100_000,
+    'bin_1.00': 250_000,
+}
+DEFAULT_TILE_WIDTH = 250_000
+
+
+class TiledCoverageProvider(CoverageProvider):
+    """
+    Wraps another provider. Catalog and evaluation are delegated to it.
+    """
+
+    def __init__(self, provider, max_rows=500_000, cache_dir=None, cache_bytes=1 << 30,
+                 instrument=None):
+        """
+        @param provider CoverageProvider to read tiles from.
+        @param max_rows Upper bound on rows held across all tiles in memory.
+        @param cache_dir Optional directory of tiles shared between processes.
+        @param instrument Optional callable(cov_bin, outcome) invoked for every tile looked up.
+            Outcome is one of 'memory', 'disk', or 'miss'.
+        """
+        self.provider = provider
+        self.catalog = provider.catalog
+        self.max_rows = max_rows
+        self.store = BlockCache(cache_dir, cache_bytes) if cache_dir else None
+        self.instrument = instrument
+        self._lock = threading.Lock()
+        self._tiles = OrderedDict()
+        self._rows = 0
+        self.counts = {'memory': 0, 'disk': 0, 'miss': 0}
+
+    def validate_source(self):
+        return(self.provider.validate_source())
+
+    def evaluate_catalog(self):
+        return(self.provider.evaluate_catalog())
+
+    def discover_files(self):
+        return(self.provider.discover_files())
+
+    @staticmethod
+    def tile_width(cov_bin):
+        return(TILE_WIDTHS.get(cov_bin, DEFAULT_TILE_WIDTH))
+
+    def _record(self, cov_bin, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+        if self.instrument is not None:
+            self.instrument(cov_bin, outcome)
+
+    def _remember(self, key, rows):
+        with self._lock:
+            if key in self._tiles:
+                return
+            self._tiles[key] = rows
+            self._rows += len(rows)
+            while self._rows > self.max_rows and len(self._tiles) > 1:
+                _, evicted = self._tiles.popitem(last=False)
+                self._rows -= len(evicted)
+
+    def tile(self, cov_bin, chrom, tile_idx):
+        """
+        Rows overlapping a tile, from memory, the shared store, or the wrapped provider. Shared; don't modify.
+        """
+        key = (cov_bin, chrom, tile_idx)
+        with self._lock:
+            rows = self._tiles.get(key)
+            if rows is not None:
+                self._tiles.move_to_end(key)
+        if rows is not None:
+            self._record(cov_bin, 'memory')
+            return(rows)
+
+        store_key = f'{cov_bin}/{chrom}'
+        stored = self.store.get(store_key, tile_idx) if self.store else None
+        if stored is not None:
+            rows = rapidjson.loads(stored[1])
+            self._record(cov_bin, 'disk')
+        else:
+            width = self.tile_width(cov_bin)
+            rows = self.provider.coverage(cov_bin, chrom, tile_idx * width + 1,
+                                          (tile_idx + 1) * width)
+            if self.store:
+                self.store.put(store_key, tile_idx, len(rows), rapidjson.dumps(rows).encode())
+            self._record(cov_bin, 'miss')
+
+        self._remember(key, rows)
+        return(rows)
+
+    def coverage(self, cov_bin, chrom, start, stop):
+        """
+        Provide list of dicts of coverage overlapping the range, stitched from tiles.
+        """
+        width = self.tile_width(cov_bin)
+        first_tile = (max(1, start) - 1) // width
+        last_tile = (stop - 1) // width
+
+        result = []
+        for tile_idx in range(first_tile, last_tile + 1):
+            tile_start = tile_idx * width + 1
+            for row in self.tile(cov_bin, chrom, tile_idx):
+                # Rows crossing into this tile were taken from the previous one.
+                if tile_idx > first_tile and row['start'] < tile_start:
+                    continue
+                if row['end'] >= start and row['start'] <= stop:
+                    result.append(dict(row))
+        return(result)
+
+    def iter_coverage(self, cov_bin, chrom, start, stop):
+        # Streamed ranges are large and read once. Keep them from flushing the tiles.
+        return(self.provider.iter_coverage(cov_bin, chrom, start, stop))
+
+    def iter_coverage_arrays(self, cov_bin, chrom, start, stop, **kwargs):
+        return(self.provider.iter_coverage_arrays(cov_bin, chrom, start, stop, **kwargs))
+
+    def warm_up(self):
+        self.provider.warm_up()
+
+    def stats(self):
+        with self._lock:
+            lookups = sum(self.counts.values())
+            tiles = {'tiles': len(self._tiles),
+                     'rows': self._rows,
+                     'max_rows': self.max_rows,
+                     'hit_ratio': (self.counts['memory'] + self.counts['disk']) / lookups
+                     if lookups else None}
+            tiles.update(self.counts)
+        if self.store:
+            tiles['store'] = self.store.stats()
+        result = dict(self.provider.stats())
+        result['tile_cache'] = tiles
+        return(result)
@@ -0,0 +1,184 @@
+"""
+Binary layout of variant_map.tsv.gz, the table of example samples per variant.
+    variant_map.tsv.gz is converted to a variant_map.bin directory next to it:
+
+    variant_map.bin/
+    ├── meta.json            format version, contigs in file order, variant and sample counts, MAX_RANDOM_HOM_HETS
+    ├── key.bin              int64 contig index * CONTIG_SPAN + position of each variant, ascending
+    ├── allele_offsets.bin   int64 (variants + 1) offsets of "REF ALT" of each variant in allele_table
+    ├── allele_table.bin     concatenated "REF ALT" strings
+    ├── sample_offsets.bin   int64 (variants x 2) start of hom and het samples of each variant in samples
+    ├── samples.bin          int32 sample indices; hom samples of a variant followed by het samples
+    ├── name_offsets.bin     int64 (samples + 1) offsets of each sample id in name_table
+    └── name_table.bin       concatenated sample ids
+
+    A variant is found by binary search of key.bin and comparing alleles of the few variants at the
+    same position. The Nth hom or het sample id is then read directly without splitting lists.
+"""
+from pathlib import Path
+import numpy as np
+import rapidjson
+import gzip
+
+CONTIG_SPAN = 10 ** 10
+FORMAT_VERSION = 1
+NAMES = ['key', 'allele_offsets', 'allele_table', 'sample_offsets', 'samples', 'name_offsets',
+         'name_table']
+
+
+def convert_variant_map(src_path, dest_dir):
+    """
+    Stream variant_map.tsv.gz into the binary layout in dest_dir.
+    @return number of variants written
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+
+    max_random_hom_hets = 0
+    contigs = []
+    sample_index = {}
+    names = []
+    n_variants = 0
+    n_samples = 0
+    allele_offset = 0
+    last_key = -1
+    outputs = {name: open(dest_dir / f'{name}.bin', 'wb') for name in NAMES}
+    try:
+        outputs['allele_offsets'].write(np.int64(0).tobytes())
+        with gzip.open(src_path, 'rt') as ifile:
+            for line in ifile:
+                if line.startswith('#'):
+                    if line.startswith('#MAX_RANDOM_HOM_HETS='):
+                        max_random_hom_hets = int(line.rstrip().split('=')[1].strip())
+                    continue
+                chrom, pos, ref, alt, homs, hets = line.rstrip('\n').split('\t')[:6]
+                if not contigs or contigs[-1] != chrom:
+                    if chrom in contigs:
+                        raise ValueError(f'Variants of {chrom} are not contiguous in {src_path}.')
+                    contigs.append(chrom)
+                key = (len(contigs) - 1) * CONTIG_SPAN + int(pos)
+                if key < last_key:
+                    raise ValueError(f'Variants of {chrom} are not sorted by position in {src_path}.')
+                last_key = key
+
+                alleles = f'{ref} {alt}'.encode()
+                allele_offset += len(alleles)
+                outputs['key'].write(np.int64(key).tobytes())
+                outputs['allele_table'].write(alleles)
+                outputs['allele_offsets'].write(np.int64(allele_offset).tobytes())
+
+                hom_ids = homs.split(',') if homs else []
+                het_ids = hets.split(',') if hets else []
+                indices = []
+                for sample_id in hom_ids + het_ids:
+                    if sample_id not in sample_index:
+                        sample_index[sample_id] = len(names)
+                        names.append(sample_id)
+                    indices.append(sample_index[sample_id])
+                outputs['sample_offsets'].write(
+                    np.array([n_samples, n_samples + len(hom_ids)], np.int64).tobytes())
+                outputs['samples'].write(np.array(indices, np.int32).tobytes())
+                n_samples += len(indices)
+                n_variants += 1
+        outputs['sample_offsets'].write(np.array([n_samples, n_samples], np.int64).tobytes())
+
+        name_offset = 0
+        outputs['name_offsets'].write(np.int64(0).tobytes())
+        for sample_id in names:
+            encoded = sample_id.encode()
+            name_offset += len(encoded)
+            outputs['name_table'].write(encoded)
+            outputs['name_offsets'].write(np.int64(name_offset).tobytes())
+    finally:
+        for ofile in outputs.values():
+            ofile.close()
+
+    meta = {'version': FORMAT_VERSION,
+            'contigs': contigs,
+            'variants': n_variants,
+            'samples': len(names),
+            'max_random_hom_hets': max_random_hom_hets}
+    with open(dest_dir / 'meta.json', 'w') as ofile:
+        rapidjson.dump(meta, ofile)
+    return(n_variants)
+
+
+class VariantMapFile():
+    """
+    Read only, memory-mapped view of a converted variant map.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'meta.json') as ifile:
+            self.meta = rapidjson.load(ifile)
+        if self.meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f'{self.path} has variant map format version {self.meta.get("version")}, '
+                             f'expected {FORMAT_VERSION}. Convert it again with convert-variant-map.')
+        self.contigs = self.meta['contigs']
+        self.max_random_hom_hets = self.meta['max_random_hom_hets']
+        self._contig_index = {contig: i for i, contig in enumerate(self.contigs)}
+
+        n_variants = self.meta['variants']
+        self.key = self._memmap('key', np.int64, (n_variants,))
+        self.allele_offsets = self._memmap('allele_offsets', np.int64, (n_variants + 1,))
+        self.allele_table = self._memmap('allele_table', np.uint8)
+        # One extra row so the het samples of the last variant end at the next row's hom start.
+        self.sample_offsets = self._memmap('sample_offsets', np.int64, (n_variants + 1, 2))
+        self.samples = self._memmap('samples', np.int32)
+        self.name_offsets = self._memmap('name_offsets', np.int64, (self.meta['samples'] + 1,))
+        self.name_table = self._memmap('name_table', np.uint8)
+
+    def _memmap(self, name, dtype, shape=None):
+        path = self.path / f'{name}.bin'
+        # Zero length files can't be memory-mapped.
+        if path.stat().st_size == 0:
+            return(np.empty(shape or (0,), dtype))
+        return(np.memmap(path, dtype=dtype, mode='r', shape=shape))
+
+    def find(self, chrom, pos, ref, alt):
+        """
+        @return row of the variant or None if not present.
+        """
+        contig = self._contig_index.get(chrom)
+        if contig is None:
+            return(None)
+        key = contig * CONTIG_SPAN + pos
+        lo = int(np.searchsorted(self.key, key, side='left'))
+        alleles = f'{ref} {alt}'.encode()
+        for row in range(lo, len(self.key)):
+            if self.key[row] != key:
+                break
+            if self.allele_table[self.allele_offsets[row]:self.allele_offsets[row + 1]].tobytes() == alleles:
+                return(row)
+        return(None)
+
+    def counts(self, row):
+        """
+        @return tuple of numbers of hom and het samples of the variant.
+        """
+        hom_start, het_start = self.sample_offsets[row]
+        het_end = self.sample_offsets[row + 1][0]
+        return(int(het_start - hom_start), int(het_end - het_start))
+
+    def _name(self, sample):
+        return(self.name_table[self.name_offsets[sample]:self.name_offsets[sample + 1]].tobytes().decode())
+
+    def sample_id(self, row, sample_no, sample_het):
+        """
+        @return id of the 1-based sample_no hom or het sample of the variant, or None if out of range.
+        """
+        n_hom, n_het = self.counts(row)
+        if sample_no < 1 or sample_no > (n_het if sample_het else n_hom):
+            return(None)
+        start = self.sample_offsets[row][1 if sample_het else 0]
+        return(self._name(int(self.samples[start + sample_no - 1])))
+
+    def sample_ids(self, row):
+        """
+        @return tuple of lists of hom and het sample ids of the variant.
+        """
+        hom_start, het_start = (int(offset) for offset in self.sample_offsets[row])
+        het_end = int(self.sample_offsets[row + 1][0])
+        names = [self._name(int(sample)) for sample in self.samples[hom_start:het_end]]
+        return(names[:het_start - hom_start], names[het_start - hom_start:])
@@ -13,3 +13,43 @@ CORS_ORIGINS = ['http://localhost:8080', 'http://127.0.0.1:8080']
 GOOGLE_CLIENT_ID = ""
 GOOGLE_CLIENT_SECRET = ""
 GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+
+# Number of open coverage tabix handles kept per worker process
+COVERAGE_POOL_SIZE = 32
+
+# Local cache of S3 coverage listing and blocks, shared by all workers on the host.
+# Defaults to a directory per source under the system temporary directory.
+# COVERAGE_BLOCK_CACHE_BYTES bounds the directory as a whole.
+COVERAGE_CACHE_DIR = None
+COVERAGE_BLOCK_CACHE_BYTES = 1 << 30
+
+# Upper limit on windows returned by downsampled coverage requests
+COVERAGE_MAX_POINTS = 10000
+
+# Upper limit on bases covered by all intervals of one batch coverage request
+COVERAGE_MAX_BATCH_SPAN = 5_000_000
+
+# Coverage rows kept per worker in tiles of recently requested regions. 0 disables the tile cache.
+# A full bin row takes roughly 1 KB in memory, so 500_000 rows is about 500 MB per worker.
+# Tiles are also shared between workers through COVERAGE_TILE_CACHE_DIR if set.
+COVERAGE_TILE_CACHE_ROWS = 0
+COVERAGE_TILE_CACHE_DIR = None
+
+# Threads per worker extracting read slices from CRAMs, and seconds a request waits for its slice.
+SEQUENCES_EXTRACT_THREADS = 4
+SEQUENCES_EXTRACT_TIMEOUT = 30
+
+# Byte budget of SEQUENCES_CACHE_DIR. Least recently used slices are evicted beyond it. None keeps every slice.
+SEQUENCES_CACHE_BYTES = 10 << 30
+
+# Location of the per sample CRAMs when not under SEQUENCES_DIR/sequences, e.g. s3://bucket/crams.
+# SEQUENCES_S3_ENDPOINT_URL points at S3 compatible storage other than AWS.
+SEQUENCES_CRAM_SOURCE = None
+SEQUENCES_S3_ENDPOINT_URL = None
+# Byte budget of CRAM containers fetched from SEQUENCES_CRAM_SOURCE, kept under SEQUENCES_CACHE_DIR/containers.
+# It is separate from and in addition to SEQUENCES_CACHE_BYTES.
+SEQUENCES_CRAM_CACHE_BYTES = 1 << 30
+
+# Filtered SNV queries spanning more bases than this report an estimated total, flagged by total_exact.
+# None always counts exactly. Totals are cached between pages either way.
+SNV_TOTAL_ESTIMATE_SPAN = None
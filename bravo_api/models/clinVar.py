@@ -42,7 +42,7 @@ def fetch_vcf_positions(name):
     positions = []
     vcf_file = current_app.config['CLINVAR_VCF']
     
-    gene = variants.get_gene(name, True)
+    gene = variants.get_gene(name, False)
     if gene is None:
         return positions
 
@@ -103,7 +103,7 @@ def fetch_vcf_positions_by_region(chrom, start, stop):
 
 
 def compare_db_with_clinVar(gene_name):
-    gene = variants.get_gene(gene_name, True)
+    gene = variants.get_gene(gene_name, False)
     if gene is None:
         return []
 
@@ -4,8 +4,13 @@ import click
 from flask.cli import with_appcontext
 from flask import current_app
 import sys
+import time
 from bravo_api.models.readers import read_canonical_transcripts, read_omim, read_hgnc, read_gencode, read_snv, read_qc_metrics
+from bravo_api.models.utils import merged_exons, make_xpos, CHROMOSOMES
+from bravo_api.models.snv_tiles import build_tiles, tiles_marker
+from bravo_api.core.coverage_reduction import summarize, combine_summaries
 from itertools import chain, islice
+from intervaltree import IntervalTree
 from multiprocessing import Pool
 
 
@@ -74,9 +79,42 @@ def load_genes(canonical_transcripts_file, omim_file, genenames_file, gencode_fi
     sys.stdout.write(f"Created 'exons' collection and inserted {mongo.db.exons.count_documents({})} exon(s).\n")
 
 
+def _merged_exons_by_gene(_mongo, chrom):
+    """
+    Merged exons of every gene on the chromosome, as sorted half-open intervals by gene id.
+    """
+    features_by_gene = {}
+    for exon in _mongo.db.exons.find({'chrom': chrom, 'feature_type': 'exon'},
+                                     {'_id': 0, 'gene_id': 1, 'start': 1, 'stop': 1,
+                                      'feature_type': 1}):
+        features_by_gene.setdefault(exon['gene_id'], []).append(exon)
+    return({gene_id: merged_exons({'features': features})
+            for gene_id, features in features_by_gene.items()})
+
+
+def annotate_exonic_genes(_mongo, variants):
+    """
+    Adds 'exonic_genes' with ids of genes whose merged exons contain the variant position.
+    Variants outside of exons are left without the field. Exons of a chromosome are read on first use.
+    """
+    trees = {}
+    for variant in variants:
+        tree = trees.get(variant['chrom'])
+        if tree is None:
+            tree = IntervalTree()
+            for gene_id, exons in _merged_exons_by_gene(_mongo, variant['chrom']).items():
+                for exon in exons:
+                    tree.addi(exon.begin, exon.end, gene_id)
+            trees[variant['chrom']] = tree
+        gene_ids = sorted({exon.data for exon in tree[variant['pos']]})
+        if gene_ids:
+            variant['exonic_genes'] = gene_ids
+        yield variant
+
+
 def _load_snv(variants_file):
     _mongo = PyMongo(current_app) # for multiprocessing each thread needs its own client
-    variants = read_snv(variants_file)
+    variants = annotate_exonic_genes(_mongo, read_snv(variants_file))
     for variant in variants:
         _mongo.db.snv.insert_many(chain([variant], islice(variants, 99999))) # insert in chunks of 100,000 variants
 
@@ -94,16 +132,64 @@ def load_snv(threads, variants_files):
     threads -- number of parallel threads to use.\n
 
     variants_files -- one or several VCF/BCF files with single nucleotide variants and short indels.\n
+
+    Variants in exons are tagged with the ids of their genes from the 'exons' collection, so load-genes should run first.
+    The load generation is written to 'snv_loaded' once all variants are inserted, so that servers drop their cached totals.
     """
+    generation = int(time.time() * 1000)
+    mongo.db.snv_loaded.drop() # cached totals and indexes are of the replaced variants
     mongo.db.snv.drop()
+    mongo.db.snv_tiles_loaded.drop() # tiles count the replaced variants
+    mongo.db.snv_tiles.drop()
     with Pool(threads) as p:
         p.map(_load_snv, variants_files)
     mongo.db.snv.create_index([('xpos', pymongo.ASCENDING), ('xstop', pymongo.ASCENDING)])
     mongo.db.snv.create_index([('variant_id', pymongo.ASCENDING)])
     mongo.db.snv.create_index([('rsids', pymongo.ASCENDING)])
+    mongo.db.snv.create_index([('exonic_genes', pymongo.ASCENDING), ('xpos', pymongo.ASCENDING)],
+                              partialFilterExpression = {'exonic_genes': {'$exists': True}})
+    mongo.db.snv.create_index([('xpos', pymongo.ASCENDING), ('xstop', pymongo.ASCENDING), ('variant_class', pymongo.ASCENDING),
+                               ('annotation.region.top_consequence_code', pymongo.ASCENDING), ('annotation.region.top_lof_code', pymongo.ASCENDING)],
+                              name = 'xpos_1_xstop_1_top_codes')
+    mongo.db.snv_loaded.insert_one({'generation': generation})
     sys.stdout.write(f"Created 'snv' collection and inserted {mongo.db.snv.count_documents({})} variant(s).\n")
 
 
+def _load_snv_tiles(args):
+    chrom, generation = args
+    _mongo = PyMongo(current_app) # for multiprocessing each thread needs its own client
+    variants = _mongo.db.snv.find({'xpos': {'$gte': make_xpos(chrom, 0), '$lt': make_xpos(chrom, int(1e9))}},
+                                  {'_id': 0, 'pos': 1, 'filter': 1, 'annotation.region': 1})
+    chunks = build_tiles(chrom, variants, generation)
+    if chunks:
+        _mongo.db.snv_tiles.insert_many(chunks)
+    return(len(chunks))
+
+
+@click.command('load-snv-tiles')
+@click.argument('threads', required = True, type = int)
+@with_appcontext
+def load_snv_tiles(threads):
+    """
+    Creates and populates 'snv_tiles' collection with variant counts per 1kb tile, used by histograms.
+    Requires the 'snv' collection (see load-snv). Rerun after reloading variants.
+    Chromosomes are marked as loaded in 'snv_tiles_loaded' only after all tiles are written. Histograms of unmarked chromosomes are counted in Mongo.
+
+    ARGUMENTS:
+
+    threads -- number of parallel processes to use. Each processes one chromosome at a time.\n
+    """
+    generation = int(time.time() * 1000)
+    mongo.db.snv_tiles_loaded.drop()
+    mongo.db.snv_tiles.drop()
+    with Pool(threads) as p:
+        p.map(_load_snv_tiles, [(chrom, generation) for chrom in CHROMOSOMES])
+    mongo.db.snv_tiles.create_index([('chrom', pymongo.ASCENDING), ('generation', pymongo.ASCENDING), ('chunk', pymongo.ASCENDING)])
+    mongo.db.snv_tiles_loaded.insert_many([tiles_marker(chrom, generation) for chrom in CHROMOSOMES])
+    mongo.db.snv_tiles_loaded.create_index([('chrom', pymongo.ASCENDING)])
+    sys.stdout.write(f"Created 'snv_tiles' collection and inserted {mongo.db.snv_tiles.count_documents({})} chunk(s) of tiles.\n")
+
+
 @click.command('load-qc-metrics')
 @click.argument('metrics_file', type = click.Path(exists = True))
 @with_appcontext
@@ -121,3 +207,50 @@ def load_qc_metrics(metrics_file):
         mongo.db.qc_metrics.insert_one(metric)
     mongo.db.qc_metrics.create_index([('metric', pymongo.ASCENDING)])
     sys.stdout.write(f"Created 'qc_metrics' collection and inserted {mongo.db.qc_metrics.count_documents({})} QC metric(s).\n")
+
+
+# Depths reported in coverage summaries. Same thresholds as the coverage files.
+COVERAGE_SUMMARY_THRESHOLDS = [1, 5, 10, 15, 20, 25, 30, 50, 100]
+
+
+def _load_coverage_summary(chrom):
+    _mongo = PyMongo(current_app) # for multiprocessing each thread needs its own client
+    provider = current_app.coverage_provider
+
+    summaries = []
+    for gene_id, exons in _merged_exons_by_gene(_mongo, chrom).items():
+        intervals = [(chrom, exon.begin, exon.end - 1) for exon in exons]
+        exon_summaries = []
+        for (_, start, stop), rows in zip(intervals, provider.coverage_batch('full', intervals)):
+            exon_summary = summarize([row['start'] for row in rows], [row['end'] for row in rows],
+                                     [row['mean'] for row in rows], start, stop,
+                                     COVERAGE_SUMMARY_THRESHOLDS)
+            exon_summary.update({'start': start, 'stop': stop})
+            exon_summaries.append(exon_summary)
+        summary = combine_summaries(exon_summaries)
+        summary.update({'gene_id': gene_id, 'chrom': chrom, 'exons': exon_summaries})
+        summaries.append(summary)
+
+    if summaries:
+        _mongo.db.coverage_summary.insert_many(summaries)
+    return(len(summaries))
+
+
+@click.command('load-coverage-summary')
+@click.argument('threads', required = True, type = int)
+@with_appcontext
+def load_coverage_summary(threads):
+    """
+    Creates and populates 'coverage_summary' collection with mean depth and fraction of bases at or above depth thresholds per gene and per merged exon.
+    Requires the 'exons' collection (see load-genes) and the coverage files configured in COVERAGE_DIR.
+
+    ARGUMENTS:
+
+    threads -- number of parallel processes to use. Each processes one chromosome at a time.\n
+    """
+    mongo.db.coverage_summary.drop()
+    chroms = mongo.db.exons.distinct('chrom')
+    with Pool(threads) as p:
+        p.map(_load_coverage_summary, chroms)
+    mongo.db.coverage_summary.create_index([('gene_id', pymongo.ASCENDING)])
+    sys.stdout.write(f"Created 'coverage_summary' collection and inserted {mongo.db.coverage_summary.count_documents({})} gene summaries.\n")
@@ -0,0 +1,124 @@
+"""
+In-process cache of gene records and their merged exons.
+    Gene requests only need the gene record and its exons merged into non-overlapping intervals.
+    Both are loaded for all genes at app startup, in one pass over the 'genes' and 'exons' collections,
+    so that serving a gene takes no queries and no interval tree construction.
+
+    Merged exons are held as one (n x 2) array of half-open [begin, end) intervals per gene.
+    Models older than max_age seconds are reloaded in a background thread while lookups keep serving
+    the previous ones, so genes reloaded into the database are served by every worker soon after
+    max_age. Only lookups made before the first load finishes wait for it.
+"""
+from bravo_api.models.database import mongo
+from bravo_api.models.utils import merged_exons
+from intervaltree import Interval
+from collections import defaultdict
+import numpy as np
+import threading
+import logging
+import time
+
+MAX_AGE = 24 * 60 * 60
+
+
+class GeneModels():
+
+    def __init__(self, max_age=MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded_at = None
+        self._refreshing = False
+        self._by_id = {}
+        self._by_name = {}
+        self._exons = {}
+
+    def refresh(self):
+        by_id = {}
+        for gene in mongo.db.genes.find({}, {'_id': 0, 'xstart': 0, 'xstop': 0}):
+            by_id[gene['gene_id']] = gene
+        by_name = {}
+        for gene_id in sorted(by_id):
+            by_name.setdefault(by_id[gene_id]['gene_name'], by_id[gene_id])
+
+        features = defaultdict(list)
+        for exon in mongo.db.exons.find({'feature_type': 'exon'},
+                                        {'_id': 0, 'gene_id': 1, 'start': 1, 'stop': 1, 'feature_type': 1}):
+            features[exon['gene_id']].append(exon)
+        exons = {gene_id: np.array([(exon.begin, exon.end) for exon in merged_exons({'features': gene_features})],
+                                   dtype=np.int64).reshape(-1, 2)
+                 for gene_id, gene_features in features.items()}
+
+        with self._lock:
+            self._by_id, self._by_name, self._exons = by_id, by_name, exons
+            self._loaded_at = time.time()
+
+    def _stale(self):
+        return(self.max_age is not None and time.time() - self._loaded_at > self.max_age)
+
+    def _refresh_in_background(self):
+        try:
+            # Holds the load lock so that lookups made before the first load wait for it.
+            with self._load_lock:
+                self.refresh()
+        except Exception:
+            logging.exception('Failed to load gene models. Serving the previous ones.')
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def start_refresh(self):
+        """
+        Reload the models in a background thread unless one is already reloading them.
+        @return True if a thread was started.
+        """
+        with self._lock:
+            if self._refreshing:
+                return(False)
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return(True)
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None:
+            # Nothing to serve yet. One thread loads while the others wait for it.
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self.refresh()
+        elif self._stale():
+            self.start_refresh()
+
+    def gene(self, name):
+        """
+        Gene record by exact gene id (names starting with ENSG) or gene name. Shared; don't modify.
+        """
+        self._ensure_loaded()
+        if name.startswith('ENSG'):
+            return(self._by_id.get(name))
+        return(self._by_name.get(name))
+
+    def gene_names(self, gene_ids):
+        """
+        Map gene ids to gene names. Ids without a gene map to None.
+        """
+        self._ensure_loaded()
+        by_id = self._by_id
+        return({gene_id: by_id[gene_id]['gene_name'] if gene_id in by_id else None for gene_id in gene_ids})
+
+    def exons(self, gene_id):
+        """
+        Merged exons of the gene as sorted half-open Intervals.
+        """
+        self._ensure_loaded()
+        exons = self._exons.get(gene_id)
+        if exons is None:
+            return([])
+        return([Interval(begin, end) for begin, end in exons.tolist()])
+
+    def stats(self):
+        return({'genes': len(self._by_id),
+                'exons': sum(len(exons) for exons in self._exons.values()),
+                'loaded_at': self._loaded_at})
+
+
+gene_models = GeneModels()
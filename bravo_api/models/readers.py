@@ -93,6 +93,20 @@ snv_consequence2code = {name: i for i, name in enumerate(reversed([
 
 snv_lof2code = {name: i for i, name in enumerate(['LC', 'HC'], 1)}
 
+
+def variant_class(ref, alt):
+    if len(ref) == 1 and len(alt) == 1:
+        return 'snv'
+    if len(ref) != len(alt):
+        return 'indel'
+    return 'mnv'
+
+
+def add_top_codes(annotation):
+    # scalar codes of the most severe consequence and LoF, 0 if none. Easier to index and sort than arrays.
+    annotation['top_consequence_code'] = annotation['_consequence'][0] if annotation.get('_consequence') else 0
+    annotation['top_lof_code'] = annotation['_lof'][0] if annotation.get('_lof') else 0
+
 # we require the same bins for all histograms. Rationale: if all bins are the same, then we don't
 # need to store their boundaries for each variant and we save several hundreds GB of storage +
 # reduce document size (which may allow to keep in RAM more documents).
@@ -177,6 +191,7 @@ def annotation_from_effects(allele_effects):
                 for hgvs in hgvss:
                     if hgvs not in region[key]:
                         region[key].append(hgvs)
+    add_top_codes(region)
     annotations['region'] = region
     if genes:
         annotations['genes'] = []
@@ -197,6 +212,7 @@ def annotation_from_effects(allele_effects):
                         for hgvs in hgvss:
                             if hgvs not in gene[key]:
                                 gene[key].append(hgvs)
+            add_top_codes(gene)
             annotations['genes'].append(gene)
     if regulators:
         annotations['regulatory'] = regulators
@@ -293,6 +309,7 @@ def read_snv(filename):
                        'stop': record.stop, # TODO: check if pysam generates this correctly
                        'xstop': make_xpos(chrom, record.stop),
                        'variant_id': f'{chrom}-{record.pos}-{record.ref}-{alt_allele}',
+                       'variant_class': variant_class(record.ref, alt_allele),
                        'rsids': rs_from_effects(allele_effects),
                        'site_quality': record.qual,
                        'filter': sorted(record.filter.keys()),
@@ -3,27 +3,41 @@ import os
 import random
 import string
 import pysam
-import fcntl
 import time
 import re
 import gzip
-import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, Future
 from intervaltree import IntervalTree
+from bravo_api.core.tabix_pool import TabixHandlePool
+from bravo_api.core.slice_cache import SliceCache
+from bravo_api.core.variant_map import VariantMapFile
+from bravo_api.core.fs_cram_source import FSCramSource
+from bravo_api.core.cram_source_factory import CramSourceFactory
 
 
 class SequencesClient(object):
     '''Manages CRAMS for all chromosomes. Assumes one CRAM per chromosome.'''
-    def __init__(self, crams_dir, reference_path, cache_dir, window_bp):
+    def __init__(self, crams_dir, reference_path, cache_dir, window_bp, variant_cache_size = 4096,
+                 extract_threads = 4, extract_timeout = 30, cache_bytes = None, cram_source = None):
         self._variant_map_file = os.path.join(crams_dir, 'variant_map.tsv.gz')
-        if not os.path.exists(self._variant_map_file):
-            raise Exception('Provided CRAM directory doesn\'t contain "variant_map.tsv.gz" file.')
-        if not os.path.exists(self._variant_map_file + '.tbi'):
-            raise Exception('Provided CRAM directory doesn\'t contain "variant_map.tsv.gz.tbi" file.')
+        # Converted variant map (see convert-variant-map command) is used instead of tabix when present.
+        variant_map_bin = os.path.join(crams_dir, 'variant_map.bin')
+        self._variant_map = VariantMapFile(variant_map_bin) if os.path.isdir(variant_map_bin) else None
+        if self._variant_map is None:
+            if not os.path.exists(self._variant_map_file):
+                raise Exception('Provided CRAM directory doesn\'t contain "variant_map.tsv.gz" file.')
+            if not os.path.exists(self._variant_map_file + '.tbi'):
+                raise Exception('Provided CRAM directory doesn\'t contain "variant_map.tsv.gz.tbi" file.')
         self._sequences_dir = os.path.join(crams_dir, 'sequences')
-        if not os.path.exists(self._sequences_dir):
-            raise Exception('Provided CRAM directory doesn\'t contain "sequences" directory.')
-        if not os.path.isdir(self._sequences_dir):
-            raise Exception('Provided CRAM directory contains "sequences" which is not a directory.')
+        if cram_source is None: # sample CRAMs are local, under the "sequences" directory
+            if not os.path.exists(self._sequences_dir):
+                raise Exception('Provided CRAM directory doesn\'t contain "sequences" directory.')
+            if not os.path.isdir(self._sequences_dir):
+                raise Exception('Provided CRAM directory contains "sequences" which is not a directory.')
+            cram_source = FSCramSource(self._sequences_dir, reference_path)
+        self._cram_source = cram_source
         self._crams_dir = crams_dir
         self._reference_path = reference_path
         if not os.path.exists(cache_dir):
@@ -39,22 +53,45 @@ class SequencesClient(object):
             f.close()
             os.remove(filename)
         self._cache_dir = cache_dir
+        # Without a byte budget slices are kept forever.
+        self._slice_cache = SliceCache(cache_dir, cache_bytes) if cache_bytes else None
         self._window_bp = window_bp
         self._max_hom = 0
         self._max_het = 0
-        with gzip.open(self._variant_map_file, 'rt') as ifile:
-            for line in ifile:
-                if not line.startswith('#'):
-                    break
-                if line.startswith('#MAX_RANDOM_HOM_HETS='):
-                    self._max_hom = self._max_het = int(line.rstrip().split('=')[1].strip())
+        if self._variant_map is not None:
+            self._max_hom = self._max_het = self._variant_map.max_random_hom_hets
+        else:
+            with gzip.open(self._variant_map_file, 'rt') as ifile:
+                for line in ifile:
+                    if not line.startswith('#'):
+                        break
+                    if line.startswith('#MAX_RANDOM_HOM_HETS='):
+                        self._max_hom = self._max_het = int(line.rstrip().split('=')[1].strip())
         if self._max_hom <= 0 or self._max_het <= 0:
             raise Exception(f'Invalid values for MAX_HOM and MAX_HET ({self._max_hom} and {self._max_het}).')
         self._starts_with_chr = False
         self._contigs = set()
-        with pysam.TabixFile(self._variant_map_file) as itabix:
-            for contig in itabix.contigs:
-                self._contigs.add(contig)
+        self._variant_map_pool = None
+        if self._variant_map is not None:
+            self._contigs.update(self._variant_map.contigs)
+        else:
+            # Long-lived handles to variant_map. The pool drops handles inherited across a fork.
+            self._variant_map_pool = TabixHandlePool(4)
+            with self._variant_map_pool.handle('variant_map', self._variant_map_file) as itabix:
+                for contig in itabix.contigs:
+                    self._contigs.add(contig)
+        # Parsed variant_map rows keyed by (chrom, pos, ref, alt). Absent variants are cached as None.
+        self._variant_cache_size = variant_cache_size
+        self._variant_cache = OrderedDict()
+        self._variant_cache_lock = threading.Lock()
+        # Slice extractions in progress keyed by cached BAM path. Concurrent requests for the same
+        # slice wait on one future. The executor is created per process since threads don't survive a fork.
+        self._extract_threads = extract_threads
+        self._extract_timeout = extract_timeout
+        self._extract_lock = threading.RLock()
+        self._extractions = {}
+        self._executor = None
+        self._executor_pid = None
         for contig in self._contigs:
             if contig.startswith('chr'):
                 self._starts_with_chr = True
@@ -81,79 +118,206 @@ class SequencesClient(object):
                 return chrom[3:]
         return chrom
 
+    def _fetch_variant_samples(self, chrom, pos, ref, alt):
+        if chrom not in self._contigs:
+            return None
+        with self._variant_map_pool.handle('variant_map', self._variant_map_file) as itabix:
+            for row in itabix.fetch(chrom, pos - 1, pos, parser = pysam.asTuple()):
+                if int(row[1]) == pos and row[2] == ref and row[3] == alt:
+                    return (row[4].split(',') if row[4] else [], row[5].split(',') if row[5] else [])
+        return None
+
+    def get_variant_samples(self, chrom, pos, ref, alt):
+        '''Returns tuple of (homozygous sample ids, heterozygous sample ids) or None if variant is not in variant_map.'''
+        key = (self.normalize_chrom(chrom), pos, ref, alt)
+        if self._variant_map is not None:
+            row = self._variant_map.find(*key)
+            return None if row is None else self._variant_map.sample_ids(row)
+        with self._variant_cache_lock:
+            if key in self._variant_cache:
+                self._variant_cache.move_to_end(key)
+                return self._variant_cache[key]
+        samples = self._fetch_variant_samples(*key)
+        with self._variant_cache_lock:
+            self._variant_cache[key] = samples
+            while len(self._variant_cache) > self._variant_cache_size:
+                self._variant_cache.popitem(last = False)
+        return samples
+
+    def get_sample_id(self, chrom, pos, ref, alt, sample_no, sample_het):
+        '''Returns id of the sample_no-th homozygous or heterozygous sample of the variant, or None.'''
+        if self._variant_map is not None:
+            row = self._variant_map.find(self.normalize_chrom(chrom), pos, ref, alt)
+            return None if row is None else self._variant_map.sample_id(row, sample_no, sample_het)
+        samples = self.get_variant_samples(chrom, pos, ref, alt)
+        if samples is None:
+            return None
+        samples = samples[1] if sample_het else samples[0]
+        if sample_no < 1 or len(samples) < sample_no:
+            return None
+        return samples[sample_no - 1]
+
     def get_sequences_info(self, chrom, pos, ref, alt):
         results = []
-        chrom = self.normalize_chrom(chrom)
-        if chrom in self._contigs:
-            with pysam.TabixFile(self._variant_map_file, parser = pysam.asTuple()) as itabix:
-                for row in itabix.fetch(chrom, pos - 1, pos):
-                    if int(row[1]) == pos and row[2] == ref and row[3] == alt:
-                        results.append({
-                           'n_homozygous': len(row[4].split(',')) if row[4] else 0,
-                           'n_heterozygous': len(row[5].split(',')) if row[5] else 0
-                        })
-                        break
+        if self._variant_map is not None:
+            row = self._variant_map.find(self.normalize_chrom(chrom), pos, ref, alt)
+            if row is not None:
+                n_homozygous, n_heterozygous = self._variant_map.counts(row)
+                results.append({ 'n_homozygous': n_homozygous, 'n_heterozygous': n_heterozygous })
+            return results
+        samples = self.get_variant_samples(chrom, pos, ref, alt)
+        if samples is not None:
+            results.append({
+               'n_homozygous': len(samples[0]),
+               'n_heterozygous': len(samples[1])
+            })
         return results
 
     def get_sequences(self, chrom, pos, ref, alt, sample_no, sample_het):
         chrom = self.normalize_chrom(chrom)
-        sample_id = None
-        with pysam.TabixFile(self._variant_map_file, parser = pysam.asTuple()) as itabix:
-            for row in itabix.fetch(chrom, pos - 1, pos):
-                if int(row[1]) == pos and row[2] == ref and row[3] == alt:
-                    samples = row[5] if sample_het else row[4]
-                    if samples:
-                        samples = samples.split(',')
-                    if len(samples) >= sample_no:
-                        sample_id = samples[sample_no - 1]
-        if not sample_id:
+        sample_id = self.get_sample_id(chrom, pos, ref, alt, sample_no, sample_het)
+        if sample_id is None:
             return None
 
         qname = f'{pos}:{ref}:{alt}:{"" if sample_het else "0"}{sample_no}'
-        cram = os.path.join(self._sequences_dir, hashlib.md5(sample_id.encode()).hexdigest()[:2], sample_id + '.cram')
 
         cached_cram = os.path.join(self._cache_dir, f'{chrom}-{qname.replace(":", "-")}.bam')
-        cached_cram_index = f'{cached_cram}.bai'
-        if os.path.exists(cached_cram):
-            with open(cached_cram, 'r') as ifile:
-                unlocked = False
-                for i in range(10): # locked file means it is still being written. so, we wait.
-                    try:
-                        fcntl.flock(ifile, fcntl.LOCK_SH | fcntl.LOCK_NB)
-                        unlocked = True
-                        break
-                    except:
-                        time.sleep(0.2)
-                        continue
-                if not unlocked:
-                    return None
+        status = { 'variant_id': f'{chrom}-{pos}-{ref}-{alt}', 'sample_no': sample_no, 'heterozygous': bool(sample_het) }
+        return self._cached_slice(cached_cram, status, self._extract, sample_id, chrom, pos, qname)
+
+    def get_combined_sequences(self, chrom, pos, ref, alt):
+        '''One slice with reads of all example samples of the variant. Read group of each read is hom<N> or het<N>.'''
+        chrom = self.normalize_chrom(chrom)
+        samples = self.get_variant_samples(chrom, pos, ref, alt)
+        if samples is None:
+            return None
+        sources = []
+        for sample_het, sample_ids, max_samples in ((False, samples[0], self._max_hom), (True, samples[1], self._max_het)):
+            for sample_no, sample_id in enumerate(sample_ids[:max_samples], 1):
+                read_group = f'{"het" if sample_het else "hom"}{sample_no}'
+                qname = f'{pos}:{ref}:{alt}:{"" if sample_het else "0"}{sample_no}'
+                sources.append((read_group, sample_id, qname))
+        if not sources:
+            return None
+
+        cached_cram = os.path.join(self._cache_dir, f'{chrom}-{pos}-{ref}-{alt}-all.bam')
+        status = { 'variant_id': f'{chrom}-{pos}-{ref}-{alt}', 'sample_no': None, 'heterozygous': None }
+        return self._cached_slice(cached_cram, status, self._extract_combined, sources, chrom, pos)
+
+    def _cached_slice(self, cached_cram, status, extract, *args):
+        # Slices are renamed into place after indexing, so an existing file is complete. Touching the slice
+        # before handing it out keeps other workers from evicting it; a slice evicted meanwhile is extracted again.
+        if self._slice_cache:
+            exists = self._slice_cache.touch(os.path.basename(cached_cram))
         else:
-            with pysam.AlignmentFile(cram, 'rc', reference_filename = self._reference_path) as icram, open(cached_cram, 'wb') as ofile:
-                ocram = pysam.AlignmentFile(ofile, 'wb', reference_filename = self._reference_path, header = icram.header)
-                try:
-                    fcntl.flock(ofile, fcntl.LOCK_EX | fcntl.LOCK_NB)
-                except:
-                    return None # file is already locked. this situation is abnormal and we expect it to happen very rarely (maybe when app is stopped abnormally and the file remains locked)
-                n_reads = 0
-                for read in icram.fetch(chrom, max(0, pos - self._window_bp), pos + self._window_bp):
-                    if read.query_name.startswith(qname + ':'):
-                        n_reads += 1
-                        ocram.write(read)
-                ocram.close()
-                fcntl.flock(ofile, fcntl.LOCK_UN) # ofile fill be unlocked automatically after "with" context, but just in case we still do flock.LOCK_UN
-            if n_reads == 0:
-                os.remove(cached_cram)
-                return None
-            pysam.index(cached_cram)
-        return { 'cram': cached_cram, 'crai': cached_cram_index }
+            exists = os.path.exists(cached_cram)
+        if not exists:
+            future = self._submit_extraction(cached_cram, status, extract, *args)
+            try:
+                if not future.result(timeout = self._extract_timeout):
+                    return None
+            except TimeoutError:
+                return None # extraction keeps running and later requests for the slice join it
+        return { 'cram': cached_cram, 'crai': f'{cached_cram}.bai' }
+
+    def _submit_extraction(self, cached_cram, status, extract, *args):
+        with self._extract_lock:
+            if self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers = self._extract_threads)
+                self._executor_pid = os.getpid()
+                self._extractions = {}
+            extraction = self._extractions.get(cached_cram)
+            if extraction is None and os.path.exists(cached_cram):
+                # Finished between the caller's check and taking the lock.
+                future = Future()
+                future.set_result(True)
+                return future
+            if extraction is None:
+                future = self._executor.submit(extract, cached_cram, *args)
+                extraction = dict(status, future = future, started = time.time())
+                self._extractions[cached_cram] = extraction
+                future.add_done_callback(lambda f: self._finish_extraction(cached_cram))
+            return extraction['future']
+
+    def _finish_extraction(self, cached_cram):
+        with self._extract_lock:
+            self._extractions.pop(cached_cram, None)
+
+    def _fetch_reads(self, sample_id, chrom, pos, qname):
+        '''Returns CRAM header of the sample and its reads of the variant.'''
+        header, reads = self._cram_source.read_seqs(sample_id, chrom, max(0, pos - self._window_bp), pos + self._window_bp)
+        return header, [read for read in reads if read.query_name.startswith(qname + ':')]
+
+    def _extract(self, cached_cram, sample_id, chrom, pos, qname):
+        '''Writes reads of one sample around the variant to cached_cram. Returns False if there are none.'''
+        header, reads = self._fetch_reads(sample_id, chrom, pos, qname)
+        return self._write_slice(cached_cram, header, reads)
+
+    def _extract_combined(self, cached_cram, sources, chrom, pos):
+        '''Writes reads of every (read group, sample id, qname) source to cached_cram in one coordinate sorted slice.'''
+        header = None
+        reads = []
+        for read_group, sample_id, qname in sources:
+            sample_header, sample_reads = self._fetch_reads(sample_id, chrom, pos, qname)
+            if header is None:
+                header = sample_header.to_dict()
+                header['RG'] = [{ 'ID': rg, 'SM': rg } for rg, _, _ in sources]
+                header = pysam.AlignmentHeader.from_dict(header)
+            for read in sample_reads:
+                read = pysam.AlignedSegment.from_dict(read.to_dict(), header)
+                read.set_tag('RG', read_group)
+                reads.append(read)
+        reads.sort(key = lambda read: (read.reference_id, read.reference_start))
+        return self._write_slice(cached_cram, header, reads)
+
+    def _write_slice(self, cached_cram, header, reads):
+        if not reads:
+            return False
+        tmp_cram = f'{cached_cram}.{os.getpid()}.{threading.get_ident()}.tmp.bam'
+        try:
+            with pysam.AlignmentFile(tmp_cram, 'wb', reference_filename = self._reference_path, header = header) as ocram:
+                for read in reads:
+                    ocram.write(read)
+            pysam.index(tmp_cram, f'{tmp_cram}.bai')
+            # Index first, so the slice never appears without it. Other processes may race us to the same content.
+            os.replace(f'{tmp_cram}.bai', f'{cached_cram}.bai')
+            os.replace(tmp_cram, cached_cram)
+        finally:
+            for path in (tmp_cram, f'{tmp_cram}.bai'):
+                if os.path.exists(path):
+                    os.remove(path)
+        if self._slice_cache:
+            self._slice_cache.added(os.path.basename(cached_cram))
+        return True
+
+    def extractions(self):
+        '''Slice extractions in progress in this process.'''
+        now = time.time()
+        with self._extract_lock:
+            if self._executor_pid != os.getpid():
+                return []
+            return [{ 'variant_id': e['variant_id'], 'sample_no': e['sample_no'], 'heterozygous': e['heterozygous'],
+                      'seconds': round(now - e['started'], 3) } for e in self._extractions.values()]
 
 
 sequences_handler = None
 
 
-def init_sequences(sequences_dir, reference_sequence, sequences_cache_dir):
+def init_sequences(sequences_dir, reference_sequence, sequences_cache_dir, extract_threads = 4, extract_timeout = 30,
+                   cache_bytes = None, cram_source_url = None, cram_cache_bytes = 1 << 30, s3_endpoint_url = None):
+    '''Sample CRAMs are read from cram_source_url (see CramSourceFactory) when given, or from sequences_dir otherwise.'''
     global sequences_handler
-    sequences_handler = SequencesClient(sequences_dir, reference_sequence, sequences_cache_dir, 100)
+    cram_source = None
+    if cram_source_url:
+        cram_source = CramSourceFactory.build(cram_source_url, reference_sequence, sequences_cache_dir, cram_cache_bytes,
+                                              s3_endpoint_url)
+    sequences_handler = SequencesClient(sequences_dir, reference_sequence, sequences_cache_dir, 100,
+                                        extract_threads = extract_threads, extract_timeout = extract_timeout,
+                                        cache_bytes = cache_bytes, cram_source = cram_source)
+
+
+def get_extractions():
+    return sequences_handler.extractions()
 
 
 def get_info(variant_id):
@@ -173,23 +337,31 @@ def get_crai(variant_id, sample_no, sample_het):
     return None
 
 
-def get_cram(variant_id, sample_no, sample_het, start_byte, stop_byte):
+def get_combined_crai(variant_id):
+    chrom, pos, ref, alt = variant_id.split('-')
+    sequences = sequences_handler.get_combined_sequences(chrom, int(pos), ref, alt)
+    if sequences:
+        return sequences['crai']
+    return None
+
+
+def get_combined_cram(variant_id):
+    '''Returns path to the cached BAM with reads of all example samples of the variant.'''
+    chrom, pos, ref, alt = variant_id.split('-')
+    sequences = sequences_handler.get_combined_sequences(chrom, int(pos), ref, alt)
+    if sequences:
+        return sequences['cram']
+    return None
+
+
+def get_cram(variant_id, sample_no, sample_het):
+    '''Returns path to the cached BAM slice. Byte ranges are served from it by the caller.'''
     if sample_het and sample_no > sequences_handler.max_het:
         return None
     if not sample_het and sample_no > sequences_handler.max_hom:
         return None
     chrom, pos, ref, alt = variant_id.split('-')
     sequences = sequences_handler.get_sequences(chrom, int(pos), ref, alt, sample_no, sample_het)
-    if not sequences:
-        return None
-    file_size = os.path.getsize(sequences['cram'])
-    if start_byte is None or start_byte < 0:
-        start_byte = 0
-    if stop_byte is None or stop_byte < 0:
-        length = file_size - start_byte
-    else:
-        length = stop_byte - start_byte
-    with open(sequences['cram'], 'rb') as ifile:
-        ifile.seek(start_byte)
-        file_bytes = ifile.read(length)
-    return { 'file_bytes': file_bytes, 'start_byte': start_byte, 'stop_byte': start_byte + length - 1, 'file_size': file_size }
+    if sequences:
+        return sequences['cram']
+    return None
@@ -0,0 +1,183 @@
+"""
+Variant counts per fixed size tile of the genome, for histograms.
+    Counts are kept in the 'snv_tiles' collection, one document per chunk of consecutive tiles of a
+    chromosome holding a zlib compressed (tiles x statuses x columns) uint32 array. Statuses are all
+    variants and PASS variants. Columns are all variants, and variants with each region consequence and
+    LoF value, so a variant counts in every column it would match with an $eq filter.
+
+    Histograms with windows at least a tile wide and no filter, or a filter on PASS and at most one
+    consequence or LoF value, are summed from the tiles lying wholly inside a window of the requested
+    region. Tiles cut by a window edge or the region ends are still counted in Mongo. Tiles count
+    variants by position, which assumes short variants the same way as the 1000 bases allowed beyond
+    the region by the region queries.
+
+    A chromosome's tiles are used only once its marker in 'snv_tiles_loaded' exists. The marker is
+    written after all chunks of the chromosome are inserted and names their load generation, so a
+    partly loaded or dropped chromosome is never read as having no variants. Markers are re-read
+    after MARKER_MAX_AGE seconds.
+"""
+from bson.binary import Binary
+import numpy as np
+import threading
+import time
+import zlib
+
+TILE_SIZE = 1000
+CHUNK_TILES = 1000
+STATUSES = ['all', 'PASS']
+ANNOTATIONS = ['consequence', 'lof']
+MARKER_MAX_AGE = 60
+
+
+def variant_columns(variant):
+    """
+    Columns the variant counts in.
+    """
+    region = variant.get('annotation', {}).get('region', {})
+    columns = {'all'}
+    for annotation in ANNOTATIONS:
+        columns.update(f'{annotation}:{value}' for value in region.get(annotation, []))
+    return(columns)
+
+
+def build_tiles(chrom, variants, generation, tile_size=TILE_SIZE):
+    """
+    Count variants of one chromosome into tiles.
+    @param variants Iterable of variant entries with at least 'pos', 'filter' and 'annotation.region'.
+    @param generation Identifier of the load, shared by the chunks and the chromosome marker.
+    @return list of chunk documents for the 'snv_tiles' collection. Chunks without variants are left out.
+    """
+    counts = {}
+    for variant in variants:
+        tile = variant['pos'] // tile_size
+        statuses = [0, 1] if 'PASS' in variant.get('filter', []) else [0]
+        for column in variant_columns(variant):
+            tile_counts = counts.setdefault(tile // CHUNK_TILES, {}).setdefault(column, {})
+            for status in statuses:
+                key = (tile % CHUNK_TILES, status)
+                tile_counts[key] = tile_counts.get(key, 0) + 1
+
+    chunks = []
+    for chunk, chunk_counts in sorted(counts.items()):
+        columns = sorted(chunk_counts)
+        array = np.zeros((CHUNK_TILES, len(STATUSES), len(columns)), dtype=np.uint32)
+        for i, column in enumerate(columns):
+            for (tile, status), count in chunk_counts[column].items():
+                array[tile, status, i] = count
+        chunks.append({'chrom': chrom, 'chunk': chunk, 'generation': generation, 'tile_size': tile_size,
+                       'columns': columns, 'counts': Binary(zlib.compress(array.tobytes()))})
+    return(chunks)
+
+
+def tiles_marker(chrom, generation, tile_size=TILE_SIZE):
+    """
+    Document for the 'snv_tiles_loaded' collection marking all tiles of the chromosome as loaded.
+    """
+    return({'chrom': chrom, 'generation': generation, 'tile_size': tile_size})
+
+
+class TileMarkers():
+    """
+    Markers of chromosomes with loaded tiles, re-read from the collection after max_age seconds.
+    """
+
+    def __init__(self, max_age=MARKER_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._markers = {}
+
+    def get(self, collection, chrom):
+        """
+        @return marker document of the chromosome, or None if its tiles aren't loaded.
+        """
+        with self._lock:
+            cached = self._markers.get(chrom)
+        if cached is not None and time.time() - cached[1] <= self.max_age:
+            return(cached[0])
+        marker = collection.find_one({'chrom': chrom}, {'_id': 0})
+        with self._lock:
+            self._markers[chrom] = (marker, time.time())
+        return(marker)
+
+    def clear(self):
+        with self._lock:
+            self._markers.clear()
+
+
+def tile_selection(user_filter):
+    """
+    Status and column of tile counts equal to the number of variants matching the user filter.
+    Status is 'all', 'PASS', or 'FAIL' for variants without PASS.
+    @return tuple of (status, column), or None if tiles can't answer the filter.
+    """
+    def flatten(names, value):
+        if isinstance(value, dict):
+            for key, nested in value.items():
+                yield from flatten(names + [key], nested)
+        elif value:
+            yield '.'.join(names), value
+
+    status, column = 'all', 'all'
+    for field, values in flatten([], user_filter):
+        if len(values) != 1 or len(values[0]) != 1:
+            return(None)
+        (operator, operands), = values[0].items()
+        if len(operands) != 1:
+            return(None)
+        if field == 'filter' and operands[0] == 'PASS' and operator in ('$eq', '$ne'):
+            status = 'PASS' if operator == '$eq' else 'FAIL'
+        elif (field in [f'annotation.region.{annotation}' for annotation in ANNOTATIONS]
+              and operator == '$eq' and column == 'all'):
+            column = f'{field.split(".")[-1]}:{operands[0]}'
+        else:
+            return(None)
+    return(status, column)
+
+
+def split_tiles(first_tile, last_tile, tile_size, window_size):
+    """
+    Tiles in [first_tile, last_tile) cut by an edge of the windows of window_size bases, which are
+    aligned to multiples of their size like the $group in histogram queries.
+    @return sorted list of tile indexes.
+    """
+    first_window = -(-first_tile * tile_size // window_size)
+    edges = range(first_window * window_size, last_tile * tile_size, window_size)
+    return([edge // tile_size for edge in edges if edge % tile_size != 0])
+
+
+def tile_histogram(collection, chrom, generation, first_tile, last_tile, status, column, tile_size, window_size):
+    """
+    Count variants in tiles [first_tile, last_tile) of the chromosome by windows of window_size bases,
+    with windows aligned to multiples of their size like the $group in histogram queries. Tiles cut
+    by a window edge are left out, see split_tiles.
+    @param generation Load generation from the chromosome marker. Chunks of other loads are ignored.
+    @return dict of number of variants by window index. Windows without variants are left out.
+    """
+    windows = {}
+    for doc in collection.find({'chrom': chrom, 'generation': generation,
+                                'chunk': {'$gte': first_tile // CHUNK_TILES,
+                                          '$lte': (last_tile - 1) // CHUNK_TILES}}):
+        if column not in doc['columns']:
+            continue
+        array = np.frombuffer(zlib.decompress(doc['counts']), dtype=np.uint32)
+        array = array.reshape(CHUNK_TILES, len(STATUSES), len(doc['columns']))
+        counts = array[:, :, doc['columns'].index(column)].astype(np.int64)
+        if status == 'all':
+            counts = counts[:, 0]
+        elif status == 'PASS':
+            counts = counts[:, 1]
+        else:
+            counts = counts[:, 0] - counts[:, 1]
+
+        tiles = np.arange(doc['chunk'] * CHUNK_TILES, (doc['chunk'] + 1) * CHUNK_TILES)
+        window_index = tiles * tile_size // window_size
+        whole = window_index == ((tiles + 1) * tile_size - 1) // window_size
+        selected = (tiles >= first_tile) & (tiles < last_tile) & whole & (counts > 0)
+        window_index = window_index[selected]
+        if len(window_index) == 0:
+            continue
+        offset = window_index[0]
+        sums = np.bincount(window_index - offset, weights=counts[selected])
+        for i in np.flatnonzero(sums):
+            windows[int(offset + i)] = windows.get(int(offset + i), 0) + int(sums[i])
+    return(windows)
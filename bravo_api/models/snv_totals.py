@@ -0,0 +1,142 @@
+"""
+Totals of paginated SNV queries.
+    Every page of a paginated query reports the total number of matching variants, which is the same
+    for all pages. Totals are cached by the normalized query filter for max_age seconds, so only the
+    first page counts.
+
+    load-snv writes the generation of each completed load to the 'snv_loaded' collection, and totals are
+    keyed by it, so totals counted before variants were reloaded are not served afterwards. The marker
+    is re-read after MARKER_MAX_AGE seconds.
+
+    Counting filtered variants over a wide span reads every variant in it. For spans wider than
+    estimate_span, the total is estimated instead: variants in the span are counted from the
+    (xpos, xstop) index alone, and scaled by the fraction of variants matching the filter in a few
+    evenly spaced sample windows.
+"""
+from bson import json_util
+from collections import OrderedDict
+import threading
+import time
+
+MAX_AGE = 10 * 60
+MAX_ENTRIES = 10000
+SAMPLE_WINDOWS = 16
+SAMPLE_WINDOW_SIZE = 10000
+MARKER_MAX_AGE = 60
+
+
+class LoadMarker():
+    """
+    Generation of the last completed load of variants, re-read from the collection after max_age seconds.
+    """
+
+    def __init__(self, max_age=MARKER_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._cached = None
+
+    def get(self, collection):
+        """
+        @return generation, or None if no load has completed since variants were last dropped.
+        """
+        with self._lock:
+            cached = self._cached
+        if cached is not None and time.time() - cached[1] <= self.max_age:
+            return(cached[0])
+        marker = collection.find_one({}, {'_id': 0, 'generation': 1})
+        generation = None if marker is None else marker['generation']
+        with self._lock:
+            self._cached = (generation, time.time())
+        return(generation)
+
+    def clear(self):
+        with self._lock:
+            self._cached = None
+
+
+class SnvTotals():
+
+    def __init__(self, max_age=MAX_AGE, max_entries=MAX_ENTRIES, sample_windows=SAMPLE_WINDOWS,
+                 sample_window_size=SAMPLE_WINDOW_SIZE):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.sample_windows = sample_windows
+        self.sample_window_size = sample_window_size
+        self._lock = threading.Lock()
+        self._totals = OrderedDict()
+
+    @staticmethod
+    def key(bounds, conditions, generation=None):
+        return(json_util.dumps([generation, bounds, conditions], sort_keys=True))
+
+    def _get(self, key):
+        with self._lock:
+            cached = self._totals.get(key)
+            if cached is None:
+                return(None)
+            if self.max_age is not None and time.time() - cached[2] > self.max_age:
+                del self._totals[key]
+                return(None)
+            self._totals.move_to_end(key)
+            return(cached[:2])
+
+    def _put(self, key, total, exact):
+        with self._lock:
+            self._totals[key] = (total, exact, time.time())
+            self._totals.move_to_end(key)
+            while len(self._totals) > self.max_entries:
+                self._totals.popitem(last=False)
+
+    def _count(self, collection, conditions, hint):
+        return(collection.count_documents({'$and': conditions}, hint=hint))
+
+    def _estimate(self, collection, bounds, conditions, hint, xstart, xstop):
+        """
+        @return estimated total, or None if no sample window has variants.
+        """
+        step = (xstop - xstart + 1) // self.sample_windows
+        size = min(step, self.sample_window_size)
+        sampled, matched = 0, 0
+        for i in range(self.sample_windows):
+            window_start = xstart + i * step + (step - size) // 2
+            window = [{'xpos': {'$gte': window_start, '$lt': window_start + size}}]
+            sampled += self._count(collection, bounds + window, hint)
+            matched += self._count(collection, bounds + window + conditions, hint)
+        if sampled == 0:
+            return(None)
+        return(round(self._count(collection, bounds, hint) * matched / sampled))
+
+    def total(self, collection, bounds, conditions, hint, xstart, xstop, estimate_span=None, generation=None):
+        """
+        Number of variants matching all bounds and conditions.
+        @param bounds Conditions on the queried span, e.g. its xpos and xstop limits.
+        @param conditions User filter conditions.
+        @param estimate_span Spans wider than this many bases with conditions get an estimated total. None disables estimates.
+        @param generation Load generation of the variants, see LoadMarker. Totals of other generations aren't used.
+        @return tuple of (total, True if exact or False if estimated)
+        """
+        key = self.key(bounds, conditions, generation)
+        cached = self._get(key)
+        if cached is not None:
+            return(cached)
+
+        total = None
+        if estimate_span is not None and conditions and xstop - xstart > estimate_span:
+            total = self._estimate(collection, bounds, conditions, hint, xstart, xstop)
+        exact = total is None
+        if exact:
+            total = self._count(collection, bounds + conditions, hint)
+        self._put(key, total, exact)
+        return(total, exact)
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+    def stats(self):
+        with self._lock:
+            return({'entries': len(self._totals)})
+
+
+snv_totals = SnvTotals()
+snv_load_marker = LoadMarker()
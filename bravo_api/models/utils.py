@@ -1,6 +1,21 @@
+from intervaltree import IntervalTree
+
+
+CHROMOSOMES = [ str(x) for x in range(1, 23) ]  + [ 'X', 'Y', 'M' ]
 
 
 def make_xpos(chrom, pos):
-    chromosomes = [ str(x) for x in range(1, 23) ]  + [ 'X', 'Y', 'M' ]
     if chrom.startswith('chr'): chrom = chrom[3:]
-    return { chrom: i + 1 for  i, chrom in enumerate(chromosomes) }[chrom] * int(1e9) + pos
+    return { chrom: i + 1 for  i, chrom in enumerate(CHROMOSOMES) }[chrom] * int(1e9) + pos
+
+
+def merged_exons(gene):
+    """
+    Exons of a full gene entry merged where they overlap, as sorted half-open intervals.
+    """
+    exons = IntervalTree()
+    for feature in gene['features']:
+        if feature['feature_type'] == 'exon':
+            exons.addi(feature['start'], feature['stop'] + 1)
+    exons.merge_overlaps()
+    return(sorted(exons))
@@ -1,11 +1,14 @@
 from bravo_api.models.database import mongo
 from bravo_api.models.utils import make_xpos
+from bravo_api.models.gene_models import gene_models
+from bravo_api.models.snv_totals import snv_totals, snv_load_marker
+from bravo_api.models.snv_tiles import tile_selection, tile_histogram, split_tiles, TileMarkers
+from bravo_api.models.readers import snv_consequence2code, snv_lof2code
 from flask import current_app
 import pymongo
 from bson.objectid import ObjectId
 from bson.regex import Regex
 import functools
-from intervaltree import Interval, IntervalTree
 from collections import Counter
 import math
 
@@ -37,6 +40,21 @@ field_api2mongo = {
 }
 
 
+# descending sort keys when variants were loaded with scalar codes of the most severe consequence and LoF.
+# Mongo sorts arrays descending by their largest element, which is the top code. Ascending sorts use the
+# smallest element, so they keep the array keys of field_api2mongo.
+field_api2mongo_top_codes = {
+   'annotation.region.lof': 'annotation.region.top_lof_code',
+   'annotation.region.consequence': 'annotation.region.top_consequence_code',
+   'annotation.gene.lof': 'annotation.genes.top_lof_code',
+   'annotation.gene.consequence': 'annotation.genes.top_consequence_code'
+}
+
+
+code2consequence = { code: name for name, code in snv_consequence2code.items() }
+code2lof = { code: name for name, code in snv_lof2code.items() }
+
+
 filter_values = [
    { 'value': 'PASS' },
    { 'value': 'SVM' },
@@ -217,17 +235,27 @@ def get_snv(variant_id, chrom, position, full):
        { '$limit': 10 }
     ]
 
-    cursor = mongo.db.snv.aggregate(pipeline)
-    for entry in cursor:
-        # entry = replace_nan_with_none(entry)
-        if full:
+    entries = list(mongo.db.snv.aggregate(pipeline))
+    if full:
+        names = get_gene_names(annotation_gene['name'] for entry in entries
+                               for annotation_gene in entry['annotation'].get('genes', []))
+        for entry in entries:
             for annotation_gene in entry['annotation'].get('genes', []):
-                gene = get_gene(annotation_gene['name'], False)
-                if gene is not None:
-                    annotation_gene['other_name'] = gene['gene_name']
+                name = names.get(annotation_gene['name'])
+                if name is not None:
+                    annotation_gene['other_name'] = name
+    for entry in entries:
+        # entry = replace_nan_with_none(entry)
         yield entry
 
 
+def get_gene_names(gene_ids):
+    """
+    Map gene ids to gene names from the in-process gene models. Ids without a gene map to None.
+    """
+    return(gene_models.gene_names(set(gene_ids)))
+
+
 def get_region(chrom, start, stop, filter, sort, last, limit):
     xstart = make_xpos(chrom, start)
     xstop = make_xpos(chrom, stop)
@@ -283,14 +311,16 @@ def get_region_snv(chrom, start, stop, filter, sort, continue_from, limit):
     # prepare user-specified filter conditions in mongo format
     # query optimizer didn't work well on Mongo 3.4 and {'xpos': { '$lte': xstop }}, {'xstop': {'$gte': xstart}} filter wasn't performing well
     # since here we work with short variants, to improve performance we add additional limits to xpos and xstop
-    mongo_filter = [ {'xpos': {'$gte': xstart - 1000}}, {'xpos': { '$lte': xstop }}, {'xstop': {'$gte': xstart}}, {'xstop': {'$lte': xstop + 1000}} ]
-    mongo_filter.extend(build_mongo_filter(filter))
+    mongo_bounds = [ {'xpos': {'$gte': xstart - 1000}}, {'xpos': { '$lte': xstop }}, {'xstop': {'$gte': xstart}}, {'xstop': {'$lte': xstop + 1000}} ]
+    mongo_conditions = build_mongo_filter(filter)
+    mongo_filter = mongo_bounds + mongo_conditions
 
-    n_total_documents = mongo.db.snv.count_documents({ '$and': mongo_filter })
+    n_total_documents, total_exact = snv_totals.total(mongo.db.snv, mongo_bounds, mongo_conditions, 'xpos_1_xstop_1',
+                                                      xstart, xstop, current_app.config.get('SNV_TOTAL_ESTIMATE_SPAN'), get_snv_generation())
 
     mongo_sort = []
     for key, direction in sort:
-        mongo_key = field_api2mongo.get(key, key)
+        mongo_key = get_sort_key(key, direction)
         mongo_direction = pymongo.ASCENDING if direction == 'asc' else pymongo.DESCENDING
         mongo_sort.append((mongo_key, mongo_direction))
     if len(mongo_sort) == 0: # xpos sorted by default if nothing else is specified
@@ -304,6 +334,7 @@ def get_region_snv(chrom, start, stop, filter, sort, continue_from, limit):
     result = {
        'limit': limit,
        'total': n_total_documents,
+       'total_exact': total_exact,
        'data': [],
        'sort': [('pos', 'asc')] if len(sort) == 0 else sort[:],
        'last': None
@@ -385,6 +416,22 @@ GET_GENES_FULL_LOOKUP_ADDON = [
 ]
 
 
+GET_GENES_COVERAGE_LOOKUP_ADDON = [
+    {'$lookup': {'from': 'coverage_summary',
+                 'localField': 'gene_id',
+                 'foreignField': 'gene_id',
+                 'as': 'coverage'
+                 }
+     },
+    {'$unwind': {'path': '$coverage', 'preserveNullAndEmptyArrays': True}},
+    {'$project': {'coverage._id': 0,
+                  'coverage.gene_id': 0,
+                  'coverage.chrom': 0
+                  }
+     }
+]
+
+
 def basic_genes_pipeline(name):
     pattern = Regex('^' + name, 'i')
     if name.startswith('ENSG'):
@@ -406,18 +453,20 @@ def full_genes_pipeline(name):
     return pipeline
 
 
-def get_genes(name, full):
+def get_genes(name, full, coverage=False):
     if full:
         pipeline = full_genes_pipeline(name)
     else:
         pipeline = basic_genes_pipeline(name)
+    if coverage:
+        pipeline.extend(GET_GENES_COVERAGE_LOOKUP_ADDON)
 
     cursor = mongo.db.genes.aggregate(pipeline)
     for entry in cursor:
         yield entry
 
 
-def get_genes_in_region(chrom, start, stop, full = False):
+def get_genes_in_region(chrom, start, stop, full = False, coverage = False):
     xstart = make_xpos(chrom, start)
     xstop = make_xpos(chrom, stop)
     pipeline = []
@@ -438,18 +487,88 @@ def get_genes_in_region(chrom, start, stop, full = False):
            'as': 'features'
         }})
         pipeline.append({'$project': {'features._id': 0, 'features.chrom': 0, 'features.xstart': 0, 'features.xstop': 0, 'features.gene_id': 0 }})
+    if coverage:
+        pipeline.extend(GET_GENES_COVERAGE_LOOKUP_ADDON)
     cursor = mongo.db.genes.aggregate(pipeline)
     for entry in cursor:
         yield entry
 
 
 def get_gene(name, full):
-    for entry in get_genes(name, full):
-        if name.startswith('ENSG'):
-            if name == entry['gene_id']:
-                return entry
-        elif name == entry['gene_name']:
-            return entry
+    gene = gene_models.gene(name)
+    if gene is None:
+        return None
+    gene = dict(gene)
+    if full:
+        gene['transcripts'] = list(mongo.db.transcripts.find({'gene_id': gene['gene_id']},
+            {'_id': 0, 'chrom': 0, 'xstart': 0, 'xstop': 0, 'gene_id': 0}))
+        gene['features'] = list(mongo.db.exons.find({'gene_id': gene['gene_id']},
+            {'_id': 0, 'chrom': 0, 'xstart': 0, 'xstop': 0, 'gene_id': 0}))
+    return gene
+
+
+def get_gene_exons(gene_id):
+    return gene_models.exons(gene_id)
+
+
+EXONIC_GENES_INDEX = 'exonic_genes_1_xpos_1'
+TOP_CODES_INDEX = 'xpos_1_xstop_1_top_codes'
+
+
+def get_snv_generation():
+    """
+    Generation of the last completed load of variants, or None while variants are being loaded or if they were loaded before generations were recorded.
+    """
+    return snv_load_marker.get(mongo.db.snv_loaded)
+
+
+@functools.lru_cache(maxsize = 4)
+def read_snv_indexes(generation):
+    """
+    Names of 'snv' indexes of the load generation. Read once per process and generation.
+    """
+    return set(mongo.db.snv.index_information())
+
+
+def get_snv_indexes():
+    """
+    Names of 'snv' indexes, which tell what was precomputed when variants were loaded. Re-read once variants are reloaded.
+    """
+    return read_snv_indexes(get_snv_generation())
+
+
+def has_exonic_genes():
+    """
+    True if variants were loaded with precomputed 'exonic_genes' and its index.
+    """
+    return EXONIC_GENES_INDEX in get_snv_indexes()
+
+
+def has_top_codes():
+    """
+    True if variants were loaded with 'variant_class' and top consequence and LoF codes, and their index.
+    """
+    return TOP_CODES_INDEX in get_snv_indexes()
+
+
+def get_sort_key(key, direction = 'desc'):
+    if direction != 'asc' and has_top_codes() and key in field_api2mongo_top_codes:
+        return field_api2mongo_top_codes[key]
+    return field_api2mongo.get(key, key)
+
+
+def get_gene_exons_filter(gene_id):
+    """
+    Mongo condition restricting variants to merged exons of the gene, and the index to serve it.
+    Precomputed 'exonic_genes' is scanned within the gene's xpos range in the exonic_genes, xpos index.
+    Otherwise the xpos range is scanned and filtered by one position range per exon.
+    """
+    if has_exonic_genes():
+        return {'exonic_genes': gene_id}, EXONIC_GENES_INDEX
+    mongo_exons_filter = []
+    for exon in get_gene_exons(gene_id):
+        mongo_exons_filter.append({'pos': {'$gte': exon.begin, '$lt': exon.end}})
+    return {'$or': mongo_exons_filter}, 'xpos_1_xstop_1'
 
 
 def get_gene_snv(name, filter, sort, continue_from, limit, introns):
@@ -457,23 +576,18 @@ def get_gene_snv(name, filter, sort, continue_from, limit, introns):
     result = {
        'limit': limit,
        'total': 0,
+       'total_exact': True,
        'data': [],
        'sort': [('pos', 'asc')] if len(sort) == 0 else sort[:],
        'last': None
     }
-    gene = get_gene(name, not introns)
+    gene = get_gene(name, False)
     if gene is None:
         return result
 
+    hint = 'xpos_1_xstop_1'
     if not introns:
-        exons = IntervalTree()
-        for feature in gene['features']:
-            if feature['feature_type'] == 'exon':
-                exons.addi(feature['start'], feature['stop'] + 1)
-        mongo_exons_filter = []
-        exons.merge_overlaps()
-        for exon in exons:
-            mongo_exons_filter.append({'pos': {'$gte': exon.begin, '$lt': exon.end}})
+        mongo_exons_filter, hint = get_gene_exons_filter(gene['gene_id'])
 
     gene_id = gene['gene_id']
     xstart = make_xpos(gene['chrom'], gene['start'])
@@ -501,11 +615,13 @@ def get_gene_snv(name, filter, sort, continue_from, limit, introns):
                 condition.update(new_expression)
 
 
-    result['total'] = mongo.db.snv.count_documents({ '$and': mongo_filter } if introns else { '$and': mongo_filter, '$or': mongo_exons_filter })
+    mongo_bounds = mongo_filter[:4] if introns else mongo_filter[:4] + [mongo_exons_filter]
+    result['total'], result['total_exact'] = snv_totals.total(mongo.db.snv, mongo_bounds, mongo_filter[4:], hint,
+                                                              xstart, xstop, current_app.config.get('SNV_TOTAL_ESTIMATE_SPAN'), get_snv_generation())
 
     mongo_sort = []
     for key, direction in sort:
-        mongo_key = field_api2mongo.get(key, key)
+        mongo_key = get_sort_key(key, direction)
         mongo_direction = pymongo.ASCENDING if direction == 'asc' else pymongo.DESCENDING
         mongo_sort.append((mongo_key, mongo_direction))
     if len(mongo_sort) == 0: # xpos sorted by default if nothing else is specified
@@ -544,7 +660,7 @@ def get_gene_snv(name, filter, sort, continue_from, limit, introns):
     ]
     if not introns:
         pipeline.extend([
-           { '$match': { '$or': mongo_exons_filter }}
+           { '$match': mongo_exons_filter }
         ])
     pipeline.extend([
        { '$project': projection },
@@ -552,7 +668,7 @@ def get_gene_snv(name, filter, sort, continue_from, limit, introns):
        { '$limit': limit }
     ])
 
-    cursor = mongo.db.snv.aggregate(pipeline, allowDiskUse = True, hint = 'xpos_1_xstop_1')
+    cursor = mongo.db.snv.aggregate(pipeline, allowDiskUse = True, hint = hint)
     for i, entry in enumerate(cursor, 1):
         if i == limit:
             result['last'] = {'_id': f'{entry["_id"]}'}
@@ -571,6 +687,41 @@ def get_gene_snv(name, filter, sort, continue_from, limit, introns):
     return result
 
 
+snv_tiles_markers = TileMarkers()
+
+
+def add_tile_windows(chrom, start, stop, filter, window_size, mongo_filter):
+    """
+    Counts variants of tiles lying wholly inside a window within [start, stop] from 'snv_tiles', and restricts mongo_filter to the remaining tiles cut by window edges and the region ends.
+    @return dict of number of variants by window start, or None if tiles can't serve the request and mongo_filter is unchanged.
+    """
+    selection = tile_selection(filter)
+    if selection is None:
+        return None
+    marker = snv_tiles_markers.get(mongo.db.snv_tiles_loaded, chrom)
+    if marker is None or window_size < marker['tile_size']:
+        return None
+    tile_size = marker['tile_size']
+    first_tile = -(-start // tile_size)
+    last_tile = (stop + 1) // tile_size
+    if first_tile >= last_tile:
+        return None
+    windows = tile_histogram(mongo.db.snv_tiles, chrom, marker['generation'], first_tile, last_tile, *selection,
+                             tile_size, window_size)
+    remaining = [{'xpos': {'$lt': make_xpos(chrom, first_tile * tile_size)}},
+                 {'xpos': {'$gte': make_xpos(chrom, last_tile * tile_size)}}]
+    remaining.extend({'xpos': {'$gte': make_xpos(chrom, tile * tile_size), '$lt': make_xpos(chrom, (tile + 1) * tile_size)}}
+                     for tile in split_tiles(first_tile, last_tile, tile_size, window_size))
+    mongo_filter.append({'$or': remaining})
+    return { window * window_size: count for window, count in windows.items() }
+
+
+def merge_tile_windows(tile_windows, entries):
+    for entry in entries:
+        tile_windows[entry['start']] = tile_windows.get(entry['start'], 0) + entry['count']
+    return [ { 'count': count, 'start': start } for start, count in sorted(tile_windows.items()) ]
+
+
 def get_region_snv_histogram(chrom, start, stop, filter, windows):
     xstart = make_xpos(chrom, start)
     xstop = make_xpos(chrom, stop)
@@ -583,6 +734,7 @@ def get_region_snv_histogram(chrom, start, stop, filter, windows):
     # since here we work with short variants, to improve performance we add additional limits to xpos and xstop
     mongo_filter = [ {'xpos': {'$gte': xstart - 1000}}, {'xpos': { '$lte': xstop }}, {'xstop': {'$gte': xstart}}, {'xstop': {'$lte': xstop + 1000}} ]
     mongo_filter.extend(build_mongo_filter(filter))
+    tile_windows = add_tile_windows(chrom, start, stop, filter, window_size, mongo_filter)
 
     pipeline = [
        { '$match': { '$and': mongo_filter }},
@@ -597,11 +749,68 @@ def get_region_snv_histogram(chrom, start, stop, filter, windows):
        'windows': []
     }
     cursor = mongo.db.snv.aggregate(pipeline, hint = 'xpos_1_xstop_1')
+    if tile_windows is not None:
+        data['windows'] = merge_tile_windows(tile_windows, cursor)
+        return data
     for entry in cursor:
         data['windows'].append(entry)
     return data
 
 
+def summary_group(annotation, top_codes = False):
+    """
+    $group stage counting variants by class and by first consequence and LoF of the annotation, so only the counts leave the server.
+    @param annotation Expression of the annotation entry with 'consequence' and 'lof' arrays, e.g. '$annotation.region'.
+    @param top_codes Group on precomputed 'variant_class' and top consequence and LoF codes instead.
+    """
+    if top_codes:
+        return { '$group': {
+           '_id': {
+              'snv': { '$eq': [ '$variant_class', 'snv' ] },
+              'indel': { '$eq': [ '$variant_class', 'indel' ] },
+              'consequence': { '$let': { 'vars': { 'entry': annotation }, 'in': '$$entry.top_consequence_code' } },
+              'lof': { '$let': { 'vars': { 'entry': annotation }, 'in': '$$entry.top_lof_code' } }
+           },
+           'count': { '$sum': 1 }
+        }}
+    alleles = { '$split': [ '$variant_id', '-' ] }
+    ref_length = { '$strLenCP': { '$arrayElemAt': [ alleles, 2 ] } }
+    alt_length = { '$strLenCP': { '$arrayElemAt': [ alleles, 3 ] } }
+    return { '$group': {
+       '_id': {
+          'snv': { '$and': [ { '$eq': [ ref_length, 1 ] }, { '$eq': [ alt_length, 1 ] } ] },
+          'indel': { '$ne': [ ref_length, alt_length ] },
+          'consequence': { '$arrayElemAt': [ { '$let': { 'vars': { 'entry': annotation }, 'in': '$$entry.consequence' } }, 0 ] },
+          'lof': { '$arrayElemAt': [ { '$let': { 'vars': { 'entry': annotation }, 'in': '$$entry.lof' } }, 0 ] }
+       },
+       'count': { '$sum': 1 }
+    }}
+
+
+def count_summary(cursor):
+    """
+    Totals of summary_group entries by class, first consequence and LoF.
+    """
+    summary = Counter()
+    for entry in cursor:
+        group, count = entry['_id'], entry['count']
+        lof, consequence = group.get('lof'), group.get('consequence')
+        if isinstance(lof, int): # precomputed codes
+            lof = code2lof.get(lof)
+        if isinstance(consequence, int):
+            consequence = code2consequence.get(consequence)
+        summary['total'] += count
+        if group['snv']:
+            summary['snv'] += count
+        elif group['indel']:
+            summary['indels'] += count
+        if lof:
+            summary[f'LoF ({lof})'] += count
+        if consequence:
+            summary[consequence] += count
+    return summary
+
+
 def get_region_snv_summary(chrom, start, stop, filter):
     xstart = make_xpos(chrom, start)
     xstop = make_xpos(chrom, stop)
@@ -612,25 +821,24 @@ def get_region_snv_summary(chrom, start, stop, filter):
     mongo_filter = [ {'xpos': {'$gte': xstart - 1000}}, {'xpos': { '$lte': xstop }}, {'xstop': {'$gte': xstart}}, {'xstop': {'$lte': xstop + 1000}} ]
     mongo_filter.extend(build_mongo_filter(filter))
 
-    pipeline = [
-       { '$match': { '$and': mongo_filter }},
-       { '$project': { '_id': False, 'variant_id': True, 'filter': True, 'annotation.region.consequence': True, 'annotation.region.lof': True }}
-    ]
+    if has_top_codes():
+        # only indexed fields are projected, so variants without user filters are counted from the index alone
+        pipeline = [
+           { '$match': { '$and': mongo_filter }},
+           { '$project': { '_id': False, 'variant_class': True, 'annotation.region.top_consequence_code': True, 'annotation.region.top_lof_code': True }},
+           summary_group('$annotation.region', True)
+        ]
+        hint = TOP_CODES_INDEX
+    else:
+        pipeline = [
+           { '$match': { '$and': mongo_filter }},
+           { '$project': { '_id': False, 'variant_id': True, 'annotation.region.consequence': True, 'annotation.region.lof': True }},
+           summary_group('$annotation.region')
+        ]
+        hint = 'xpos_1_xstop_1'
     result = {
-       'all': Counter()
+       'all': count_summary(mongo.db.snv.aggregate(pipeline, hint = hint))
     }
-    cursor = mongo.db.snv.aggregate(pipeline, hint = 'xpos_1_xstop_1')
-    for entry in cursor:
-        chrom, position, ref, alt = entry['variant_id'].split('-')
-        result['all']['total'] += 1
-        if len(ref) == 1 and len(alt) == 1:
-            result['all']['snv'] += 1
-        elif len(ref) != len(alt):
-            result['all']['indels'] += 1
-        if 'lof' in entry['annotation']['region']:
-            result['all'][f'LoF ({entry["annotation"]["region"]["lof"][0]})'] += 1
-        if entry['annotation']['region']['consequence']:
-            result['all'][entry['annotation']['region']['consequence'][0]] += 1
     return result
 
 
@@ -639,21 +847,13 @@ def get_gene_snv_summary(name, filter, introns):
        'all': Counter(),
     }
 
-    gene = get_gene(name, True)
+    gene = get_gene(name, False)
     if gene is None:
         return result
 
+    hint = 'xpos_1_xstop_1'
     if not introns:
-        exons = IntervalTree()
-        for feature in gene['features']:
-            if feature['feature_type'] == 'exon':
-                exons.addi(feature['start'], feature['stop'] + 1)
-        mongo_exons_filter = []
-        exon_length = 0
-        exons.merge_overlaps()
-        for exon in exons:
-            mongo_exons_filter.append({'pos': {'$gte': exon.begin, '$lt': exon.end}})
-            exon_length += exon.end - exon.begin
+        mongo_exons_filter, hint = get_gene_exons_filter(gene['gene_id'])
 
     gene_id = gene['gene_id']
     xstart = make_xpos(gene['chrom'], gene['start'])
@@ -671,7 +871,7 @@ def get_gene_snv_summary(name, filter, introns):
     projection = {
        '_id': False,
        'variant_id': True,
-       'filter': True,
+       'variant_class': True,
        'annotation.genes': {
           '$filter': {
              'input': '$annotation.genes',
@@ -684,23 +884,13 @@ def get_gene_snv_summary(name, filter, introns):
        { '$match': { '$and': mongo_filter }}
     ]
     if not introns:
-        pipeline.extend([{ '$match': { '$or': mongo_exons_filter}}])
+        pipeline.extend([{ '$match': mongo_exons_filter }])
     pipeline.extend([
-       { '$project': projection }
+       { '$project': projection },
+       summary_group({ '$arrayElemAt': [ '$annotation.genes', 0 ] }, has_top_codes())
     ])
 
-    cursor = mongo.db.snv.aggregate(pipeline, hint = 'xpos_1_xstop_1')
-    for entry in cursor:
-        chrom, position, ref, alt = entry['variant_id'].split('-')
-        result['all']['total'] += 1
-        if len(ref) == 1 and len(alt) == 1:
-            result['all']['snv'] += 1
-        elif len(ref) != len(alt):
-            result['all']['indels'] += 1
-        if 'lof' in entry['annotation']['genes'][0]:
-            result['all'][f'LoF ({entry["annotation"]["genes"][0]["lof"][0]})'] += 1
-        if entry['annotation']['genes'][0]['consequence']:
-            result['all'][entry['annotation']['genes'][0]['consequence'][0]] += 1
+    result['all'] = count_summary(mongo.db.snv.aggregate(pipeline, hint = hint))
     return result
 
 
@@ -711,21 +901,14 @@ def get_gene_snv_histogram(name, filter, windows, introns):
        'window-size': None,
        'windows': []
     }
-    gene = get_gene(name, not introns)
+    gene = get_gene(name, False)
     if gene is None:
         return result
 
+    hint = 'xpos_1_xstop_1'
     if not introns:
-        exons = IntervalTree()
-        for feature in gene['features']:
-            if feature['feature_type'] == 'exon':
-                exons.addi(feature['start'], feature['stop'] + 1)
-        mongo_exons_filter = []
-        exon_length = 0
-        exons.merge_overlaps()
-        for exon in exons:
-            mongo_exons_filter.append({'pos': {'$gte': exon.begin, '$lt': exon.end}})
-            exon_length += exon.end - exon.begin
+        mongo_exons_filter, hint = get_gene_exons_filter(gene['gene_id'])
+        exon_length = sum(exon.end - exon.begin for exon in get_gene_exons(gene['gene_id']))
 
     gene_id = gene['gene_id']
     xstart = make_xpos(gene['chrom'], gene['start'])
@@ -762,11 +945,15 @@ def get_gene_snv_histogram(name, filter, windows, introns):
                 condition.pop('$and')
                 condition.update(new_expression)
 
+    tile_windows = None
+    if introns:
+        tile_windows = add_tile_windows(gene['chrom'], gene['start'], gene['stop'], filter, window_size, mongo_filter)
+
     pipeline = [
        { '$match': { '$and': mongo_filter }}
     ]
     if not introns:
-        pipeline.extend([{ '$match': { '$or': mongo_exons_filter}}])
+        pipeline.extend([{ '$match': mongo_exons_filter }])
     pipeline.extend([
        { '$project': { 'pos': True }},
        { '$group' : {  '_id': { '$floor': { '$divide': [ '$pos', window_size ] }}, 'count': { '$sum': 1  }   } },
@@ -776,7 +963,10 @@ def get_gene_snv_histogram(name, filter, windows, introns):
     result['gene_id'] = gene_id
     result['window-size'] = window_size
 
-    cursor = mongo.db.snv.aggregate(pipeline, hint = 'xpos_1_xstop_1')
+    cursor = mongo.db.snv.aggregate(pipeline, hint = hint)
+    if tile_windows is not None:
+        result['windows'] = merge_tile_windows(tile_windows, cursor)
+        return result
     for entry in cursor:
         result['windows'].append(entry)
     return result
@@ -55,7 +55,8 @@ setuptools.setup(
         'pymongo>=3.11.2', 'click>=7.1.2', 'Flask>=1.1.2',
         'flask_cors>=3.0.10', 'flask_pymongo>=2.3.0', 'intervaltree>=3.1.0', 'marshmallow>=3.10.0',
         'pysam>=0.16.0.1', 'python-rapidjson>=1.0', 'webargs>=7.0.1',
-        'authlib>=1.0.0', 'flask-login>=0.5.0', 'requests>=2.25.1', 'boto3>=1.26'
+        'authlib>=1.0.0', 'flask-login>=0.5.0', 'requests>=2.25.1', 'boto3>=1.26',
+        'numpy>=1.19'
     ], # HX: in the public server, rapidjson>=1.0.0 is removed for now
 
     extras_require={
@@ -68,8 +69,15 @@ setuptools.setup(
         'flask.commands': [
             'load-genes=bravo_api.models.database:load_genes',
             'load-snv=bravo_api.models.database:load_snv',
+            'load-snv-tiles=bravo_api.models.database:load_snv_tiles',
             'load-qc-metrics=bravo_api.models.database:load_qc_metrics',
-            'create-users=bravo_api.models.database:create_users'
+            'load-coverage-summary=bravo_api.models.database:load_coverage_summary',
+            'create-users=bravo_api.models.database:create_users',
+            'convert-coverage=bravo_api.core.coverage_commands:convert_coverage',
+            'build-coverage-pyramid=bravo_api.core.coverage_commands:build_coverage_pyramid',
+            'sequences-cache=bravo_api.core.sequence_commands:sequences_cache',
+            'prewarm-sequences=bravo_api.core.sequence_commands:prewarm_sequences',
+            'convert-variant-map=bravo_api.core.sequence_commands:convert_variant_map'
         ],
     },
 
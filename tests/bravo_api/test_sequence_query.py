@@ -22,21 +22,16 @@ def test_cram_full_hom_query(client, config):
     cached_cram = os.path.join(config['SEQUENCES_CACHE_DIR'], f'chr{variant}-01.bam')
     received_cram = os.path.join(os.getcwd(), 'test_sequence.cram')
     response = client.get(f'/sequence?variant_id={variant}&sample_no=1&heterozygous=0', headers = {})
-    assert response.status_code == 206
+    assert response.status_code == 200
     assert response.headers.get('Content-Type', '') == 'application/octet-stream'
     assert 'Content-Length' in response.headers
-    assert 'Content-Range' in response.headers
+    assert response.headers.get('Accept-Ranges', '') == 'bytes'
     with open(received_cram, 'bw') as ifile:
         ifile.write(response.data)
     received_cram_size = os.path.getsize(received_cram)
     os.remove(received_cram)
     assert received_cram_size == int(response.headers['Content-Length'])
     assert received_cram_size == os.path.getsize(cached_cram)
-    m = re.search(r'bytes (\d+)-(\d+)/(\d+)', response.headers['Content-Range'])
-    assert m is not None
-    assert int(m.group(1)) == 0
-    assert int(m.group(2)) == received_cram_size - 1
-    assert int(m.group(3)) == os.path.getsize(cached_cram)
 
 
 @pytest.mark.integration
@@ -45,21 +40,16 @@ def test_cram_full_het_query(client, config):
     cached_cram = os.path.join(config['SEQUENCES_CACHE_DIR'], f'chr{variant}-1.bam')
     received_cram = os.path.join(os.getcwd(), 'test_sequence.cram')
     response = client.get(f'/sequence?variant_id={variant}&sample_no=1&heterozygous=1', headers = {})
-    assert response.status_code == 206
+    assert response.status_code == 200
     assert response.headers.get('Content-Type', '') == 'application/octet-stream'
     assert 'Content-Length' in response.headers
-    assert 'Content-Range' in response.headers
+    assert response.headers.get('Accept-Ranges', '') == 'bytes'
     with open(received_cram, 'bw') as ifile:
         ifile.write(response.data)
     received_cram_size = os.path.getsize(received_cram)
     os.remove(received_cram)
     assert received_cram_size == int(response.headers['Content-Length'])
     assert received_cram_size == os.path.getsize(cached_cram)
-    m = re.search(r'bytes (\d+)-(\d+)/(\d+)', response.headers['Content-Range'])
-    assert m is not None
-    assert int(m.group(1)) == 0
-    assert int(m.group(2)) == received_cram_size - 1
-    assert int(m.group(3)) == os.path.getsize(cached_cram)
 
 
 @pytest.mark.integration
@@ -83,7 +73,7 @@ def test_cram_partial1_query(client, config):
     m = re.search(r'bytes (\d+)-(\d+)/(\d+)', response.headers['Content-Range'])
     assert m is not None
     assert int(m.group(1)) == query_range_start
-    assert int(m.group(2)) == query_range_stop - 1
+    assert int(m.group(2)) == min(query_range_stop, os.path.getsize(cached_cram) - 1)
     assert int(m.group(3)) == os.path.getsize(cached_cram)
 
 
@@ -107,7 +97,7 @@ def test_cram_partial2_query(client, config):
     m = re.search(r'bytes (\d+)-(\d+)/(\d+)', response.headers['Content-Range'])
     assert m is not None
     assert int(m.group(1)) == query_range_start
-    assert int(m.group(2)) == query_range_stop - 1
+    assert int(m.group(2)) == min(query_range_stop, os.path.getsize(cached_cram) - 1)
     assert int(m.group(3)) == os.path.getsize(cached_cram)
 
 
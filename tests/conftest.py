@@ -1,4 +1,6 @@
 import pytest  # noqa
+import json
+import pysam
 
 # Top level conftest to provide behavior of running only unmarked tests.
 #   i.e. skip running 'integration' tests without explicitly asking for them (-m 'integration')
@@ -15,3 +17,27 @@ def pytest_collection_modifyitems(items, config):
     if not markexpr:
         markexpr = "False"
     config.option.markexpr = f"default or ({markexpr})"
+
+
+@pytest.fixture(scope="session")
+def real_cov_dir(tmp_path_factory):
+    """
+    Coverage directory with small bgzipped and tabix indexed chr11 files in the full and bin_1.00
+    bins. Rows of full are single positions; rows of bin_1.00 span 10 positions.
+    """
+    cov_dir = tmp_path_factory.mktemp('real_coverage')
+    thresholds = ['1', '5', '10', '15', '20', '25', '30', '50', '100']
+    for cbin, width in [('full', 1), ('bin_1.00', 10)]:
+        cov_dir.joinpath(cbin).mkdir()
+        tsv_path = cov_dir.joinpath(cbin, f'chr11.{cbin}.tsv')
+        with open(tsv_path, 'w') as ofile:
+            for i, start in enumerate(range(5000, 9000, width)):
+                end = start + width - 1
+                data = {'chrom': '11', 'start': start, 'end': end,
+                        'mean': round(30 + (i % 17) * 0.37, 2), 'median': 30 + (i % 7) * 0.5}
+                data.update({key: round(max(0, 1 - int(key) * (i % 11) / 500), 2)
+                             for key in thresholds})
+                ofile.write(f'11\t{start}\t{end}\t{json.dumps(data, separators=(",", ":"))}\n')
+        pysam.tabix_index(str(tsv_path), seq_col=0, start_col=1, end_col=2, zerobased=False)
+
+    return(str(cov_dir))
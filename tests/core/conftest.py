@@ -3,6 +3,7 @@ import string
 import random
 import os
 import boto3
+import pathlib
 from moto import mock_s3
 
 # Mock coverage file structure
@@ -122,3 +123,19 @@ def sham_incomplete_cov_url(s3, incomplete_bins, expected_chroms):
                           Body='sham index content')
 
     return(f's3://{bucket_name}/{prefix}')
+
+
+@pytest.fixture(scope="session")
+def real_cov_url(s3, real_cov_dir):
+    """
+    Bucket holding the real_cov_dir coverage files. Return url to the coverage prefix.
+    """
+    bucket_name = 'real-'.join([random.choice(string.ascii_lowercase) for i in range(8)])
+    prefix = 'coverage'
+    s3.create_bucket(Bucket=bucket_name,
+                     CreateBucketConfiguration={'LocationConstraint': 'atlantis'})
+
+    for path in pathlib.Path(real_cov_dir).glob('*/*.tsv.gz*'):
+        s3.upload_file(str(path), bucket_name, f'{prefix}/{path.parent.name}/{path.name}')
+
+    return(f's3://{bucket_name}/{prefix}')
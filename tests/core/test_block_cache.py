@@ -0,0 +1,57 @@
+from bravo_api.core.block_cache import BlockCache
+
+
+def test_get_returns_put_block(tmp_path):
+    cache = BlockCache(tmp_path, 1000)
+    assert(cache.get('chr1.full.tsv.gz', 0) is None)
+    cache.put('chr1.full.tsv.gz', 0, 42, b'data')
+
+    assert(cache.get('chr1.full.tsv.gz', 0) == (42, b'data'))
+    assert(cache.get('chr2.full.tsv.gz', 0) is None)
+    assert(cache.stats()['hits'] == 1)
+    assert(cache.stats()['misses'] == 2)
+
+
+def test_evicts_least_recently_used_by_bytes(tmp_path):
+    # Each entry is a 4 byte size header plus 96 bytes of data.
+    cache = BlockCache(tmp_path, 250)
+    cache.put('key', 0, 1, b'a' * 96)
+    cache.put('key', 1, 1, b'b' * 96)
+    cache.get('key', 0)
+    cache.put('key', 2, 1, b'c' * 96)
+
+    assert(cache.get('key', 1) is None)
+    assert(cache.get('key', 0) == (1, b'a' * 96))
+    assert(cache.get('key', 2) == (1, b'c' * 96))
+    assert(cache.stats()['bytes'] == 200)
+    assert(cache.stats()['evictions'] == 1)
+    assert(len([path for path in tmp_path.iterdir() if not path.name.startswith('.')]) == 2)
+
+
+def test_skips_blocks_larger_than_cache(tmp_path):
+    cache = BlockCache(tmp_path, 50)
+    cache.put('key', 0, 1, b'a' * 96)
+    assert(cache.get('key', 0) is None)
+
+
+def test_adopts_existing_files(tmp_path):
+    BlockCache(tmp_path, 1000).put('key', 7, 3, b'abc')
+    cache = BlockCache(tmp_path, 1000)
+
+    assert(cache.get('key', 7) == (3, b'abc'))
+    assert(cache.stats()['bytes'] == 7)
+
+
+def test_budget_shared_between_instances(tmp_path):
+    # Two workers using the same directory.
+    first = BlockCache(tmp_path, 250, low_water=0.8)
+    second = BlockCache(tmp_path, 250, low_water=0.8)
+    first.put('key', 0, 1, b'a' * 96)
+    second.put('key', 1, 1, b'b' * 96)
+    # Use by the other worker keeps block 0 recent.
+    second.get('key', 0)
+    first.put('key', 2, 1, b'c' * 96)
+
+    assert(first.stats()['bytes'] == second.stats()['bytes'] == 200)
+    assert(first.get('key', 0) == (1, b'a' * 96))
+    assert(first.get('key', 1) is None)
@@ -0,0 +1,116 @@
+import gzip
+import json
+import pytest
+import shutil
+from bravo_api.core.coverage_provider import CoverageProvider
+from bravo_api.core.coverage_provider_factory import CoverageProviderFactory
+from bravo_api.core.columnar_coverage import convert_coverage_file, ColumnarCoverageFile
+from bravo_api.core.columnar_coverage_provider import ColumnarCoverageProvider
+from bravo_api.core.fs_coverage_provider import FSCoverageProvider
+from bravo_api.core.coverage_commands import convert_coverage, build_coverage_pyramid
+from click.testing import CliRunner
+
+
+@pytest.fixture(scope="module")
+def columnar_cov_dir(tmp_path_factory, real_cov_dir):
+    out_dir = tmp_path_factory.mktemp('columnar_coverage')
+    result = CliRunner().invoke(convert_coverage, ['1', real_cov_dir, str(out_dir)])
+    assert(result.exit_code == 0), result.output
+    return(str(out_dir))
+
+
+def test_smokes(columnar_cov_dir):
+    cp = ColumnarCoverageProvider(columnar_cov_dir)
+    assert(isinstance(cp, CoverageProvider))
+
+
+def test_factory_detects_columnar(columnar_cov_dir, real_cov_dir):
+    assert(isinstance(CoverageProviderFactory.build(columnar_cov_dir), ColumnarCoverageProvider))
+    assert(isinstance(CoverageProviderFactory.build(real_cov_dir), FSCoverageProvider))
+
+
+def test_catalog_discovery(columnar_cov_dir):
+    cp = ColumnarCoverageProvider(columnar_cov_dir)
+    assert(set(cp.catalog['full'].keys()) == {'11'})
+    assert(set(cp.catalog['bin_1.00'].keys()) == {'11'})
+    assert(cp.evaluate_chrom_readability() == [])
+
+
+def test_readability_checks_every_column(tmp_path, real_cov_dir):
+    result = CliRunner().invoke(convert_coverage, ['1', real_cov_dir, str(tmp_path)])
+    assert(result.exit_code == 0), result.output
+    missing = tmp_path / 'full' / 'chr11.full.cov' / 'int.bin'
+    missing.unlink()
+
+    cp = ColumnarCoverageProvider(str(tmp_path))
+    assert(cp.evaluate_chrom_readability() == [f'Coverage file {missing} unreadable'])
+
+
+def test_zoom_levels_converted(tmp_path, real_cov_dir):
+    cov_dir = tmp_path / 'coverage'
+    shutil.copytree(real_cov_dir, cov_dir)
+    result = CliRunner().invoke(build_coverage_pyramid,
+                                ['--base-width', '8', '--levels', '2', '1', str(cov_dir), str(cov_dir)])
+    assert(result.exit_code == 0), result.output
+    result = CliRunner().invoke(convert_coverage, ['1', str(cov_dir), str(tmp_path / 'columnar')])
+    assert(result.exit_code == 0), result.output
+
+    tabix_cp = FSCoverageProvider(str(cov_dir))
+    columnar_cp = ColumnarCoverageProvider(str(tmp_path / 'columnar'))
+    assert(columnar_cp.zoom_widths == [8, 16])
+    for cov_bin in ['zoom_8', 'zoom_16']:
+        assert(json.dumps(columnar_cp.coverage(cov_bin, '11', 4000, 7000)) ==
+               json.dumps(tabix_cp.coverage(cov_bin, '11', 4000, 7000)))
+
+
+@pytest.mark.parametrize('cov_bin', ['full', 'bin_1.00'])
+@pytest.mark.parametrize('start, stop', [(4000, 4500), (4990, 5003), (5000, 5000), (5004, 5017),
+                                         (6011, 7500), (8990, 9100), (9500, 9600), (1, 20000)])
+def test_coverage_matches_tabix(columnar_cov_dir, real_cov_dir, cov_bin, start, stop):
+    tabix_cp = FSCoverageProvider(real_cov_dir)
+    columnar_cp = ColumnarCoverageProvider(columnar_cov_dir)
+
+    assert(json.dumps(columnar_cp.coverage(cov_bin, '11', start, stop)) ==
+           json.dumps(tabix_cp.coverage(cov_bin, '11', start, stop)))
+
+
+def test_nonexistant_coverage(columnar_cov_dir):
+    cp = ColumnarCoverageProvider(columnar_cov_dir)
+    assert(cp.coverage('bad_bin', '11', 100, 2000) == [])
+    assert(cp.coverage('full', 'bad_chrom', 100, 2000) == [])
+
+
+def test_small_block_index(tmp_path, real_cov_dir, mocker):
+    mocker.patch('bravo_api.core.columnar_coverage.BLOCK_SIZE', 7)
+    src_path = FSCoverageProvider(real_cov_dir).lookup_coverage_path('full', '11')
+    convert_coverage_file(src_path, tmp_path / 'chr11.full.cov')
+    cov_file = ColumnarCoverageFile(tmp_path / 'chr11.full.cov')
+
+    assert(cov_file.block_size == 7)
+    for start in [4999, 5000, 5006, 5007, 5013, 8998, 8999]:
+        rows = cov_file.fetch(start, start + 3)
+        assert([row['start'] for row in rows] == [pos for pos in range(start + 1, start + 4)
+                                                  if 5000 <= pos < 9000])
+
+
+def test_iter_coverage_matches_coverage(tmp_path, real_cov_dir, mocker):
+    mocker.patch('bravo_api.core.columnar_coverage.BLOCK_SIZE', 7)
+    result = CliRunner().invoke(convert_coverage, ['1', real_cov_dir, str(tmp_path)])
+    assert(result.exit_code == 0), result.output
+    cp = ColumnarCoverageProvider(str(tmp_path))
+
+    assert(list(cp.iter_coverage('full', '11', 4990, 6020)) ==
+           cp.coverage('full', '11', 4990, 6020))
+    assert(list(cp.iter_coverage('full', 'bad_chrom', 4990, 6020)) == [])
+
+
+def test_exact_values(tmp_path):
+    rows = [{'chrom': '11', 'start': 100, 'end': 100, 'mean': 30, 'median': 29.5, '1': 1, '5': 0.123456789},
+            {'chrom': '11', 'start': 101, 'end': 101, 'mean': 0.1 + 0.2, 'median': 0, '1': 0, '5': 0}]
+    src_path = tmp_path / 'chr11.full.tsv.gz'
+    with gzip.open(src_path, 'wt') as ofile:
+        for row in rows:
+            ofile.write(f"11\t{row['start']}\t{row['end']}\t{json.dumps(row)}\n")
+    convert_coverage_file(src_path, tmp_path / 'chr11.full.cov')
+
+    assert(json.dumps(ColumnarCoverageFile(tmp_path / 'chr11.full.cov').fetch(0, 200)) == json.dumps(rows))
@@ -4,8 +4,8 @@ from bravo_api.core.s3_coverage_provider import S3CoverageProvider
 from bravo_api.core.fs_coverage_provider import FSCoverageProvider
 
 
-def test_factory_makes_s3_coverage_provider(sham_cov_url):
-    cp = CoverageProviderFactory.build(sham_cov_url)
+def test_factory_makes_s3_coverage_provider(tmp_path, sham_cov_url):
+    cp = CoverageProviderFactory.build(sham_cov_url, cache_dir=str(tmp_path))
     assert(isinstance(cp, S3CoverageProvider))
 
 
@@ -0,0 +1,59 @@
+import numpy as np
+from bravo_api.core.coverage_pyramid import build_pyramid_file, level_widths
+from bravo_api.core.coverage_commands import build_coverage_pyramid
+from bravo_api.core.fs_coverage_provider import FSCoverageProvider
+from click.testing import CliRunner
+
+
+def full_means(real_cov_dir):
+    rows = FSCoverageProvider(real_cov_dir).coverage('full', '11', 1, 20000)
+    return({row['start']: row['mean'] for row in rows})
+
+
+def test_level_widths():
+    assert(level_widths(128, 3) == [128, 256, 512])
+
+
+def test_command_builds_discoverable_levels(tmp_path, real_cov_dir):
+    result = CliRunner().invoke(build_coverage_pyramid,
+                                ['--base-width', '8', '--levels', '4', '1', real_cov_dir,
+                                 str(tmp_path)])
+    assert(result.exit_code == 0), result.output
+
+    cp = FSCoverageProvider(str(tmp_path))
+    assert(cp.zoom_widths == [8, 16, 32, 64])
+    assert(set(cp.catalog['zoom_64'].keys()) == {'11'})
+
+
+def test_levels_aggregate_full_bin(tmp_path, real_cov_dir):
+    src_path = FSCoverageProvider(real_cov_dir).lookup_coverage_path('full', '11')
+    build_pyramid_file(src_path, '11', tmp_path, [8, 16, 32, 64])
+    cp = FSCoverageProvider(str(tmp_path))
+    means = full_means(real_cov_dir)
+
+    for width in [8, 64]:
+        rows = cp.coverage(f'zoom_{width}', '11', 1, 20000)
+        # Full bin covers 5000-8999, so first and last windows are partially covered.
+        assert(rows[0]['start'] == (4999 // width) * width + 1)
+        assert(rows[-1]['end'] == (8998 // width + 1) * width)
+        assert(sum(row['covered'] for row in rows) == 4000)
+        for row in rows:
+            vals = [means[pos] for pos in range(row['start'], row['end'] + 1) if pos in means]
+            assert(row['covered'] == len(vals))
+            assert(row['min'] == min(vals))
+            assert(row['max'] == max(vals))
+            assert(abs(row['mean'] - np.mean(vals)) < 0.01)
+
+
+def test_chunk_boundaries_do_not_change_levels(tmp_path, real_cov_dir, mocker):
+    src_path = FSCoverageProvider(real_cov_dir).lookup_coverage_path('full', '11')
+    build_pyramid_file(src_path, '11', tmp_path / 'whole', [8, 16])
+    mocker.patch('bravo_api.core.coverage_pyramid.CHUNK_ROWS', 5)
+    build_pyramid_file(src_path, '11', tmp_path / 'chunked', [8, 16])
+
+    whole = FSCoverageProvider(str(tmp_path / 'whole'))
+    chunked = FSCoverageProvider(str(tmp_path / 'chunked'))
+    for cov_bin in ['zoom_8', 'zoom_16']:
+        whole_rows = whole.coverage(cov_bin, '11', 1, 20000)
+        chunked_rows = chunked.coverage(cov_bin, '11', 1, 20000)
+        assert(whole_rows == chunked_rows)
@@ -0,0 +1,117 @@
+import numpy as np
+from bravo_api.core.coverage_reduction import window_edges, downsample, Downsampler, summarize, \
+    combine_summaries
+from bravo_api.core.columnar_coverage_provider import ColumnarCoverageProvider
+from bravo_api.core.fs_coverage_provider import FSCoverageProvider
+from bravo_api.core.coverage_commands import convert_coverage
+from click.testing import CliRunner
+
+
+def test_window_edges_cover_range():
+    edges = window_edges(101, 200, 7)
+    assert(len(edges) == 8)
+    assert(edges[0] == 101 and edges[-1] == 201)
+    assert(np.all(np.diff(edges) >= 1))
+
+
+def test_window_edges_never_narrower_than_a_base():
+    edges = window_edges(10, 14, 100)
+    assert(edges.tolist() == [10, 11, 12, 13, 14, 15])
+
+
+def test_downsample_single_position_rows():
+    starts = np.arange(1, 11)
+    values = np.arange(1, 11, dtype=float)
+    result = downsample(starts, starts, values, 1, 10, 2)
+
+    assert(result['start'].tolist() == [1, 6])
+    assert(result['end'].tolist() == [5, 10])
+    assert(result['min'].tolist() == [1, 6])
+    assert(result['max'].tolist() == [5, 10])
+    assert(result['mean'].tolist() == [3, 8])
+    assert(result['covered'].tolist() == [5, 5])
+
+
+def test_downsample_row_spanning_windows():
+    # One row of depth 4 over 1-6 and one of depth 10 over 7-10.
+    result = downsample([1, 7], [6, 10], [4, 10], 1, 10, 2)
+
+    assert(result['min'].tolist() == [4, 4])
+    assert(result['max'].tolist() == [4, 10])
+    assert(result['mean'].tolist() == [4, (4 + 40) / 5])
+
+
+def test_downsample_gaps_and_clipping():
+    # Row extends past the requested range on the left; nothing covers the second window.
+    result = downsample([1], [15], [2.0], 11, 30, 2)
+
+    assert(result['covered'].tolist() == [5, 0])
+    assert(result['mean'][0] == 2.0)
+    assert(np.isnan(result['min'][1]) and np.isnan(result['mean'][1]))
+
+
+def test_downsample_no_rows():
+    result = downsample([], [], [], 1, 100, 4)
+    assert(result['covered'].tolist() == [0, 0, 0, 0])
+    assert(np.all(np.isnan(result['max'])))
+
+
+def test_columnar_arrays_match_tabix_rows(tmp_path, real_cov_dir):
+    result = CliRunner().invoke(convert_coverage, ['1', real_cov_dir, str(tmp_path)])
+    assert(result.exit_code == 0), result.output
+    columnar_cp = ColumnarCoverageProvider(str(tmp_path))
+    tabix_cp = FSCoverageProvider(real_cov_dir)
+
+    col_chunks = list(columnar_cp.iter_coverage_arrays('full', '11', 4990, 6020,
+                                                       fields=('mean', 'median'), rows_per_chunk=100))
+    tbx_chunks = list(tabix_cp.iter_coverage_arrays('full', '11', 4990, 6020,
+                                                    fields=('mean', 'median'), rows_per_chunk=100))
+    assert([len(chunk['start']) for chunk in col_chunks] == [100] * 10 + [21])
+    for key in ['start', 'end', 'mean', 'median']:
+        assert(np.array_equal(np.concatenate([chunk[key] for chunk in col_chunks]),
+                              np.concatenate([chunk[key] for chunk in tbx_chunks])))
+    assert(list(columnar_cp.iter_coverage_arrays('full', 'bad_chrom', 4990, 6020)) == [])
+
+
+def test_downsample_aggregated_rows():
+    # Two 10bp zoom rows, the first with only half of its positions covered.
+    result = downsample([1, 11], [10, 20], [4.0, 10.0], 1, 20, 1,
+                        mins=[2.0, 8.0], maxs=[6.0, 12.0], covered=[5, 10])
+
+    assert(result['min'].tolist() == [2.0])
+    assert(result['max'].tolist() == [12.0])
+    assert(result['covered'].tolist() == [15])
+    assert(result['mean'][0] == (4 * 5 + 10 * 10) / 15)
+
+
+def test_summarize_counts_uncovered_positions():
+    # Rows cover 1-5 at depth 10 and 8-10 at depth 30; 6-7 have no rows.
+    result = summarize([1, 8], [5, 10], [10.0, 30.0], 1, 10, [1, 20])
+
+    assert(result['bases'] == 10)
+    assert(result['mean'] == (10 * 5 + 30 * 3) / 10)
+    assert(result['above'] == {'1': 0.8, '20': 0.3})
+
+
+def test_combine_summaries_weights_by_bases():
+    first = summarize([1], [10], [10.0], 1, 10, [20])
+    second = summarize([1], [30], [30.0], 1, 30, [20])
+    result = combine_summaries([first, second])
+
+    assert(result['bases'] == 40)
+    assert(result['mean'] == (10 * 10 + 30 * 30) / 40)
+    assert(result['above'] == {'20': 0.75})
+
+
+def test_downsampler_chunks_match_downsample():
+    starts = np.arange(1, 101, 3)
+    ends = starts + 2
+    values = np.arange(len(starts), dtype=float)
+    expected = downsample(starts, ends, values, 5, 95, 7)
+
+    downsampler = Downsampler(5, 95, 7)
+    for lo in range(0, len(starts), 4):
+        downsampler.add(starts[lo:lo + 4], ends[lo:lo + 4], values[lo:lo + 4])
+    result = downsampler.result()
+    for key in expected:
+        assert(np.allclose(result[key], expected[key], equal_nan=True))
@@ -184,3 +184,56 @@ def test_coverage_trailing_slash(sham_cov_dir):
 
     assert(len(warnings_no_slash) == 0)
     assert(len(warnings_from_slash) == 0)
+
+
+def test_coverage_reuses_tabix_handle(mocker, sham_cov_dir, expected_bins, expected_chroms):
+    sham_coverage = [('11', 1, 10, '{"mean": 10}')]
+
+    mocker.patch('bravo_api.core.fs_coverage_provider.pysam.TabixFile', FakeTabix)
+    mocker.patch('bravo_api.core.fs_coverage_provider.pysam.TabixFile.fetch',
+                 return_value=sham_coverage)
+
+    cp = FSCoverageProvider(sham_cov_dir)
+    cp.coverage(expected_bins[0], expected_chroms[0], 1, 100)
+    cp.coverage(expected_bins[0], expected_chroms[0], 1, 100)
+
+    pool_stats = cp.stats()['tabix_pool']
+    assert(pool_stats['misses'] == 1)
+    assert(pool_stats['hits'] == 1)
+
+
+def test_iter_coverage_matches_coverage(real_cov_dir):
+    cp = FSCoverageProvider(real_cov_dir)
+    assert(list(cp.iter_coverage('full', '11', 4990, 6020)) ==
+           cp.coverage('full', '11', 4990, 6020))
+    assert(list(cp.iter_coverage('full', 'bad_chrom', 4990, 6020)) == [])
+
+
+def test_iter_coverage_returns_handle_when_closed(real_cov_dir):
+    cp = FSCoverageProvider(real_cov_dir)
+    rows = cp.iter_coverage('full', '11', 4990, 6020)
+    next(rows)
+    rows.close()
+
+    assert(cp.stats()['tabix_pool']['size'] == 1)
+
+
+def test_iter_coverage_discards_handle_on_error(real_cov_dir, mocker):
+    cp = FSCoverageProvider(real_cov_dir)
+    mocker.patch('bravo_api.core.fs_coverage_provider.rapidjson.loads', side_effect=ValueError)
+    with pytest.raises(ValueError):
+        list(cp.iter_coverage('full', '11', 4990, 6020))
+
+    assert(cp.stats()['tabix_pool']['size'] == 0)
+
+
+def test_coverage_batch_matches_coverage(real_cov_dir, mocker):
+    cp = FSCoverageProvider(real_cov_dir)
+    intervals = [('11', 6000, 6010), ('11', 4990, 5003), ('11', 6005, 6020), ('11', 6021, 6030),
+                 ('11', 7000, 7000), ('bad_chrom', 100, 200), ('11', 9500, 9600)]
+    expected = [cp.coverage('full', *interval) for interval in intervals]
+
+    spy = mocker.spy(cp, 'coverage')
+    assert(cp.coverage_batch('full', intervals) == expected)
+    # 6000-6030 merged into one lookup.
+    assert(spy.call_count == 5)
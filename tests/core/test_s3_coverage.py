@@ -1,15 +1,16 @@
 import pytest
 from bravo_api.core.coverage_provider import CoverageProvider, CoverageSourceInaccessibleError
 from bravo_api.core.s3_coverage_provider import S3CoverageProvider
+from bravo_api.core.fs_coverage_provider import FSCoverageProvider
 from botocore.exceptions import ClientError
 
 
-def test_smokes(sham_cov_url):
-    cp = S3CoverageProvider(sham_cov_url)
+def test_smokes(tmp_path, sham_cov_url):
+    cp = S3CoverageProvider(sham_cov_url, tmp_path)
     assert(isinstance(cp, CoverageProvider))
 
 
-def test_missing_source_error(mocker):
+def test_missing_source_error(tmp_path, mocker):
     # Set up mocks
     fake_msg = 'Testing bucket does not exist.'
     fake_code = 'NoSuchBucket'
@@ -22,7 +23,7 @@ def test_missing_source_error(mocker):
 
     # Do call
     with pytest.raises(CoverageSourceInaccessibleError) as err:
-        S3CoverageProvider('s3://non-existant-bucket/coverage-prefix')
+        S3CoverageProvider('s3://non-existant-bucket/coverage-prefix', tmp_path)
 
     # Verify expected calls
     class_mock.assert_called_once_with('s3')
@@ -33,8 +34,8 @@ def test_missing_source_error(mocker):
     assert(err.match(fake_msg))
 
 
-def test_catalog_discovery_full(s3, sham_cov_url, expected_bins, expected_chroms):
-    cp = S3CoverageProvider(sham_cov_url)
+def test_catalog_discovery_full(tmp_path, s3, sham_cov_url, expected_bins, expected_chroms):
+    cp = S3CoverageProvider(sham_cov_url, tmp_path)
     all_paths = [pth
                  for cov_bin in cp.catalog.values()
                  for pth in cov_bin.values()]
@@ -51,14 +52,14 @@ def test_catalog_discovery_full(s3, sham_cov_url, expected_bins, expected_chroms
         assert(path.endswith('.tsv.gz'))
 
 
-def test_catalog_readability(sham_cov_url):
-    cp = S3CoverageProvider(sham_cov_url)
+def test_catalog_readability(tmp_path, sham_cov_url):
+    cp = S3CoverageProvider(sham_cov_url, tmp_path)
     messages = cp.evaluate_chrom_readability()
     assert(len(messages) == 0)
 
 
-def test_catalog_readability_denied(mocker, sham_cov_url):
-    cp = S3CoverageProvider(sham_cov_url)
+def test_catalog_readability_denied(tmp_path, mocker, sham_cov_url):
+    cp = S3CoverageProvider(sham_cov_url, tmp_path)
 
     mock_method = mocker.patch.object(cp.client, 'head_object')
     fake_err = ClientError({'Error': {'Code': '403', 'Message': 'Forbidden'}}, 'head_object')
@@ -69,17 +70,134 @@ def test_catalog_readability_denied(mocker, sham_cov_url):
     assert(len(messages) == mock_method.call_count)
 
 
-def test_evaluate_chrom_representation(sham_cov_url):
-    cp = S3CoverageProvider(sham_cov_url)
+def test_evaluate_chrom_representation(tmp_path, sham_cov_url):
+    cp = S3CoverageProvider(sham_cov_url, tmp_path)
     messages = cp.evaluate_chrom_representation()
     assert(len(messages) == 0)
 
 
 def test_evaluate_chrom_representation_incomplete(
-    sham_incomplete_cov_url, incomplete_bins, expected_bins
+    tmp_path, sham_incomplete_cov_url, incomplete_bins, expected_bins
 ):
-    cp = S3CoverageProvider(sham_incomplete_cov_url)
+    cp = S3CoverageProvider(sham_incomplete_cov_url, tmp_path)
     messages = cp.evaluate_chrom_representation()
 
     num_messages_expected = len(expected_bins) - len(incomplete_bins)
     assert(len(messages) == num_messages_expected)
+
+
+@pytest.mark.parametrize('cov_bin', ['full', 'bin_1.00'])
+@pytest.mark.parametrize('start, stop', [(4000, 4500), (4990, 5003), (5000, 5000), (5004, 5017),
+                                         (6011, 7500), (8990, 9100), (9500, 9600), (1, 20000)])
+def test_coverage_matches_tabix(tmp_path, real_cov_url, real_cov_dir, cov_bin, start, stop):
+    s3_cp = S3CoverageProvider(real_cov_url, tmp_path)
+    tabix_cp = FSCoverageProvider(real_cov_dir)
+
+    assert(s3_cp.coverage(cov_bin, '11', start, stop) ==
+           tabix_cp.coverage(cov_bin, '11', start, stop))
+
+
+def test_index_and_blocks_are_cached(tmp_path, real_cov_url, mocker):
+    cp = S3CoverageProvider(real_cov_url, tmp_path)
+    spy = mocker.spy(cp.client, 'get_object')
+
+    first = cp.coverage('full', '11', 6000, 6500)
+    n_requests = spy.call_count
+    assert(n_requests >= 2)
+
+    second = cp.coverage('full', '11', 6000, 6500)
+    assert(first == second)
+    assert(spy.call_count == n_requests)
+    assert(cp.stats()['indexes'] == 1)
+    assert(cp.stats()['block_cache']['hits'] > 0)
+
+
+def test_blocks_survive_restart(tmp_path, real_cov_url, mocker):
+    expected = S3CoverageProvider(real_cov_url, tmp_path).coverage('full', '11', 6000, 6500)
+
+    cp = S3CoverageProvider(real_cov_url, tmp_path)
+    spy = mocker.spy(cp.client, 'get_object')
+    assert(cp.coverage('full', '11', 6000, 6500) == expected)
+    # Only the index is fetched again.
+    assert(spy.call_count == 1)
+
+
+def test_missing_chrom_coverage(tmp_path, real_cov_url):
+    cp = S3CoverageProvider(real_cov_url, tmp_path)
+    assert(cp.coverage('full', 'bad_chrom', 100, 2000) == [])
+
+
+def test_catalog_discovery_follows_pages(tmp_path, mocker, sham_cov_url, expected_bins, expected_chroms):
+    # 230 coverage & index objects listed 7 at a time.
+    mocker.patch('bravo_api.core.s3_coverage_provider.LIST_PAGE_SIZE', 7)
+    cp = S3CoverageProvider(sham_cov_url, tmp_path)
+
+    for bin_name in expected_bins:
+        assert(set(cp.catalog[bin_name].keys()) == set(expected_chroms))
+
+
+def test_catalog_discovery_includes_zoom_levels(tmp_path, real_cov_url):
+    cp = S3CoverageProvider(real_cov_url, tmp_path)
+    assert(cp.zoom_widths == [])
+
+    key = f'{cp.prefix}/zoom_128/chr11.zoom_128.tsv.gz'
+    cp.client.put_object(Bucket=cp.bucket, Key=key, Body='sham coverage content')
+    try:
+        cp = S3CoverageProvider(real_cov_url, tmp_path / 'fresh')
+        assert(cp.zoom_widths == [128])
+        assert(cp.catalog['zoom_128'] == {'11': key})
+    finally:
+        cp.client.delete_object(Bucket=cp.bucket, Key=key)
+
+
+def test_catalog_manifest_reused(tmp_path, sham_cov_url, mocker):
+    first = S3CoverageProvider(sham_cov_url, tmp_path)
+    spy = mocker.spy(S3CoverageProvider, 'list_keys')
+
+    second = S3CoverageProvider(sham_cov_url, tmp_path)
+    assert(spy.call_count == 0)
+    assert(second.catalog == first.catalog)
+
+
+def test_catalog_manifest_stale_or_other_source(tmp_path, sham_cov_url, sham_incomplete_cov_url,
+                                                mocker):
+    S3CoverageProvider(sham_cov_url, tmp_path)
+    spy = mocker.spy(S3CoverageProvider, 'list_keys')
+
+    other = S3CoverageProvider(sham_incomplete_cov_url, tmp_path)
+    assert(spy.call_count == 1)
+    assert(other.catalog['bin_0.25'] == {})
+
+    mocker.patch('bravo_api.core.s3_coverage_provider.MANIFEST_MAX_AGE', -1)
+    S3CoverageProvider(sham_incomplete_cov_url, tmp_path)
+    assert(spy.call_count == 2)
+
+
+def test_iter_coverage_matches_coverage(tmp_path, real_cov_url):
+    cp = S3CoverageProvider(real_cov_url, tmp_path)
+    assert(list(cp.iter_coverage('full', '11', 4990, 6020)) ==
+           cp.coverage('full', '11', 4990, 6020))
+
+
+def test_default_cache_dir(tmp_path, sham_cov_url, sham_incomplete_cov_url, mocker):
+    mocker.patch('bravo_api.core.s3_coverage_provider.tempfile.gettempdir', return_value=str(tmp_path))
+    first = S3CoverageProvider(sham_cov_url)
+    assert(first.cache_dir.parent == tmp_path)
+    assert(S3CoverageProvider(sham_cov_url).cache_dir == first.cache_dir)
+    assert(S3CoverageProvider(sham_incomplete_cov_url).cache_dir != first.cache_dir)
+
+
+def test_warm_up_loads_indexes(tmp_path, real_cov_url, mocker):
+    cp = S3CoverageProvider(real_cov_url, tmp_path)
+    cp.warm_up()
+    assert(cp.stats()['indexes'] == 2)
+
+    spy = mocker.spy(cp.client, 'get_object')
+    cp.coverage('full', '11', 6000, 6500)
+    assert(all('Range' in call.kwargs for call in spy.call_args_list))
+
+
+def test_warm_up_skips_unreadable_indexes(tmp_path, sham_cov_url):
+    cp = S3CoverageProvider(sham_cov_url, tmp_path)
+    cp.warm_up()
+    assert(cp.stats()['indexes'] == 0)
@@ -0,0 +1,103 @@
+import gc
+import pysam
+import pytest
+from bravo_api.core.fs_cram_source import FSCramSource
+from bravo_api.core import s3_cram_source
+from bravo_api.core.s3_cram_source import S3CramSource, CramIndex
+from bravo_api.core.cram_source import CramSourceInaccessibleError
+
+
+@pytest.fixture(scope="module")
+def local_crams(tmp_path_factory):
+    """
+    Coordinate sorted CRAM of 30000 reads, written in three containers, and its reference.
+    """
+    crams_dir = tmp_path_factory.mktemp('crams')
+    reference = crams_dir / 'ref.fa'
+    reference.write_text('>chr11\n' + 'A' * 6000 + '\n')
+    pysam.faidx(str(reference))
+
+    source = FSCramSource(str(crams_dir), str(reference))
+    cram = crams_dir / source.sample_id_to_location('S1')
+    cram.parent.mkdir()
+    header = {'HD': {'VN': '1.6', 'SO': 'coordinate'}, 'SQ': [{'SN': 'chr11', 'LN': 6000}]}
+    with pysam.AlignmentFile(str(cram), 'wc', header=header, reference_filename=str(reference)) as ocram:
+        for i in range(30000):
+            read = pysam.AlignedSegment(ocram.header)
+            read.query_name = f'read{i}'
+            read.reference_id = 0
+            read.reference_start = i // 6
+            read.cigarstring = '10M'
+            read.query_sequence = 'A' * 10
+            read.query_qualities = pysam.qualitystring_to_array('I' * 10)
+            ocram.write(read)
+    pysam.index(str(cram))
+    return(source)
+
+
+@pytest.fixture()
+def sham_cram_url(s3, local_crams):
+    bucket_name = 'sham-crams'
+    s3.create_bucket(Bucket=bucket_name,
+                     CreateBucketConfiguration={'LocationConstraint': 'atlantis'})
+    key = local_crams.sample_id_to_location('S1')[len(local_crams.src) + 1:]
+    for suffix in ['', '.crai']:
+        with open(local_crams.sample_id_to_location('S1') + suffix, 'rb') as ifile:
+            s3.put_object(Bucket=bucket_name, Key=f'crams/{key}{suffix}', Body=ifile.read())
+    yield(f's3://{bucket_name}/crams')
+    for item in s3.list_objects_v2(Bucket=bucket_name)['Contents']:
+        s3.delete_object(Bucket=bucket_name, Key=item['Key'])
+    s3.delete_bucket(Bucket=bucket_name)
+
+
+def test_index_containers(local_crams):
+    with open(local_crams.sample_id_to_location('S1') + '.crai', 'rb') as ifile:
+        index = CramIndex(ifile.read())
+    assert(len(index.offsets) == 3)
+    assert(index.containers(0, 2600, 2610) == [(index.offsets[1], index.offsets[2])])
+    assert(index.containers(0, 1, 5000)[-1] == (index.offsets[2], None))
+    assert(index.containers(1, 1, 5000) == [])
+
+
+def test_reads_match_local_source(sham_cram_url, local_crams, tmp_path, mocker):
+    source = S3CramSource(sham_cram_url, local_crams.ref, tmp_path)
+    get_object = mocker.spy(source.client, 'get_object')
+    temporary = mocker.spy(s3_cram_source.tempfile, 'NamedTemporaryFile')
+
+    for start, stop in [(2600, 2700), (0, 50), (4990, 6000), (1660, 1670)]:
+        _, reads = source.read_seqs('S1', 'chr11', start, stop)
+        _, expected = local_crams.read_seqs('S1', 'chr11', start, stop)
+        assert([read.query_name for read in reads] == [read.query_name for read in expected])
+    requests = get_object.call_count
+
+    # Index, header, and containers are reused.
+    source.read_seqs('S1', 'chr11', 2650, 2750)
+    assert(get_object.call_count == requests)
+    assert(source.stats()['samples'] == 1)
+    assert(source.read_seqs('S1', 'chr12', 0, 100)[1] == [])
+
+    # Temporary CRAMs stay out of the directory root, where read slices are kept.
+    assert({call.kwargs['dir'] for call in temporary.call_args_list} == {tmp_path / 'tmp'})
+    assert(sorted(path.name for path in tmp_path.iterdir()) == ['containers', 'tmp'])
+
+
+def test_missing_bucket(s3, tmp_path):
+    with pytest.raises(CramSourceInaccessibleError):
+        S3CramSource('s3://no-such-crams-bucket/crams', None, tmp_path)
+
+
+def test_samples_bounded_and_temporary_cache_removed(s3, sham_cram_url, local_crams):
+    key = local_crams.sample_id_to_location('S2')[len(local_crams.src) + 1:]
+    for suffix in ['', '.crai']:
+        with open(local_crams.sample_id_to_location('S1') + suffix, 'rb') as ifile:
+            s3.put_object(Bucket='sham-crams', Key=f'crams/{key}{suffix}', Body=ifile.read())
+    source = S3CramSource(sham_cram_url, local_crams.ref, max_samples=1)
+    cache_dir = source.cache_dir
+
+    assert(source.read_seqs('S1', 'chr11', 2600, 2700)[1])
+    assert(source.read_seqs('S2', 'chr11', 2600, 2700)[1])
+    assert(source.stats()['samples'] == 1)
+
+    del source
+    gc.collect()
+    assert(not cache_dir.exists())
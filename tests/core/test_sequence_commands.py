@@ -0,0 +1,27 @@
+from bravo_api.core import sequence_commands
+import pysam
+import pytest
+
+
+@pytest.fixture()
+def crams_dir(tmp_path):
+    variant_map = tmp_path / 'variant_map.tsv'
+    variant_map.write_text('#MAX_RANDOM_HOM_HETS=2\n'
+                           '#CHROM\tPOS\tREF\tALT\tHOM\tHET\n'
+                           'chr11\t100\tA\tG\tS1\tS2,S3,S4\n')
+    pysam.tabix_index(str(variant_map), seq_col=0, start_col=1, end_col=1, meta_char='#')
+    (tmp_path / 'sequences').mkdir()
+    (tmp_path / 'cache').mkdir()
+    return(tmp_path)
+
+
+def test_prewarm_variant_extracts_capped_samples(crams_dir, mocker):
+    extract = mocker.patch('bravo_api.models.sequences.SequencesClient._extract', return_value=True)
+    sequence_commands._init_prewarm((str(crams_dir), None, str(crams_dir / 'cache'), 100),
+                                    {'extract_threads': 1, 'extract_timeout': None})
+
+    # One hom sample, and three het samples capped by MAX_RANDOM_HOM_HETS.
+    assert(sequence_commands._prewarm_variant(('11-100-A-G', 5)) == ('11-100-A-G', 3))
+    assert(extract.call_count == 3)
+    assert(sequence_commands._prewarm_variant(('11-100-A-G', 1)) == ('11-100-A-G', 2))
+    assert(sequence_commands._prewarm_variant(('11-200-A-G', 5)) == ('11-200-A-G', None))
@@ -0,0 +1,72 @@
+from bravo_api.core.slice_cache import SliceCache
+import time
+import os
+
+
+def make_slice(cache_dir, name, size, age):
+    bam = cache_dir / name
+    bam.write_bytes(b'x' * size)
+    (cache_dir / f'{name}.bai').write_bytes(b'i' * 10)
+    mtime = time.time() - age
+    os.utime(bam, (mtime, mtime))
+
+
+def test_usage_counts_slice_and_index(tmp_path):
+    make_slice(tmp_path, 'chr11-100-A-G-01.bam', 100, 0)
+    (tmp_path / 'chr11-200-A-G-1.bam.123.456.tmp.bam').write_bytes(b'x' * 1000)
+    cache = SliceCache(tmp_path, 1000)
+    assert(cache.usage()['slices'] == 1)
+    assert(cache.usage()['bytes'] == 110)
+
+
+def test_prune_evicts_least_recently_accessed(tmp_path):
+    make_slice(tmp_path, 'a.bam', 100, 300)
+    make_slice(tmp_path, 'b.bam', 100, 200)
+    make_slice(tmp_path, 'c.bam', 100, 100)
+    cache = SliceCache(tmp_path, 250, grace_seconds=0)
+    # Oldest by modification time, but just served.
+    cache.touch('a.bam')
+
+    assert(cache.prune() == ['b.bam'])
+    assert(not (tmp_path / 'b.bam').exists() and not (tmp_path / 'b.bam.bai').exists())
+
+    # Accesses by another worker are seen through the modification time.
+    assert(SliceCache(tmp_path, 120, grace_seconds=0).prune() == ['c.bam'])
+
+
+def test_touch_missing_slice(tmp_path):
+    cache = SliceCache(tmp_path, 1000)
+    assert(not cache.touch('a.bam'))
+    make_slice(tmp_path, 'a.bam', 100, 300)
+    assert(cache.touch('a.bam'))
+    assert(time.time() - (tmp_path / 'a.bam').stat().st_mtime < 60)
+
+
+def test_added_prunes_above_budget(tmp_path, mocker):
+    make_slice(tmp_path, 'a.bam', 100, 300)
+    make_slice(tmp_path, 'b.bam', 100, 200)
+    cache = SliceCache(tmp_path, 300, grace_seconds=0, low_water=0.6)
+    prune = mocker.spy(cache, 'prune')
+    slices = mocker.spy(cache, '_slices')
+
+    # First slice scans the directory to learn its size, later ones add to the estimate.
+    assert(cache.added('b.bam') == [])
+    make_slice(tmp_path, 'c.bam', 40, 100)
+    assert(cache.added('c.bam') == [])
+    assert(slices.call_count == 1)
+    assert(prune.call_count == 0)
+
+    # Above the budget, evicts down to the low-water mark.
+    make_slice(tmp_path, 'd.bam', 100, 0)
+    assert(cache.added('d.bam') == ['a.bam', 'b.bam'])
+    assert(prune.call_count == 1)
+
+
+def test_prune_keeps_recent_slices(tmp_path):
+    make_slice(tmp_path, 'a.bam', 100, 300)
+    make_slice(tmp_path, 'b.bam', 100, 0)
+    cache = SliceCache(tmp_path, 0, grace_seconds=60)
+
+    assert(cache.prune() == ['a.bam'])
+    assert((tmp_path / 'b.bam').exists())
+    assert(cache.evictions == 1)
@@ -0,0 +1,75 @@
+import pytest
+from bravo_api.core.tabix_pool import TabixHandlePool
+
+
+class FakeTabix():
+    def __init__(self, path):
+        self.path = path
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_tabix(mocker):
+    return(mocker.patch('bravo_api.core.tabix_pool.pysam.TabixFile', side_effect=FakeTabix))
+
+
+def test_reuses_released_handle(fake_tabix):
+    pool = TabixHandlePool(4)
+    with pool.handle(('full', '1'), 'chr1.tsv.gz') as first:
+        pass
+    with pool.handle(('full', '1'), 'chr1.tsv.gz') as second:
+        pass
+
+    assert(first is second)
+    assert(fake_tabix.call_count == 1)
+    assert(pool.stats()['hits'] == 1)
+    assert(pool.stats()['misses'] == 1)
+
+
+def test_concurrent_checkout_opens_separate_handles(fake_tabix):
+    pool = TabixHandlePool(4)
+    with pool.handle(('full', '1'), 'chr1.tsv.gz') as first:
+        with pool.handle(('full', '1'), 'chr1.tsv.gz') as second:
+            assert(first is not second)
+    assert(pool.stats()['size'] == 2)
+
+
+def test_evicts_least_recently_used(fake_tabix):
+    pool = TabixHandlePool(2)
+    handles = {}
+    for chrom in ['1', '2', '3']:
+        with pool.handle(('full', chrom), f'chr{chrom}.tsv.gz') as handle:
+            handles[chrom] = handle
+
+    stats = pool.stats()
+    assert(stats['size'] == 2)
+    assert(stats['evictions'] == 1)
+    assert(handles['1'].closed)
+    assert(not handles['3'].closed)
+
+
+def test_discards_handle_on_error(fake_tabix):
+    pool = TabixHandlePool(2)
+    with pytest.raises(ValueError):
+        with pool.handle(('full', '1'), 'chr1.tsv.gz') as handle:
+            raise ValueError('bad fetch')
+
+    assert(handle.closed)
+    assert(pool.stats()['size'] == 0)
+
+
+def test_forgets_handles_after_fork(mocker, fake_tabix):
+    pool = TabixHandlePool(2)
+    with pool.handle(('full', '1'), 'chr1.tsv.gz') as parent_handle:
+        pass
+
+    mocker.patch('bravo_api.core.tabix_pool.os.getpid', return_value=-1)
+    with pool.handle(('full', '1'), 'chr1.tsv.gz') as child_handle:
+        pass
+
+    assert(child_handle is not parent_handle)
+    assert(not parent_handle.closed)
+    assert(pool.stats()['misses'] == 1)
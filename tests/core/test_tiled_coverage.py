@@ -0,0 +1,78 @@
+import pytest
+from bravo_api.core.coverage_provider import CoverageProvider
+from bravo_api.core.coverage_provider_factory import CoverageProviderFactory
+from bravo_api.core.fs_coverage_provider import FSCoverageProvider
+from bravo_api.core.tiled_coverage import TiledCoverageProvider
+
+
+@pytest.fixture
+def small_tiles(mocker):
+    mocker.patch.dict('bravo_api.core.tiled_coverage.TILE_WIDTHS',
+                      {'full': 100, 'bin_1.00': 250})
+
+
+def test_smokes(real_cov_dir):
+    cp = TiledCoverageProvider(FSCoverageProvider(real_cov_dir))
+    assert(isinstance(cp, CoverageProvider))
+    assert(cp.catalog == cp.provider.catalog)
+
+
+def test_factory_wraps_when_enabled(real_cov_dir):
+    assert(isinstance(CoverageProviderFactory.build(real_cov_dir, tile_cache_rows=100),
+                      TiledCoverageProvider))
+    assert(isinstance(CoverageProviderFactory.build(real_cov_dir), FSCoverageProvider))
+
+
+@pytest.mark.parametrize('cov_bin', ['full', 'bin_1.00'])
+@pytest.mark.parametrize('start, stop', [(4000, 4500), (4990, 5003), (5000, 5000), (5004, 5017),
+                                         (5095, 5105), (6011, 7500), (8990, 9100), (1, 20000)])
+def test_coverage_matches_provider(small_tiles, real_cov_dir, cov_bin, start, stop):
+    inner = FSCoverageProvider(real_cov_dir)
+    cp = TiledCoverageProvider(FSCoverageProvider(real_cov_dir))
+
+    assert(cp.coverage(cov_bin, '11', start, stop) == inner.coverage(cov_bin, '11', start, stop))
+
+
+def test_overlapping_requests_hit_tiles(small_tiles, real_cov_dir, mocker):
+    events = []
+    cp = TiledCoverageProvider(FSCoverageProvider(real_cov_dir),
+                               instrument=lambda cov_bin, outcome: events.append(outcome))
+    spy = mocker.spy(cp.provider, 'coverage')
+
+    cp.coverage('full', '11', 6010, 6190)
+    cp.coverage('full', '11', 6050, 6250)
+
+    assert(spy.call_count == 3)
+    assert(events == ['miss', 'miss', 'memory', 'memory', 'miss'])
+    assert(cp.stats()['tile_cache']['hit_ratio'] == 2 / 5)
+
+
+def test_evicts_least_recent_tiles_by_rows(small_tiles, real_cov_dir):
+    # Full bin tiles of 100 positions hold 100 rows each.
+    cp = TiledCoverageProvider(FSCoverageProvider(real_cov_dir), max_rows=250)
+    for start in [6001, 6101, 6201, 6301]:
+        cp.coverage('full', '11', start, start + 99)
+
+    assert(cp.stats()['tile_cache']['tiles'] == 2)
+    assert(cp.stats()['tile_cache']['rows'] == 200)
+
+
+def test_tiles_shared_through_store(small_tiles, tmp_path, real_cov_dir, mocker):
+    first = TiledCoverageProvider(FSCoverageProvider(real_cov_dir), cache_dir=tmp_path)
+    expected = first.coverage('full', '11', 6010, 6190)
+
+    second = TiledCoverageProvider(FSCoverageProvider(real_cov_dir), cache_dir=tmp_path)
+    spy = mocker.spy(second.provider, 'coverage')
+
+    assert(second.coverage('full', '11', 6010, 6190) == expected)
+    assert(spy.call_count == 0)
+    assert(second.stats()['tile_cache']['disk'] == 2)
+
+
+def test_returned_rows_are_copies(small_tiles, real_cov_dir):
+    cp = TiledCoverageProvider(FSCoverageProvider(real_cov_dir))
+    expected = cp.coverage('full', '11', 6010, 6020)
+    for row in cp.coverage('full', '11', 6010, 6020):
+        row['mean'] = None
+
+    assert(cp.coverage('full', '11', 6010, 6020) == expected)
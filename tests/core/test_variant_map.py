@@ -0,0 +1,50 @@
+from bravo_api.core.variant_map import convert_variant_map, VariantMapFile
+import gzip
+import pytest
+
+ROWS = ['chr11\t100\tA\tG\tS1\tS2,S3',
+        'chr11\t100\tA\tT\t\tS1',
+        'chr11\t250\tC\tCT\tS4,S2\t',
+        'chr2\t50\tG\tA\tS5\tS6']
+
+
+def write_variant_map(path, rows):
+    with gzip.open(path, 'wt') as ofile:
+        ofile.write('#MAX_RANDOM_HOM_HETS=5\n#CHROM\tPOS\tREF\tALT\tHOM\tHET\n')
+        for row in rows:
+            ofile.write(row + '\n')
+
+
+def test_lookup_samples(tmp_path):
+    write_variant_map(tmp_path / 'variant_map.tsv.gz', ROWS)
+    assert(convert_variant_map(tmp_path / 'variant_map.tsv.gz', tmp_path / 'variant_map.bin') == 4)
+    variant_map = VariantMapFile(tmp_path / 'variant_map.bin')
+
+    assert(variant_map.contigs == ['chr11', 'chr2'])
+    assert(variant_map.max_random_hom_hets == 5)
+    row = variant_map.find('chr11', 100, 'A', 'T')
+    assert(variant_map.counts(row) == (0, 1))
+    assert(variant_map.sample_id(row, 1, True) == 'S1')
+    assert(variant_map.sample_id(row, 1, False) is None)
+
+    row = variant_map.find('chr11', 250, 'C', 'CT')
+    assert(variant_map.sample_ids(row) == (['S4', 'S2'], []))
+    assert(variant_map.sample_id(row, 2, False) == 'S2')
+    assert(variant_map.sample_ids(variant_map.find('chr2', 50, 'G', 'A')) == (['S5'], ['S6']))
+    assert(variant_map.find('chr11', 100, 'A', 'C') is None)
+    assert(variant_map.find('chr3', 100, 'A', 'G') is None)
+
+
+def test_unsorted_variant_map(tmp_path):
+    write_variant_map(tmp_path / 'variant_map.tsv.gz', [ROWS[2], ROWS[0]])
+    with pytest.raises(ValueError):
+        convert_variant_map(tmp_path / 'variant_map.tsv.gz', tmp_path / 'variant_map.bin')
+
+
+def test_other_format_version(tmp_path, mocker):
+    write_variant_map(tmp_path / 'variant_map.tsv.gz', ROWS)
+    mocker.patch('bravo_api.core.variant_map.FORMAT_VERSION', 0)
+    convert_variant_map(tmp_path / 'variant_map.tsv.gz', tmp_path / 'variant_map.bin')
+    mocker.stopall()
+    with pytest.raises(ValueError, match='format version 0'):
+        VariantMapFile(tmp_path / 'variant_map.bin')
@@ -31,3 +31,11 @@ def test_returns_version_when_defined():
 
     assert(resp.content_type == 'application/json')
     assert(content['version'] == app.version)
+
+
+def test_coverage_stats_empty_without_provider():
+    with app.test_client() as client:
+        resp = client.get('/stats/coverage')
+
+    assert(resp.content_type == 'application/json')
+    assert(resp.get_json() == {})
@@ -6,7 +6,7 @@ app.register_blueprint(gene_routes.bp)
 app.config['BRAVO_API_PAGE_LIMIT'] = 1000
 
 
-def mock_get_genes_by_name(name):
+def mock_get_genes_by_name(name, coverage=False):
     return({'data': [1, 2, 3], 'total': 3, 'limit': None, 'next': None, 'error': None})
 
 
@@ -17,5 +17,25 @@ def test_genes_by_name(mocker):
     with app.test_client() as client:
         resp = client.get(f'/genes/api/{name}')
 
-    mock.assert_called_with(name)
+    mock.assert_called_with(name, coverage=False)
+    assert(resp.content_type == 'application/json')
+
+
+def test_genes_by_name_with_coverage(mocker):
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.get_genes_by_name',
+                        side_effect=mock_get_genes_by_name)
+    with app.test_client() as client:
+        client.get('/genes/api/foo?coverage=true')
+
+    mock.assert_called_with('foo', coverage=True)
+
+
+def test_gene_exon_coverage(mocker):
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.get_gene_exon_coverage',
+                        return_value={'data': [], 'total': 0, 'limit': None, 'next': None,
+                                      'error': None})
+    with app.test_client() as client:
+        resp = client.get('/coverage/gene/ENSG00000000001/exons')
+
+    mock.assert_called_with('ENSG00000000001')
     assert(resp.content_type == 'application/json')
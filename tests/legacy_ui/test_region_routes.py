@@ -1,5 +1,9 @@
-from bravo_api.blueprints.legacy_ui import region_routes
+from bravo_api.blueprints.legacy_ui import region_routes, pretty_api
+from bravo_api.core.coverage_commands import build_coverage_pyramid
+from bravo_api.core.fs_coverage_provider import FSCoverageProvider
+from click.testing import CliRunner
 from flask import Flask
+import shutil
 
 app = Flask('dummy')
 app.register_blueprint(region_routes.bp)
@@ -32,3 +36,124 @@ def test_chunked_coverage_validation(mocker):
             assert(resp.status_code == 422)
 
     assert(not mock.called)
+
+
+def test_downsampled_coverage_call(mocker):
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.downsampled_coverage',
+                        return_value={'dummy': 100})
+    args = {'chrom': '11', 'start': 500000, 'stop': 5001000, 'points': 800}
+
+    with app.test_client() as client:
+        client.post('/downsampled-coverage', json=args)
+
+    mock.assert_called_with(*list(args.values()))
+
+
+def test_downsampled_coverage_reads_zoom_level_or_binned_coverage(tmp_path, real_cov_dir, mocker):
+    cov_dir = tmp_path / 'coverage'
+    shutil.copytree(real_cov_dir, cov_dir)
+    provider = FSCoverageProvider(str(cov_dir))
+    mocker.patch.object(app, 'coverage_provider', provider, create=True)
+    spy = mocker.spy(provider, 'iter_coverage_arrays')
+
+    with app.app_context():
+        # No zoom levels: a wide range reads the bin chunked coverage would use, not the full bin.
+        binned = pretty_api.downsampled_coverage('11', 1, 20000, 4)
+        assert(spy.call_args.args[0] == 'bin_1.00')
+        assert(binned['covered'] == [1, 3999, 0, 0])
+
+        result = CliRunner().invoke(build_coverage_pyramid,
+                                    ['--base-width', '8', '--levels', '2', '1', str(cov_dir), str(cov_dir)])
+        assert(result.exit_code == 0), result.output
+        provider.catalog = provider.discover_files()
+        zoomed = pretty_api.downsampled_coverage('11', 1, 20000, 4)
+        assert(spy.call_args.args[0] == 'zoom_16')
+        # Zoom windows straddling a window edge split their covered bases in proportion.
+        assert(zoomed['covered'] == [4, 3996, 0, 0])
+        assert(zoomed['min'][1] == 30.0 and zoomed['max'][1] == 35.92)
+
+
+def test_downsampled_coverage_validation(mocker):
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.downsampled_coverage',
+                        return_value={'dummy': 100})
+    bad_arg_sets = [
+        {'chrom': '11', 'start': 40_000, 'stop': 30_000, 'points': 100},
+        {'chrom': '11', 'start': 40_000, 'stop': 50_000, 'points': 0}]
+
+    with app.test_client() as client:
+        for args in bad_arg_sets:
+            resp = client.post('/downsampled-coverage', json=args)
+            assert(resp.status_code == 422)
+
+    assert(not mock.called)
+
+
+def test_streamed_coverage_response(mocker):
+    rows = ['{"start":1}\n{"start":2}\n', '{"start":3}\n']
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.streamed_coverage',
+                        return_value=iter(rows))
+    args = {'chrom': '11', 'start': 500000, 'stop': 5001000}
+
+    with app.test_client() as client:
+        resp = client.post('/streamed-coverage', json=args)
+        assert(resp.mimetype == 'application/x-ndjson')
+        assert(resp.get_data(as_text=True) == ''.join(rows))
+
+    mock.assert_called_with(*list(args.values()))
+
+
+def test_streamed_coverage_validation(mocker):
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.streamed_coverage')
+    args = {'chrom': '11', 'start': 40_000, 'stop': 30_000}
+
+    with app.test_client() as client:
+        resp = client.post('/streamed-coverage', json=args)
+        assert(resp.status_code == 422)
+
+    assert(not mock.called)
+
+
+def test_batch_coverage_call(mocker):
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.batch_coverage',
+                        return_value={'data': []})
+    intervals = [{'chrom': '11', 'start': 5000, 'stop': 5100},
+                 {'chrom': '11', 'start': 5050, 'stop': 5050}]
+
+    with app.test_client() as client:
+        client.post('/batch-coverage', json={'intervals': intervals})
+
+    mock.assert_called_with(intervals)
+
+
+def test_batch_coverage_validation(mocker):
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.batch_coverage',
+                        return_value={'data': []})
+    bad_arg_sets = [
+        {'intervals': []},
+        {'intervals': [{'chrom': '11', 'start': 5100, 'stop': 5000}]},
+        {'intervals': [{'chrom': '11', 'start': 0, 'stop': 5000}]},
+        {'intervals': [{'start': 10, 'stop': 5000}]},
+        # Spans more than COVERAGE_MAX_BATCH_SPAN bases in total.
+        {'intervals': [{'chrom': '11', 'start': 1, 'stop': 3_000_000},
+                       {'chrom': '11', 'start': 1, 'stop': 2_000_001}]}]
+
+    with app.test_client() as client:
+        for args in bad_arg_sets:
+            resp = client.post('/batch-coverage', json=args)
+            assert(resp.status_code == 422)
+
+    assert(not mock.called)
+
+
+def test_batch_coverage_span_limit_configurable(mocker):
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.batch_coverage',
+                        return_value={'data': []})
+    intervals = [{'chrom': '11', 'start': 1, 'stop': 100}, {'chrom': '12', 'start': 1, 'stop': 100}]
+    mocker.patch.dict(app.config, {'COVERAGE_MAX_BATCH_SPAN': 199})
+
+    with app.test_client() as client:
+        assert(client.post('/batch-coverage', json={'intervals': intervals}).status_code == 422)
+        app.config['COVERAGE_MAX_BATCH_SPAN'] = 200
+        assert(client.post('/batch-coverage', json={'intervals': intervals}).status_code == 200)
+
+    assert(mock.call_count == 1)
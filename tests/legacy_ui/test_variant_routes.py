@@ -0,0 +1,50 @@
+from bravo_api.blueprints.legacy_ui import variant_routes
+from flask import Flask
+
+app = Flask('dummy')
+app.register_blueprint(variant_routes.bp)
+
+
+def test_variant_cram_ranges(mocker, tmp_path):
+    cram = tmp_path / 'slice.bam'
+    cram.write_bytes(bytes(range(100)))
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.get_variant_cram',
+                        return_value=str(cram))
+    url = '/variant/api/snv/cram/11-100-A-G-0-1'
+
+    with app.test_client() as client:
+        closed = client.get(url, headers={'Range': 'bytes=10-19'})
+        open_ended = client.get(url, headers={'Range': 'bytes=90-'})
+        past_end = client.get(url, headers={'Range': 'bytes=0-500'})
+        whole = client.get(url)
+
+    mock.assert_called_with('11-100-A-G', False, 1)
+    assert(closed.status_code == 206)
+    assert(closed.headers['Content-Range'] == 'bytes 10-19/100')
+    assert(closed.data == bytes(range(10, 20)))
+    assert(open_ended.headers['Content-Range'] == 'bytes 90-99/100')
+    assert(open_ended.data == bytes(range(90, 100)))
+    assert(past_end.headers['Content-Range'] == 'bytes 0-99/100')
+    assert(whole.status_code == 200)
+    assert(whole.data == bytes(range(100)))
+    assert(whole.content_type == 'application/octet-stream')
+
+
+def test_variant_cram_missing(mocker):
+    mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.get_variant_cram', return_value=None)
+    with app.test_client() as client:
+        resp = client.get('/variant/api/snv/cram/11-100-A-G-1-1', headers={'Range': 'bytes=0-'})
+    assert(resp.status_code == 404)
+
+
+def test_variant_combined_cram(mocker, tmp_path):
+    cram = tmp_path / 'slice-all.bam'
+    cram.write_bytes(bytes(range(50)))
+    mock = mocker.patch('bravo_api.blueprints.legacy_ui.pretty_api.get_variant_combined_cram',
+                        return_value=str(cram))
+    with app.test_client() as client:
+        resp = client.get('/variant/api/snv/cram/combined/11-100-A-G', headers={'Range': 'bytes=0-9'})
+
+    mock.assert_called_with('11-100-A-G')
+    assert(resp.status_code == 206)
+    assert(resp.data == bytes(range(10)))
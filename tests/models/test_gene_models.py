@@ -0,0 +1,65 @@
+from bravo_api.models import gene_models, variants
+from intervaltree import Interval
+import threading
+
+
+def test_gene_lookup(mongodb, mocker):
+    mocker.patch.object(gene_models, 'mongo', mocker.Mock(db=mongodb))
+    models = gene_models.GeneModels()
+
+    assert models.gene('HBB')['gene_id'] == 'ENSG00000244734'
+    assert models.gene('ENSG00000244734')['gene_name'] == 'HBB'
+    assert models.gene('hbb') is None
+    assert models.gene('U2')['chrom'] == '77'
+    assert models.exons('DEMOG0000000200') == [Interval(10736171, 10736284)]
+    assert models.exons('ENSG_MISSING') == []
+    assert models.stats()['genes'] == 3
+
+
+def test_gene_lookup_loads_once(mongodb, mocker):
+    mocker.patch.object(gene_models, 'mongo', mocker.Mock(db=mongodb))
+    models = gene_models.GeneModels()
+    refresh = mocker.spy(models, 'refresh')
+
+    models.gene('HBB')
+    models.exons('ENSG00000244734')
+    models.gene('HBBP1')
+    assert refresh.call_count == 1
+
+    models.max_age = 0
+    thread = mocker.spy(gene_models.threading, 'Thread')
+    models.gene('HBB')
+    thread.spy_return.join()
+    assert refresh.call_count == 2
+
+
+def test_stale_lookup_serves_previous_models(mongodb, mocker):
+    mocker.patch.object(gene_models, 'mongo', mocker.Mock(db=mongodb))
+    models = gene_models.GeneModels(max_age=0)
+    models.refresh()
+    mongodb.genes.update_one({'gene_name': 'HBB'}, {'$set': {'gene_name': 'HBB_RENAMED'}})
+
+    # Lookups neither wait for the background reload nor start a second one.
+    release = threading.Event()
+    refresh = models.refresh
+    mocker.patch.object(models, 'refresh', side_effect=lambda: release.wait() and refresh())
+    thread = mocker.spy(gene_models.threading, 'Thread')
+    assert models.gene('HBB')['gene_id'] == 'ENSG00000244734'
+    assert models.gene('HBB')['gene_id'] == 'ENSG00000244734'
+    assert thread.call_count == 1
+
+    release.set()
+    thread.spy_return.join()
+    models.max_age = None
+    assert models.gene('HBB') is None
+    assert models.gene('HBB_RENAMED')['gene_id'] == 'ENSG00000244734'
+
+
+def test_get_gene_copies_cached_record(mongodb, mocker):
+    mocker.patch.object(gene_models, 'mongo', mocker.Mock(db=mongodb))
+    mocker.patch.object(variants, 'mongo', mocker.Mock(db=mongodb))
+    mocker.patch.object(variants, 'gene_models', gene_models.GeneModels())
+
+    gene = variants.get_gene('U2', True)
+    assert [feature['feature_type'] for feature in gene['features']] == ['exon']
+    assert variants.get_gene('U2', False).get('features') is None
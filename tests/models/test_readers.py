@@ -0,0 +1,28 @@
+from bravo_api.models import readers
+
+
+def effect(gene, consequence, lof=''):
+    return {'Consequence': consequence, 'LoF': lof, 'LoF_filter': '', 'LoF_flags': '',
+            'Feature_type': 'Transcript', 'Gene': gene, 'Feature': f'{gene}-T', 'BIOTYPE': 'protein_coding',
+            'HGVSc': '', 'HGVSp': ''}
+
+
+def test_variant_class():
+    assert readers.variant_class('A', 'G') == 'snv'
+    assert readers.variant_class('A', 'AT') == 'indel'
+    assert readers.variant_class('AC', 'A') == 'indel'
+    assert readers.variant_class('AC', 'GT') == 'mnv'
+
+
+def test_annotation_top_codes():
+    annotation = readers.annotation_from_effects([effect('G1', 'intron_variant&splice_region_variant'),
+                                                  effect('G2', 'stop_gained', 'LC'),
+                                                  effect('G2', 'missense_variant', 'HC')])
+    codes = readers.snv_consequence2code
+    assert annotation['region']['top_consequence_code'] == codes['stop_gained']
+    assert annotation['region']['top_lof_code'] == readers.snv_lof2code['HC']
+    genes = {gene['name']: gene for gene in annotation['genes']}
+    assert genes['G1']['top_consequence_code'] == codes['splice_region_variant']
+    assert genes['G1']['top_lof_code'] == 0
+    assert genes['G2']['top_consequence_code'] == codes['stop_gained']
+    assert genes['G2']['top_lof_code'] == readers.snv_lof2code['HC']
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+import time
+import pysam
+import pytest
+from bravo_api.models.sequences import SequencesClient
+from bravo_api.core.variant_map import convert_variant_map
+
+
+@pytest.fixture()
+def crams_dir(tmp_path):
+    variant_map = tmp_path / 'variant_map.tsv'
+    variant_map.write_text('#MAX_RANDOM_HOM_HETS=5\n'
+                           '#CHROM\tPOS\tREF\tALT\tHOM\tHET\n'
+                           'chr11\t100\tA\tG\tS1\tS2,S3\n'
+                           'chr11\t100\tA\tT\t\tS4\n')
+    pysam.tabix_index(str(variant_map), seq_col=0, start_col=1, end_col=1, meta_char='#')
+    (tmp_path / 'sequences').mkdir()
+    (tmp_path / 'cache').mkdir()
+    return(tmp_path)
+
+
+def test_sequences_info(crams_dir):
+    client = SequencesClient(str(crams_dir), None, str(crams_dir / 'cache'), 100)
+    assert(client.get_sequences_info('11', 100, 'A', 'G') ==
+           [{'n_homozygous': 1, 'n_heterozygous': 2}])
+    assert(client.get_sequences_info('chr11', 100, 'A', 'T') ==
+           [{'n_homozygous': 0, 'n_heterozygous': 1}])
+    assert(client.get_sequences_info('11', 100, 'A', 'C') == [])
+    assert(client.get_sequences_info('12', 100, 'A', 'G') == [])
+
+
+def test_variant_samples_cached(crams_dir, mocker):
+    client = SequencesClient(str(crams_dir), None, str(crams_dir / 'cache'), 100,
+                             variant_cache_size=1)
+    fetch = mocker.spy(client, '_fetch_variant_samples')
+
+    assert(client.get_variant_samples('11', 100, 'A', 'G') == (['S1'], ['S2', 'S3']))
+    client.get_variant_samples('chr11', 100, 'A', 'G')
+    assert(fetch.call_count == 1)
+
+    client.get_variant_samples('11', 100, 'A', 'T')
+    client.get_variant_samples('11', 100, 'A', 'G')
+    assert(fetch.call_count == 3)
+
+
+def test_sequences_sample_out_of_range(crams_dir):
+    client = SequencesClient(str(crams_dir), None, str(crams_dir / 'cache'), 100)
+    assert(client.get_sequences('11', 100, 'A', 'G', 2, False) is None)
+    assert(client.get_sequences('11', 100, 'A', 'C', 1, True) is None)
+
+
+def test_concurrent_requests_share_extraction(crams_dir, mocker):
+    client = SequencesClient(str(crams_dir), None, str(crams_dir / 'cache'), 100)
+    release = threading.Event()
+
+    def slow_extract(cached_cram, *args):
+        release.wait(5)
+        open(cached_cram, 'wb').close()
+        return(True)
+
+    extract = mocker.patch.object(client, '_extract', side_effect=slow_extract)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        client.get_sequences('11', 100, 'A', 'G', 1, True))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while not client.extractions():
+        time.sleep(0.01)
+    assert(client.extractions()[0]['variant_id'] == 'chr11-100-A-G')
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert(extract.call_count == 1)
+    assert(len(results) == 4 and all(result['cram'] == results[0]['cram'] for result in results))
+    assert(client.extractions() == [])
+
+
+def test_extraction_finished_before_submit(crams_dir, mocker):
+    client = SequencesClient(str(crams_dir), None, str(crams_dir / 'cache'), 100)
+    extract = mocker.patch.object(client, '_extract', return_value=True)
+    cached_cram = str(crams_dir / 'cache' / 'chr11-100-A-G-1.bam')
+    # Another request's extraction renamed the slice into place after this request found it missing.
+    open(cached_cram, 'wb').close()
+
+    future = client._submit_extraction(cached_cram, {'variant_id': 'chr11-100-A-G'}, client._extract)
+    assert(future.result(timeout=1))
+    assert(extract.call_count == 0)
+    assert(client.extractions() == [])
+
+
+def test_extraction_timeout(crams_dir, mocker):
+    client = SequencesClient(str(crams_dir), None, str(crams_dir / 'cache'), 100,
+                             extract_timeout=0.05)
+    release = threading.Event()
+    mocker.patch.object(client, '_extract', side_effect=lambda *args: release.wait(5))
+
+    assert(client.get_sequences('11', 100, 'A', 'G', 1, False) is None)
+    assert(len(client.extractions()) == 1)
+    release.set()
+
+
+def write_sample_cram(crams_dir, sample_id, qnames):
+    reference = crams_dir / 'ref.fa'
+    header = {'HD': {'VN': '1.6', 'SO': 'coordinate'}, 'SQ': [{'SN': 'chr11', 'LN': 1000}]}
+    cram_dir = crams_dir / 'sequences' / hashlib.md5(sample_id.encode()).hexdigest()[:2]
+    cram_dir.mkdir(exist_ok=True)
+    cram = cram_dir / f'{sample_id}.cram'
+    with pysam.AlignmentFile(str(cram), 'wc', header=header, reference_filename=str(reference)) as ocram:
+        for i, qname in enumerate(qnames):
+            read = pysam.AlignedSegment(ocram.header)
+            read.query_name = qname
+            read.reference_id = 0
+            read.reference_start = 80 + i
+            read.cigarstring = '10M'
+            read.query_sequence = 'A' * 10
+            read.query_qualities = pysam.qualitystring_to_array('I' * 10)
+            ocram.write(read)
+    pysam.index(str(cram))
+
+
+def test_combined_sequences(crams_dir):
+    (crams_dir / 'ref.fa').write_text('>chr11\n' + 'A' * 1000 + '\n')
+    pysam.faidx(str(crams_dir / 'ref.fa'))
+    write_sample_cram(crams_dir, 'S1', ['100:A:G:01:a', '100:A:T:01:a'])
+    write_sample_cram(crams_dir, 'S2', ['100:A:G:1:a', '100:A:G:1:b'])
+    write_sample_cram(crams_dir, 'S3', ['100:A:G:2:a'])
+    client = SequencesClient(str(crams_dir), str(crams_dir / 'ref.fa'), str(crams_dir / 'cache'), 100)
+
+    result = client.get_combined_sequences('11', 100, 'A', 'G')
+    with pysam.AlignmentFile(result['cram'], 'rb') as ibam:
+        assert([rg['ID'] for rg in ibam.header.to_dict()['RG']] == ['hom1', 'het1', 'het2'])
+        reads = [(read.query_name, read.get_tag('RG')) for read in ibam.fetch('chr11', 0, 1000)]
+    assert(reads == [('100:A:G:01:a', 'hom1'), ('100:A:G:1:a', 'het1'), ('100:A:G:2:a', 'het2'),
+                     ('100:A:G:1:b', 'het1')])
+    assert(os.path.exists(result['crai']))
+
+    single = client.get_sequences('11', 100, 'A', 'G', 1, True)
+    with pysam.AlignmentFile(single['cram'], 'rb') as ibam:
+        assert([read.query_name for read in ibam] == ['100:A:G:1:a', '100:A:G:1:b'])
+
+
+def test_binary_variant_map(crams_dir):
+    tabix_client = SequencesClient(str(crams_dir), None, str(crams_dir / 'cache'), 100)
+    convert_variant_map(crams_dir / 'variant_map.tsv.gz', crams_dir / 'variant_map.bin')
+    binary_client = SequencesClient(str(crams_dir), None, str(crams_dir / 'cache'), 100)
+    assert(binary_client._variant_map_pool is None)
+
+    for alt in ['G', 'T', 'C']:
+        assert(binary_client.get_sequences_info('11', 100, 'A', alt) ==
+               tabix_client.get_sequences_info('11', 100, 'A', alt))
+        assert(binary_client.get_variant_samples('11', 100, 'A', alt) ==
+               tabix_client.get_variant_samples('11', 100, 'A', alt))
+    assert(binary_client.get_sample_id('11', 100, 'A', 'G', 2, True) == 'S3')
+    assert(binary_client.get_sample_id('11', 100, 'A', 'G', 3, True) is None)
@@ -0,0 +1,123 @@
+import pytest
+import random
+from bravo_api.models import variants, snv_tiles
+from bravo_api.models.utils import make_xpos
+
+CONSEQUENCES = ['missense_variant', 'synonymous_variant', 'intron_variant']
+
+
+@pytest.fixture()
+def snv(mongodb):
+    rng = random.Random(1)
+    entries = []
+    for pos in sorted(rng.sample(range(1, 20000), 600)):
+        length = rng.choice([0, 0, 0, 2])
+        consequence = rng.sample(CONSEQUENCES, rng.choice([1, 2]))
+        entry = {'chrom': '1', 'pos': pos, 'xpos': make_xpos('1', pos),
+                 'stop': pos + length, 'xstop': make_xpos('1', pos + length),
+                 'filter': rng.choice([['PASS'], ['SVM'], ['DISC', 'SVM']]),
+                 'annotation': {'region': {'consequence': consequence}}}
+        if 'missense_variant' in consequence and rng.random() < 0.3:
+            entry['annotation']['region']['lof'] = ['HC']
+        entries.append(entry)
+    mongodb.snv.insert_many(entries)
+    mongodb.snv.create_index([('xpos', 1), ('xstop', 1)])
+    return mongodb
+
+
+@pytest.fixture()
+def patch_mongo(snv, mocker):
+    mocker.patch.object(variants, 'mongo', mocker.Mock(db=snv))
+    variants.snv_tiles_markers.clear()
+    yield snv
+    variants.snv_tiles_markers.clear()
+
+
+def load_tiles(mongodb, generation=1, marker=True):
+    chunks = snv_tiles.build_tiles('1', mongodb.snv.find({}, {'pos': 1, 'filter': 1, 'annotation.region': 1}),
+                                   generation)
+    mongodb.snv_tiles.insert_many(chunks)
+    if marker:
+        mongodb.snv_tiles_loaded.insert_one(snv_tiles.tiles_marker('1', generation))
+    variants.snv_tiles_markers.clear()
+
+
+def test_tile_selection():
+    assert snv_tiles.tile_selection({}) == ('all', 'all')
+    assert snv_tiles.tile_selection({'filter': []}) == ('all', 'all')
+    assert snv_tiles.tile_selection({'filter': [{'$eq': ['PASS']}]}) == ('PASS', 'all')
+    assert snv_tiles.tile_selection({'filter': [{'$ne': ['PASS']}],
+                                     'annotation': {'region': {'lof': [{'$eq': ['HC']}]}}}) == ('FAIL', 'lof:HC')
+    assert snv_tiles.tile_selection({'filter': [{'$eq': ['SVM']}]}) is None
+    assert snv_tiles.tile_selection({'filter': [{'$eq': ['PASS']}, {'$eq': ['SVM']}]}) is None
+    assert snv_tiles.tile_selection({'annotation': {'region': {'consequence': [{'$eq': ['missense_variant']}],
+                                                               'lof': [{'$eq': ['HC']}]}}}) is None
+    assert snv_tiles.tile_selection({'annotation': {'gene': {'lof': [{'$eq': ['HC']}]}}}) is None
+    assert snv_tiles.tile_selection({'allele_freq': [{'$lt': [0.1]}]}) is None
+
+
+FILTERS = [
+    {},
+    {'filter': [{'$eq': ['PASS']}]},
+    {'filter': [{'$ne': ['PASS']}]},
+    {'annotation': {'region': {'consequence': [{'$eq': ['missense_variant']}]}}},
+    {'filter': [{'$eq': ['PASS']}], 'annotation': {'region': {'lof': [{'$eq': ['HC']}]}}},
+    {'filter': [{'$eq': ['SVM']}]}
+]
+# Windows of 2000, 3441, 601, 500, and 2364 bases.
+REGIONS = [(1, 19999, 10), (1500, 18700, 5), (2500, 3100, 1), (1, 19999, 40), (1234, 17777, 7)]
+
+
+def test_region_histogram_from_tiles(patch_mongo, mocker):
+    expected = {(i, j): variants.get_region_snv_histogram('1', *region[:2], filter, region[2])
+                for i, filter in enumerate(FILTERS) for j, region in enumerate(REGIONS)}
+    load_tiles(patch_mongo)
+    tiles = mocker.spy(variants, 'tile_histogram')
+
+    for (i, j), histogram in expected.items():
+        start, stop, windows = REGIONS[j]
+        tiles.reset_mock()
+        result = variants.get_region_snv_histogram('1', start, stop, FILTERS[i], windows)
+        assert result['window-size'] == histogram['window-size']
+        assert sorted((w['start'], w['count']) for w in result['windows']) == \
+            sorted((w['start'], w['count']) for w in histogram['windows'])
+        assert tiles.called == (histogram['window-size'] >= 1000 and i != 5)
+
+
+def test_split_tiles():
+    # Windows of 2500 bases have edges at 2500, 5000, and 7500.
+    assert snv_tiles.split_tiles(1, 9, 1000, 2500) == [2, 7]
+    assert snv_tiles.split_tiles(3, 9, 1000, 2000) == []
+    assert snv_tiles.split_tiles(3, 5, 1000, 3500) == [3]
+
+
+def test_region_histogram_needs_marker(patch_mongo, mocker):
+    tiles = mocker.spy(variants, 'tile_histogram')
+    expected = variants.get_region_snv_histogram('1', 1, 19999, {}, 10)
+
+    # Chunks without a marker, e.g. while load-snv-tiles runs, are not used.
+    load_tiles(patch_mongo, generation=1, marker=False)
+    assert variants.get_region_snv_histogram('1', 1, 19999, {}, 10) == expected
+    assert not tiles.called
+
+    # Chunks of an older load are ignored.
+    patch_mongo.snv_tiles.update_many({}, {'$set': {'generation': 0}})
+    patch_mongo.snv_tiles_loaded.insert_one(snv_tiles.tiles_marker('1', 1))
+    variants.snv_tiles_markers.clear()
+    result = variants.get_region_snv_histogram('1', 1, 19999, {}, 10)
+    assert tiles.called
+    assert sum(w['count'] for w in result['windows']) < sum(w['count'] for w in expected['windows'])
+
+
+def test_tile_markers_expire(patch_mongo, mocker):
+    clock = mocker.patch('bravo_api.models.snv_tiles.time.time', return_value=1000)
+    markers = snv_tiles.TileMarkers(max_age=60)
+    assert markers.get(patch_mongo.snv_tiles_loaded, '1') is None
+    patch_mongo.snv_tiles_loaded.insert_one(snv_tiles.tiles_marker('1', 5))
+    clock.return_value = 1030
+    assert markers.get(patch_mongo.snv_tiles_loaded, '1') is None
+    clock.return_value = 1100
+    assert markers.get(patch_mongo.snv_tiles_loaded, '1')['generation'] == 5
+    patch_mongo.snv_tiles_loaded.drop()
+    clock.return_value = 1200
+    assert markers.get(patch_mongo.snv_tiles_loaded, '1') is None
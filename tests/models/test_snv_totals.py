@@ -0,0 +1,92 @@
+import pytest
+from bravo_api.models.snv_totals import SnvTotals, LoadMarker
+
+
+@pytest.fixture()
+def snv(mongodb):
+    # 100 variants per 1kb, every 10th PASS
+    collection = mongodb['snv_totals']
+    collection.insert_many([{'xpos': 1000000000 + pos, 'xstop': 1000000000 + pos,
+                             'filter': ['PASS'] if pos % 100 == 1 else ['SVM']}
+                            for pos in range(1, 20001, 10)])
+    collection.create_index([('xpos', 1), ('xstop', 1)])
+    return collection
+
+
+def bounds(xstart, xstop):
+    return [{'xpos': {'$gte': xstart}}, {'xpos': {'$lte': xstop}}]
+
+
+def test_total_exact_and_cached(snv, mocker):
+    totals = SnvTotals()
+    count = mocker.spy(snv, 'count_documents')
+    conditions = [{'filter': {'$in': ['PASS']}}]
+
+    assert totals.total(snv, bounds(1000000001, 1000020000), conditions, 'xpos_1_xstop_1',
+                        1000000001, 1000020000) == (200, True)
+    assert totals.total(snv, bounds(1000000001, 1000020000), conditions, 'xpos_1_xstop_1',
+                        1000000001, 1000020000) == (200, True)
+    assert count.call_count == 1
+    assert totals.total(snv, bounds(1000000001, 1000020000), [], 'xpos_1_xstop_1',
+                        1000000001, 1000020000) == (2000, True)
+    assert count.call_count == 2
+
+
+def test_total_expires(snv, mocker):
+    totals = SnvTotals(max_age=60)
+    count = mocker.spy(snv, 'count_documents')
+    clock = mocker.patch('bravo_api.models.snv_totals.time.time', return_value=1000)
+    totals.total(snv, bounds(1000000001, 1000001000), [], 'xpos_1_xstop_1', 1000000001, 1000001000)
+    clock.return_value = 1030
+    totals.total(snv, bounds(1000000001, 1000001000), [], 'xpos_1_xstop_1', 1000000001, 1000001000)
+    assert count.call_count == 1
+    clock.return_value = 1100
+    totals.total(snv, bounds(1000000001, 1000001000), [], 'xpos_1_xstop_1', 1000000001, 1000001000)
+    assert count.call_count == 2
+
+
+def test_total_evicts_least_recent(snv):
+    totals = SnvTotals(max_entries=2)
+    for xstop in [1000001000, 1000002000, 1000003000]:
+        totals.total(snv, bounds(1000000001, xstop), [], 'xpos_1_xstop_1', 1000000001, xstop)
+    assert totals.stats() == {'entries': 2}
+
+
+def test_total_estimated(snv):
+    totals = SnvTotals(sample_windows=4, sample_window_size=1000)
+    conditions = [{'filter': {'$in': ['PASS']}}]
+
+    total, exact = totals.total(snv, bounds(1000000001, 1000020000), conditions, 'xpos_1_xstop_1',
+                                1000000001, 1000020000, estimate_span=10000)
+    assert not exact
+    assert total == pytest.approx(200, rel=0.05)
+
+    # Narrow spans and unfiltered queries are counted exactly.
+    assert totals.total(snv, bounds(1000000001, 1000002000), conditions, 'xpos_1_xstop_1',
+                        1000000001, 1000002000, estimate_span=10000) == (20, True)
+    assert totals.total(snv, bounds(1000000001, 1000020000), [], 'xpos_1_xstop_1',
+                        1000000001, 1000020000, estimate_span=10000) == (2000, True)
+
+
+def test_totals_of_other_generation_not_used(snv, mocker):
+    totals = SnvTotals()
+    count = mocker.spy(snv, 'count_documents')
+    totals.total(snv, bounds(1000000001, 1000001000), [], 'xpos_1_xstop_1', 1000000001, 1000001000, generation=1)
+    totals.total(snv, bounds(1000000001, 1000001000), [], 'xpos_1_xstop_1', 1000000001, 1000001000, generation=1)
+    assert count.call_count == 1
+    totals.total(snv, bounds(1000000001, 1000001000), [], 'xpos_1_xstop_1', 1000000001, 1000001000, generation=2)
+    assert count.call_count == 2
+
+
+def test_load_marker_expires(mongodb, mocker):
+    clock = mocker.patch('bravo_api.models.snv_totals.time.time', return_value=1000)
+    marker = LoadMarker(max_age=60)
+    assert marker.get(mongodb.snv_loaded) is None
+    mongodb.snv_loaded.insert_one({'generation': 5})
+    clock.return_value = 1030
+    assert marker.get(mongodb.snv_loaded) is None
+    clock.return_value = 1100
+    assert marker.get(mongodb.snv_loaded) == 5
+    mongodb.snv_loaded.drop()
+    clock.return_value = 1200
+    assert marker.get(mongodb.snv_loaded) is None
@@ -1,7 +1,13 @@
 import pytest
 import pdb
+import pymongo
+from collections import Counter
+from flask import Flask
 from unittest import TestCase
-from bravo_api.models import variants
+from intervaltree import Interval
+from bravo_api.models import variants, database, gene_models
+from bravo_api.core.fs_coverage_provider import FSCoverageProvider
+from bravo_api.models.readers import snv_consequence2code, snv_lof2code, variant_class, add_top_codes
 
 
 def test_build_mongo_filter():
@@ -60,3 +66,195 @@ def test_full_genes_pipeline_appended():
     # The list constant should be appended.
     assert isinstance(result, list)
     assert result[-len(expected_tail):] == expected_tail
+
+
+def test_get_gene_names(mongodb, mocker):
+    mocker.patch.object(gene_models, 'mongo', mocker.Mock(db=mongodb))
+    mocker.patch.object(variants, 'gene_models', gene_models.GeneModels())
+
+    result = variants.get_gene_names(['ENSG00000244734', 'DEMOG0000000200', 'ENSG_MISSING'])
+    assert result == {'ENSG00000244734': 'HBB', 'DEMOG0000000200': 'U2', 'ENSG_MISSING': None}
+
+    # Genes loaded after a missed lookup are found once the models reload.
+    mongodb.genes.insert_one({'gene_id': 'ENSG_MISSING', 'gene_name': 'LATE', 'chrom': '77'})
+    variants.gene_models.max_age = 0
+    assert variants.get_gene_names(['ENSG_MISSING']) == {'ENSG_MISSING': 'LATE'}
+
+
+def test_annotate_exonic_genes(mongodb, mocker):
+    # Single U2 exon on chrom 77 spanning [10736171, 10736283]
+    snvs = [{'chrom': '77', 'pos': pos} for pos in [10736170, 10736171, 10736283, 10736284]]
+    result = list(database.annotate_exonic_genes(mocker.Mock(db=mongodb), snvs))
+    assert [snv.get('exonic_genes') for snv in result] == [None, ['DEMOG0000000200'], ['DEMOG0000000200'], None]
+
+
+def test_get_gene_exons_filter(mongodb, mocker):
+    mocker.patch.object(variants, 'mongo', mocker.Mock(db=mongodb))
+    mocker.patch.object(variants, 'get_gene_exons', return_value=[Interval(10736171, 10736284)])
+    variants.read_snv_indexes.cache_clear()
+
+    result = variants.get_gene_exons_filter('DEMOG0000000200')
+    assert result == ({'$or': [{'pos': {'$gte': 10736171, '$lt': 10736284}}]}, 'xpos_1_xstop_1')
+
+    mongodb.snv.create_index([('exonic_genes', 1), ('xpos', 1)])
+    variants.read_snv_indexes.cache_clear()
+    result = variants.get_gene_exons_filter('DEMOG0000000200')
+    assert result == ({'exonic_genes': 'DEMOG0000000200'}, variants.EXONIC_GENES_INDEX)
+    variants.read_snv_indexes.cache_clear()
+
+
+
+def test_count_summary():
+    groups = [{'_id': {'snv': True, 'indel': False, 'consequence': 'missense_variant', 'lof': 'HC'}, 'count': 3},
+              {'_id': {'snv': False, 'indel': True, 'consequence': 'frameshift_variant'}, 'count': 2},
+              {'_id': {'snv': False, 'indel': False, 'consequence': 'missense_variant', 'lof': None}, 'count': 1},
+              {'_id': {'snv': True, 'indel': False, 'consequence': None}, 'count': 4}]
+    assert variants.count_summary(groups) == {'total': 10, 'snv': 7, 'indels': 2, 'LoF (HC)': 3,
+                                              'missense_variant': 4, 'frameshift_variant': 2}
+
+
+# (variant_id, region consequences, region LoF values) of SNVs, indels, and an MNV, with and without LoF.
+SUMMARY_VARIANTS = [
+    ('1-1000-A-G', ['stop_gained', 'missense_variant'], ['HC']),
+    ('1-1001-C-T', ['synonymous_variant'], []),
+    ('1-1002-CA-C', ['frameshift_variant'], ['LC']),
+    ('1-1004-G-GTT', ['intron_variant'], []),
+    ('1-1006-AC-GT', ['missense_variant'], []),
+    ('1-1008-T-A', [], [])]
+
+
+def summary_variants():
+    docs = []
+    for variant_id, consequences, lofs in SUMMARY_VARIANTS:
+        chrom, pos, ref, alt = variant_id.split('-')
+        region = {'consequence': consequences, '_consequence': [snv_consequence2code[c] for c in consequences]}
+        if lofs:
+            region.update({'lof': lofs, '_lof': [snv_lof2code[lof] for lof in lofs]})
+        add_top_codes(region)
+        xpos = 1000000000 + int(pos)
+        docs.append({'variant_id': variant_id, 'xpos': xpos, 'xstop': xpos + len(ref) - 1,
+                     'variant_class': variant_class(ref, alt), 'annotation': {'region': region}})
+    return docs
+
+
+def python_region_summary(docs):
+    """
+    Region summary as counted in Python before counting moved to a $group.
+    """
+    summary = Counter()
+    for entry in docs:
+        chrom, position, ref, alt = entry['variant_id'].split('-')
+        summary['total'] += 1
+        if len(ref) == 1 and len(alt) == 1:
+            summary['snv'] += 1
+        elif len(ref) != len(alt):
+            summary['indels'] += 1
+        if 'lof' in entry['annotation']['region']:
+            summary[f'LoF ({entry["annotation"]["region"]["lof"][0]})'] += 1
+        if entry['annotation']['region']['consequence']:
+            summary[entry['annotation']['region']['consequence'][0]] += 1
+    return summary
+
+
+def test_get_region_snv_summary_matches_python_counting(mongodb, mocker):
+    mocker.patch.object(variants, 'mongo', mocker.Mock(db=mongodb))
+    docs = summary_variants()
+    mongodb.snv.insert_many([dict(doc) for doc in docs])
+    mongodb.snv.create_index([('xpos', 1), ('xstop', 1), ('variant_class', 1),
+                              ('annotation.region.top_consequence_code', 1), ('annotation.region.top_lof_code', 1)],
+                             name=variants.TOP_CODES_INDEX)
+    variants.read_snv_indexes.cache_clear()
+
+    result = variants.get_region_snv_summary('1', 1000, 1010, {})
+    # MNV counts in total only, LoF keys name the value.
+    assert result['all'] == {'total': 6, 'snv': 3, 'indels': 2, 'LoF (HC)': 1, 'LoF (LC)': 1,
+                             'stop_gained': 1, 'synonymous_variant': 1, 'frameshift_variant': 1,
+                             'intron_variant': 1, 'missense_variant': 1}
+    assert result['all'] == python_region_summary(docs)
+    variants.read_snv_indexes.cache_clear()
+
+
+@pytest.mark.integration
+def test_get_region_snv_summary_derived_class_matches_python_counting(mocker):
+    # Variant classes derived from variant_id need $strLenCP, which mongomock lacks.
+    client = pymongo.MongoClient('mongodb://localhost:27017', serverSelectionTimeoutMS=5000)
+    db = client['bravo_test_region_snv_summary']
+    try:
+        db.snv.drop()
+        docs = summary_variants()
+        db.snv.insert_many([{key: value for key, value in doc.items() if key != 'variant_class'} for doc in docs])
+        db.snv.create_index([('xpos', 1), ('xstop', 1)], name='xpos_1_xstop_1')
+        mocker.patch.object(variants, 'mongo', mocker.Mock(db=db))
+        variants.read_snv_indexes.cache_clear()
+
+        result = variants.get_region_snv_summary('1', 1000, 1010, {})
+        assert result['all'] == python_region_summary(docs)
+    finally:
+        variants.read_snv_indexes.cache_clear()
+        client.drop_database(db)
+
+
+def test_get_region_snv_summary_top_codes(mongodb, mocker):
+    mocker.patch.object(variants, 'mongo', mocker.Mock(db=mongodb))
+    missense, synonymous = snv_consequence2code['missense_variant'], snv_consequence2code['synonymous_variant']
+    mongodb.snv.insert_many([
+        {'xpos': 1000001000, 'xstop': 1000001000, 'variant_class': 'snv',
+         'annotation': {'region': {'top_consequence_code': missense, 'top_lof_code': snv_lof2code['HC']}}},
+        {'xpos': 1000001001, 'xstop': 1000001001, 'variant_class': 'snv',
+         'annotation': {'region': {'top_consequence_code': synonymous, 'top_lof_code': 0}}},
+        {'xpos': 1000001002, 'xstop': 1000001003, 'variant_class': 'indel',
+         'annotation': {'region': {'top_consequence_code': missense, 'top_lof_code': 0}}},
+        {'xpos': 1000001004, 'xstop': 1000001005, 'variant_class': 'mnv',
+         'annotation': {'region': {'top_consequence_code': synonymous, 'top_lof_code': 0}}}])
+    mongodb.snv.create_index([('xpos', 1), ('xstop', 1), ('variant_class', 1),
+                              ('annotation.region.top_consequence_code', 1), ('annotation.region.top_lof_code', 1)],
+                             name=variants.TOP_CODES_INDEX)
+    variants.read_snv_indexes.cache_clear()
+
+    result = variants.get_region_snv_summary('1', 1000, 1010, {})
+    assert result['all'] == {'total': 4, 'snv': 2, 'indels': 1, 'LoF (HC)': 1,
+                             'missense_variant': 2, 'synonymous_variant': 2}
+    assert variants.get_sort_key('annotation.gene.consequence') == 'annotation.genes.top_consequence_code'
+    assert variants.get_sort_key('annotation.gene.consequence', 'asc') == 'annotation.genes._consequence'
+    assert variants.get_sort_key('pos') == 'xpos'
+    variants.read_snv_indexes.cache_clear()
+
+
+def test_load_coverage_summary_joins_genes(mongodb, mocker, real_cov_dir):
+    app = Flask(__name__)
+    app.coverage_provider = FSCoverageProvider(real_cov_dir)
+    mocker.patch.object(database, 'mongo', mocker.Mock(db=mongodb))
+    mocker.patch.object(database, 'PyMongo', return_value=mocker.Mock(db=mongodb))
+    pool = mocker.patch.object(database, 'Pool')
+    pool.return_value.__enter__.return_value.map = lambda func, args: list(map(func, args))
+    mocker.patch.object(variants, 'mongo', mocker.Mock(db=mongodb))
+    # Full bin of real_cov_dir covers positions 5000-8999 of chromosome 11.
+    mongodb.genes.insert_many([
+        {'gene_id': 'ENSGCOV01', 'gene_name': 'COVA', 'chrom': '11', 'start': 5100, 'stop': 5300,
+         'xstart': 11000005100, 'xstop': 11000005300},
+        {'gene_id': 'ENSGCOV02', 'gene_name': 'COVB', 'chrom': '11', 'start': 8990, 'stop': 9100,
+         'xstart': 11000008990, 'xstop': 11000009100}])
+    mongodb.exons.insert_many([
+        {'gene_id': 'ENSGCOV01', 'chrom': '11', 'start': 5100, 'stop': 5199, 'feature_type': 'exon'},
+        {'gene_id': 'ENSGCOV01', 'chrom': '11', 'start': 5150, 'stop': 5300, 'feature_type': 'exon'},
+        {'gene_id': 'ENSGCOV01', 'chrom': '11', 'start': 5100, 'stop': 5120, 'feature_type': 'CDS'},
+        {'gene_id': 'ENSGCOV02', 'chrom': '11', 'start': 8990, 'stop': 9100, 'feature_type': 'exon'}])
+
+    result = app.test_cli_runner().invoke(database.load_coverage_summary, ['1'])
+    assert result.exit_code == 0, result.output
+
+    means = {row['start']: row['mean'] for row in app.coverage_provider.coverage('full', '11', 5000, 9000)}
+    covered = [means[pos] for pos in range(5100, 5301)]
+    gene = next(variants.get_genes('COVA', False, coverage=True))
+    assert gene['coverage']['bases'] == 201
+    assert gene['coverage']['mean'] == pytest.approx(sum(covered) / 201)
+    assert gene['coverage']['above']['30'] == pytest.approx(sum(mean >= 30 for mean in covered) / 201)
+    assert [(exon['start'], exon['stop']) for exon in gene['coverage']['exons']] == [(5100, 5300)]
+    assert 'gene_id' not in gene['coverage'] and 'chrom' not in gene['coverage']
+
+    # Positions without coverage count as 0.
+    gene, = [gene for gene in variants.get_genes_in_region('11', 9000, 9050, coverage=True)]
+    assert gene['gene_id'] == 'ENSGCOV02'
+    assert gene['coverage']['bases'] == 111
+    assert gene['coverage']['mean'] == pytest.approx(sum(means[pos] for pos in range(8990, 9000)) / 111)
+    assert gene['coverage']['above']['1'] == pytest.approx(10 / 111)